@@ -0,0 +1,214 @@
+"""Cross-event analytics over the score table, vectorised with NumPy.
+
+Events are scored on different scales (Tournament points grow with matches
+played; Elimination points are whatever the judges award), so adding raw
+points favours the events with the biggest numbers. This module works on the
+whole field at once:
+
+- event_distribution() / distributions(): count, mean, spread, min/max and
+  percentiles of the scored teams in each event;
+- normalised_scores(): each event rescaled to z-scores (or to 0..1 with
+  method="minmax") so events are comparable;
+- weighted_standings(): the sum of normalised scores weighted per event
+  (weights argument, or "weight" in event_details), ranked with shared ranks.
+
+Teams without a score in an event count as 0 points there, as they do on the
+leaderboards; the statistics themselves only describe the teams that scored.
+
+NumPy is optional for the rest of the application and only imported here.
+Command line: python analytics.py --data tournament_data.json [--weights "College Quiz=2"] [--output standings.csv]
+"""
+import argparse
+import csv
+import sys
+
+try:
+    import numpy as np
+except ImportError: # Analytics are unavailable, the rest of the app still works
+    np = None
+
+from persistence import default_data_file, open_store
+from scoring_engine import ScoringError, TournamentEngine
+
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+METHODS = ("zscore", "minmax")
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Analytics need NumPy. Install it with: pip install numpy")
+
+
+def score_table(engine, events=None):
+    """(teams, events, points, scored) for the whole field.
+
+    points is a float64 array of shape (teams, events); scored is a boolean
+    array of the same shape marking the entries that hold a recorded score.
+    The engine's columns are read as buffers and copied once under its lock.
+    """
+    require_numpy()
+    with engine.lock:
+        events = list(engine.event_details) if events is None else list(events)
+        for event in events:
+            engine.event_type(event) # Raises ScoringError for unknown events
+        teams = list(engine.teams.names)
+        points = np.zeros((len(teams), len(events)))
+        scored = np.zeros((len(teams), len(events)), dtype=bool)
+        for column, event in enumerate(events):
+            if event not in engine.teams.events:
+                continue
+            columns = engine.teams.columns(event)
+            points[:, column] = np.frombuffer(columns.points, dtype=np.int64)
+            scored[:, column] = np.frombuffer(columns.kind, dtype=np.uint8) != 0
+    return teams, events, points, scored
+
+
+def _column_stats(values, percentiles):
+    if not len(values):
+        return {"teams_scored": 0, "mean": 0.0, "std": 0.0, "min": 0, "max": 0,
+                "percentiles": {p: 0.0 for p in percentiles}}
+    return {
+        "teams_scored": int(len(values)),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": dict(zip(percentiles, (float(v) for v in np.percentile(values, percentiles)))),
+    }
+
+
+def event_distribution(engine, event=None, percentiles=DEFAULT_PERCENTILES):
+    """Distribution of the points recorded for one event (the selected one by default)."""
+    event = event or engine.selected_event
+    if not event:
+        raise ScoringError("No event selected for the tournament.")
+    _, _, points, scored = score_table(engine, [event])
+    return _column_stats(points[scored[:, 0], 0], list(percentiles))
+
+
+def distributions(engine, percentiles=DEFAULT_PERCENTILES):
+    """{event: distribution} for every event."""
+    _, events, points, scored = score_table(engine)
+    return {event: _column_stats(points[scored[:, i], i], list(percentiles)) for i, event in enumerate(events)}
+
+
+def normalise(points, scored, method="zscore"):
+    """Rescales each column of points using the statistics of its scored entries.
+
+    zscore: (x - mean) / std; minmax: (x - min) / (max - min). A column with no
+    spread (or no scores) normalises to 0 everywhere.
+    """
+    require_numpy()
+    if method not in METHODS:
+        raise ValueError(f"Unknown normalisation '{method}'. Choose from: {', '.join(METHODS)}")
+    counts = scored.sum(axis=0)
+    masked = np.where(scored, points, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "zscore":
+            centre = np.where(counts > 0, np.nansum(masked, axis=0) / np.maximum(counts, 1), 0.0)
+            scale = np.sqrt(np.nansum((masked - centre) ** 2, axis=0) / np.maximum(counts, 1))
+        else:
+            centre = np.where(counts > 0, np.nanmin(np.where(scored, points, np.inf), axis=0), 0.0)
+            scale = np.where(counts > 0, np.nanmax(np.where(scored, points, -np.inf), axis=0), 0.0) - centre
+        normalised = (points - centre) / scale
+    return np.where(scale > 0, normalised, 0.0)
+
+
+def normalised_scores(engine, events=None, method="zscore"):
+    """(teams, events, matrix) of each team's normalised score per event."""
+    teams, events, points, scored = score_table(engine, events)
+    return teams, events, normalise(points, scored, method)
+
+
+def shared_ranks(values):
+    """1-based competition ranks for values, highest first; equal values share a rank (1, 2, 2, 4)."""
+    require_numpy()
+    order = np.argsort(-values, kind="stable")
+    ordered = values[order]
+    starts = np.r_[True, ordered[1:] != ordered[:-1]] if len(ordered) else np.zeros(0, dtype=bool)
+    positions = np.maximum.accumulate(np.where(starts, np.arange(len(ordered)), 0))
+    return order, positions + 1
+
+
+def event_weights(engine, events, weights=None):
+    """Weight per event: the weights argument, else event_details[event]["weight"], else 1."""
+    weights = weights or {}
+    unknown = set(weights) - set(engine.event_details)
+    if unknown:
+        raise ScoringError(f"Unknown event '{sorted(unknown)[0]}'.")
+    return [float(weights.get(event, engine.event_details[event].get("weight", 1))) for event in events]
+
+
+def weighted_standings(engine, weights=None, method="zscore", events=None):
+    """[(rank, team, weighted_score, raw_total)] over the normalised per-event scores, best first."""
+    teams, events, points, scored = score_table(engine, events)
+    matrix = normalise(points, scored, method)
+    combined = matrix @ np.asarray(event_weights(engine, events, weights), dtype=float)
+    combined = np.round(combined, 9) # Float noise must not split genuine ties
+    raw_totals = points.sum(axis=1)
+    order, ranks = shared_ranks(combined)
+    return [(int(rank), teams[index], float(combined[index]), int(raw_totals[index]))
+            for index, rank in zip(order.tolist(), ranks.tolist())]
+
+
+def write_standings_csv(standings, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Rank", "Team Name", "Weighted Score", "Raw Points"])
+        for rank, team, weighted, raw in standings:
+            writer.writerow([rank, team, f"{weighted:.4f}", raw])
+
+
+def parse_weights(text):
+    """'College Quiz=2, Spelling Bee=0.5' -> {"College Quiz": 2.0, "Spelling Bee": 0.5}."""
+    weights = {}
+    for part in filter(None, (part.strip() for part in (text or "").split(","))):
+        event, _, value = part.rpartition("=")
+        try:
+            weights[event.strip()] = float(value)
+        except ValueError:
+            raise ScoringError(f"Invalid weight '{part}'. Use Event Name=number.")
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-event statistics and weighted standings.")
+    parser.add_argument("--data", help="Tournament data file (default: tournament_data.json, .db or .tsb by backend)")
+    parser.add_argument("--backend", default="journal", help="Storage backend: json, journal, sqlite or binary")
+    parser.add_argument("--method", choices=METHODS, default="zscore")
+    parser.add_argument("--weights", help='Per-event weights, e.g. "College Quiz=2, Spelling Bee=0.5"')
+    parser.add_argument("--top", type=int, default=20, help="Standings rows to print")
+    parser.add_argument("--output", help="Write the full weighted standings to this CSV file")
+    args = parser.parse_args(argv)
+    args.data = args.data or default_data_file(args.backend)
+
+    try:
+        require_numpy()
+        store = open_store(args.backend, args.data)
+        engine = TournamentEngine(args.data, store=store)
+        if not engine.load():
+            print(f"No tournament data found in {args.data}.", file=sys.stderr)
+            return 1
+        store.close()
+        weights = parse_weights(args.weights)
+        for event, stats in distributions(engine).items():
+            if stats["teams_scored"]:
+                quartiles = ", ".join(f"p{p}={v:g}" for p, v in stats["percentiles"].items())
+                print(f"{event}: {stats['teams_scored']} teams, mean {stats['mean']:.2f}, "
+                      f"std {stats['std']:.2f}, range {stats['min']:g}-{stats['max']:g}, {quartiles}")
+        standings = weighted_standings(engine, weights, args.method)
+    except (ImportError, ScoringError, ValueError) as e: # ValueError: an unknown backend or unreadable data file
+        print(e, file=sys.stderr)
+        return 1
+
+    print(f"\nWeighted standings ({args.method}):")
+    for rank, team, weighted, raw in standings[:args.top]:
+        print(f"{rank:>5}  {team:<30}{weighted:>10.3f}{raw:>8}")
+    if args.output:
+        write_standings_csv(standings, args.output)
+        print(f"Full standings written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
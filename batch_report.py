@@ -0,0 +1,467 @@
+"""Batch reports over archived tournament data files, computed on a process pool.
+
+Every event leaves a data file behind. This module summarises any number of
+them without the GUI and combines the summaries into:
+
+- cross-tournament standings: per team name, tournaments played, wins
+  (first place), podiums (top three), average and best place and total points;
+- per-team history: the team's place and points in each tournament;
+- per-event statistics: teams scored, mean, spread and range of the points in
+  each event across every tournament that ran it.
+
+A JSON data file is read with a streaming parser, one team at a time, so the
+whole file is never held as one parsed tree (see JsonStream); a binary
+snapshot (.tsb, binary_snapshot.py) is read team by team from its mapped
+file. Files that cannot be summarised alone - SQLite databases (.db), opened
+read-only, and snapshots with unapplied journal records next to them - are
+loaded through the engine and its store instead.
+
+Each file's summary is cached by the SHA-256 of its content (and its
+journal's), so a re-run only parses files that changed, or were added, since
+the last run. Hashing and parsing both run on the process pool.
+
+Places are the overall leaderboard's: teams level on total points share a
+place (1, 2, 2, 4).
+
+Command line: python batch_report.py archive/ [more files or folders] [--workers 8] [--output reports/]
+"""
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import struct
+import sys
+
+from binary_snapshot import SNAPSHOT_SUFFIX, SnapshotReader
+from instrumentation import METRICS_FILE
+from persistence import JOURNAL_SUFFIX, atomic_write_json, open_store, read_json
+from scoring_engine import TournamentEngine
+from sqlite_store import SqliteStore
+
+CHUNK_SIZE = 1 << 16 # Characters read from a data file at a time
+HASH_BLOCK_SIZE = 1 << 20
+CACHE_FILE = "batch_report_cache.json"
+CACHE_VERSION = 1 # Bump when the summary layout changes, so old cache entries are ignored
+DATA_FILE_SUFFIXES = (".json", ".db", SNAPSHOT_SUFFIX)
+NOT_DATA_FILES = (CACHE_FILE, METRICS_FILE) # JSON files kept next to data files that are not tournaments
+PODIUM = 3
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Reads a JSON document from a text file a chunk at a time.
+
+    The caller walks objects with keys() and reads each value with value();
+    only the value being decoded and the unread rest of the current chunk are
+    held in memory.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        """Appends the next chunk to the buffer, dropping what has been read; False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """The next character that is not whitespace, or "" at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found or 'end of file'}'.")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._more(): # The value goes on in the next chunk
+                    continue
+                raise
+            if end == len(self.buffer) and self._more():
+                continue # A number or literal may go on in the next chunk
+            self.pos = end
+            return value
+
+    def keys(self):
+        """Yields the keys of the object being read (its "{" already consumed); read each value before the next."""
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Object keys must be strings.")
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or '}}' but found '{char or 'end of file'}'.")
+
+
+def iter_data_file(path, chunk_size=CHUNK_SIZE):
+    """Yields ("team", name, data) for each team and ("field", key, value) for the other top-level keys."""
+    found_teams = False
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f, chunk_size)
+        stream.expect("{")
+        for key in stream.keys():
+            if key != "teams":
+                yield "field", key, stream.value()
+                continue
+            found_teams = True
+            stream.expect("{")
+            for team in stream.keys():
+                yield "team", team, stream.value()
+    if not found_teams:
+        raise ValueError(f"{path} is not a tournament data file (it has no teams).")
+
+
+def iter_snapshot_file(path):
+    """The same items as iter_data_file, for a binary snapshot."""
+    with SnapshotReader(path) as reader:
+        for name, data in reader.teams():
+            yield "team", name, data
+        for key, value in reader.state().items():
+            if key != "extras":
+                yield "field", key, value
+
+
+def has_journal(path):
+    journal_path = path + JOURNAL_SUFFIX
+    return os.path.exists(journal_path) and os.path.getsize(journal_path) > 0
+
+
+def iter_engine_data(path):
+    """The same items as iter_data_file, for a file that has to be loaded through the engine."""
+    if path.endswith(".db"):
+        store = SqliteStore(path, read_only=True) # Never converted to WAL or given our schema
+        if not store.has_table("meta"):
+            store.close()
+            raise ValueError(f"{path} is not a tournament database.")
+    else:
+        store = open_store("binary" if path.endswith(SNAPSHOT_SUFFIX) else "journal", path)
+    try:
+        engine = TournamentEngine(path, store=store)
+        if not engine.load():
+            raise ValueError(f"{path} holds no tournament data.")
+    finally:
+        store.close()
+    for name, data in engine.teams.to_dict().items():
+        yield "team", name, data
+    for key in ("event_details", "selected_event", "multi_event"):
+        yield "field", key, getattr(engine, key)
+
+
+def shared_places(totals):
+    """[(team, total, place)] best first; teams level on points share a place."""
+    ranked = sorted(totals, key=lambda item: -item[1]) # Stable, so ties keep team order
+    places = []
+    for position, (team, total) in enumerate(ranked, 1):
+        place = places[-1][2] if places and places[-1][1] == total else position
+        places.append((team, total, place))
+    return places
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def summarise_file(path, chunk_size=CHUNK_SIZE):
+    """Final standings and per-event score statistics of one data file."""
+    if path.endswith(".db") or has_journal(path):
+        items = iter_engine_data(path)
+    elif path.endswith(SNAPSHOT_SUFFIX):
+        items = iter_snapshot_file(path)
+    else:
+        items = iter_data_file(path, chunk_size)
+    totals = []
+    events = {}
+    fields = {}
+    for kind, key, value in items:
+        if kind == "field":
+            fields[key] = value
+            continue
+        if not isinstance(value, dict):
+            raise ValueError(f"Team '{key}' is not an object.")
+        total = value.get("total_score", 0)
+        event_scores = value.get("event_scores", {})
+        if not _is_number(total):
+            raise ValueError(f"Team '{key}' has a total_score that is not a number.")
+        if not isinstance(event_scores, dict):
+            raise ValueError(f"Team '{key}' has event_scores that are not an object.")
+        totals.append((key, total))
+        for event, score_data in event_scores.items():
+            points = score_data.get("points", 0) if isinstance(score_data, dict) else None
+            if not _is_number(points):
+                raise ValueError(f"Team '{key}' has a score for '{event}' without numeric points.")
+            stats = events.get(event)
+            if stats is None:
+                stats = events[event] = {"teams_scored": 0, "sum": 0, "sum_sq": 0, "min": points, "max": points}
+            stats["teams_scored"] += 1
+            stats["sum"] += points
+            stats["sum_sq"] += points * points
+            stats["min"] = min(stats["min"], points)
+            stats["max"] = max(stats["max"], points)
+    event_details = fields.get("event_details")
+    if not isinstance(event_details, dict):
+        event_details = {}
+    for event, stats in events.items():
+        details = event_details.get(event)
+        stats["type"] = details.get("type") if isinstance(details, dict) else None
+    return {
+        "teams": shared_places(totals),
+        "events": events,
+        "selected_event": fields.get("selected_event"),
+        "multi_event": fields.get("multi_event", False),
+    }
+
+
+def file_digest(path):
+    """SHA-256 of a data file's content, and of its journal's (or, for SQLite, its write-ahead log's) if it has one."""
+    digest = hashlib.sha256()
+    for part in (path, path + JOURNAL_SUFFIX, path + "-wal"): # Uncheckpointed SQLite writes are only in -wal
+        if not os.path.exists(part):
+            continue
+        with open(part, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        digest.update(b"\0") # Keeps file | journal boundaries distinct
+    return digest.hexdigest()
+
+
+def _digest_or_none(path):
+    try:
+        return file_digest(path)
+    except OSError:
+        return None
+
+
+def _summarise_or_error(path):
+    """(summary, None) or (None, message); runs in a worker, so one bad file does not stop the batch."""
+    try:
+        return summarise_file(path), None
+    except (OSError, ValueError, struct.error, sqlite3.DatabaseError) as e: # Damaged files, data of the wrong shape
+        return None, str(e)
+
+
+def find_data_files(paths, cache_path=CACHE_FILE):
+    """The data files named in paths, with folders searched recursively for .json, .db and .tsb files.
+
+    Folder searches leave out the report cache (cache_path, wherever it is) and the GUI's metrics file.
+    """
+    cache_path = os.path.abspath(cache_path) if cache_path else None
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for folder, _, names in os.walk(path):
+            for name in names:
+                if name.endswith(JOURNAL_SUFFIX): # A journal store that was never compacted has no data file yet
+                    name = name[:-len(JOURNAL_SUFFIX)]
+                file_path = os.path.join(folder, name)
+                if (name.endswith(DATA_FILE_SUFFIXES) and name not in NOT_DATA_FILES
+                        and os.path.abspath(file_path) != cache_path):
+                    found.append(file_path)
+    return sorted(dict.fromkeys(found))
+
+
+def load_cache(path):
+    try:
+        cache = read_json(path) if path else None
+    except ValueError: # A damaged cache is just rebuilt
+        cache = None
+    if not cache or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def collect(paths, workers=None, cache_path=CACHE_FILE):
+    """([(file, summary)] in path order, [(file, error)], files parsed this run).
+
+    Files whose digest is in the cache are not parsed again. The cache is
+    rewritten with the entries of this run's files only.
+    """
+    cached = load_cache(cache_path)
+    workers = workers or os.cpu_count() or 1
+    executor = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 and len(paths) > 1 else None
+    try:
+        run = executor.map if executor else map
+        chunksize = {"chunksize": max(1, len(paths) // (workers * 4))} if executor else {}
+        digests = list(run(_digest_or_none, paths, **chunksize))
+        changed = [path for path, digest in zip(paths, digests) if digest is None or digest not in cached]
+        parsed = dict(zip(changed, run(_summarise_or_error, changed, **chunksize)))
+    finally:
+        if executor:
+            executor.shutdown()
+
+    summaries, errors, files = [], [], {}
+    for path, digest in zip(paths, digests):
+        summary, error = parsed.get(path, (cached.get(digest), None))
+        if error is not None:
+            errors.append((path, error))
+            continue
+        summaries.append((path, summary))
+        files[digest] = summary
+    if cache_path:
+        atomic_write_json(cache_path, {"version": CACHE_VERSION, "files": files}, indent=None)
+    return summaries, errors, len(changed)
+
+
+# --- Combining summaries ---
+def team_history(summaries):
+    """{team: [(file, place, teams in that tournament, total points)]} in file order."""
+    history = {}
+    for path, summary in summaries:
+        for team, total, place in summary["teams"]:
+            history.setdefault(team, []).append((path, place, len(summary["teams"]), total))
+    return history
+
+
+def cross_standings(history):
+    """[(place, team, tournaments, wins, podiums, average place, best place, total points)], best first.
+
+    Teams are ordered by wins, then podiums, then average place; teams level
+    on all three share a place.
+    """
+    rows = []
+    for team, results in history.items():
+        places = [place for _, place, _, _ in results]
+        rows.append((team, len(results), places.count(1), sum(place <= PODIUM for place in places),
+                     sum(places) / len(places), min(places), sum(total for _, _, _, total in results)))
+    rows.sort(key=lambda row: (-row[2], -row[3], row[4], row[0]))
+    standings = []
+    for position, row in enumerate(rows, 1):
+        previous = standings[-1] if standings else None
+        tied = previous is not None and previous[3:6] == row[2:5]
+        standings.append((previous[0] if tied else position,) + row)
+    return standings
+
+
+def event_statistics(summaries):
+    """{event: {"type", "tournaments", "teams_scored", "mean", "std", "min", "max"}} across every tournament."""
+    merged = {}
+    for _, summary in summaries:
+        for event, stats in summary["events"].items():
+            total = merged.get(event)
+            if total is None:
+                total = merged[event] = {"type": stats["type"], "tournaments": 0, "teams_scored": 0, "sum": 0,
+                                         "sum_sq": 0, "min": stats["min"], "max": stats["max"]}
+            total["type"] = total["type"] or stats["type"]
+            total["tournaments"] += 1
+            for key in ("teams_scored", "sum", "sum_sq"):
+                total[key] += stats[key]
+            total["min"] = min(total["min"], stats["min"])
+            total["max"] = max(total["max"], stats["max"])
+    statistics = {}
+    for event, total in sorted(merged.items()):
+        count = total["teams_scored"]
+        mean = total["sum"] / count
+        statistics[event] = {
+            "type": total["type"],
+            "tournaments": total["tournaments"],
+            "teams_scored": count,
+            "mean": mean,
+            "std": math.sqrt(max(0.0, total["sum_sq"] / count - mean * mean)),
+            "min": total["min"],
+            "max": total["max"],
+        }
+    return statistics
+
+
+def write_reports(folder, standings, history, statistics):
+    """Writes standings.csv, team_history.csv and event_statistics.csv into folder."""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "standings.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Place", "Team Name", "Tournaments", "Wins", "Podiums", "Average Place", "Best Place",
+                         "Total Points"])
+        for place, team, played, wins, podiums, average, best, points in standings:
+            writer.writerow([place, team, played, wins, podiums, f"{average:.2f}", best, points])
+    with open(os.path.join(folder, "team_history.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Team Name", "Data File", "Place", "Teams", "Total Points"])
+        for team in sorted(history):
+            for path, place, teams, points in history[team]:
+                writer.writerow([team, path, place, teams, points])
+    with open(os.path.join(folder, "event_statistics.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Event", "Type", "Tournaments", "Teams Scored", "Mean", "Std", "Min", "Max"])
+        for event, stats in statistics.items():
+            writer.writerow([event, stats["type"] or "", stats["tournaments"], stats["teams_scored"],
+                             f"{stats['mean']:.2f}", f"{stats['std']:.2f}", stats["min"], stats["max"]])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Standings, team history and event statistics across archived tournaments.")
+    parser.add_argument("paths", nargs="+", help="Data files, or folders to search for .json, .db and .tsb data files")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--cache", default=CACHE_FILE, help="Summary cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every file and leave the cache alone")
+    parser.add_argument("--top", type=int, default=20, help="Standings rows to print")
+    parser.add_argument("--output", help="Folder to write standings.csv, team_history.csv and event_statistics.csv to")
+    args = parser.parse_args(argv)
+
+    paths = find_data_files(args.paths, args.cache)
+    if not paths:
+        print("No data files found.", file=sys.stderr)
+        return 1
+    summaries, errors, parsed = collect(paths, args.workers, None if args.no_cache else args.cache)
+    for path, error in errors:
+        print(f"Skipped {path}: {error}", file=sys.stderr)
+    print(f"{len(summaries)} tournaments ({parsed} parsed, {len(paths) - parsed} from the cache)")
+    if not summaries:
+        return 1
+
+    history = team_history(summaries)
+    standings = cross_standings(history)
+    statistics = event_statistics(summaries)
+    print("\nStandings across tournaments:")
+    print(f"{'Place':>5}  {'Team Name':<30}{'Played':>7}{'Wins':>6}{'Podiums':>8}{'Avg':>7}{'Points':>9}")
+    for place, team, played, wins, podiums, average, best, points in standings[:args.top]:
+        print(f"{place:>5}  {team:<30}{played:>7}{wins:>6}{podiums:>8}{average:>7.2f}{points:>9}")
+    print("\nEvents:")
+    for event, stats in statistics.items():
+        print(f"{event}: {stats['teams_scored']} teams in {stats['tournaments']} tournaments, "
+              f"mean {stats['mean']:.2f}, std {stats['std']:.2f}, range {stats['min']:g}-{stats['max']:g}")
+    if args.output:
+        write_reports(args.output, standings, history, statistics)
+        print(f"\nReports written to {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
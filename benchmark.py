@@ -0,0 +1,237 @@
+"""Benchmarks for the scoring, ranking and persistence hot paths.
+
+Builds a synthetic tournament of the requested size with the headless engine
+and times score recording, leaderboard queries, save/load round trips for each
+storage backend, leaderboard export, bulk import and member management. Results
+are written as JSON so runs from two commits can be compared:
+
+    python benchmark.py --teams 5000 --output before.json
+    python benchmark.py --teams 5000 --output after.json --compare before.json
+
+With --compare the exit status is 1 if any benchmark got slower than the
+threshold, so the script can gate a change before event day.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bulk_import import import_scores
+from exporters import export_leaderboard
+from persistence import default_data_file, open_store
+from scoring_engine import ELIMINATION, TOURNAMENT, TournamentEngine, build_score_data
+
+
+# --- Synthetic tournaments ---
+def synthetic_events(count):
+    """Event details for count events, alternating Tournament and Elimination."""
+    return {
+        f"Event {i}": {
+            "type": TOURNAMENT if i % 2 else ELIMINATION,
+            "description": "Synthetic benchmark event.",
+        }
+        for i in range(1, count + 1)
+    }
+
+
+def build_tournament(data_file, teams, members, events, store=None, seed=0):
+    """Returns an engine with teams x members registered and events configured (no scores yet)."""
+    engine = TournamentEngine(data_file, num_teams=teams, members_per_team=members, store=store)
+    engine.event_details = synthetic_events(events)
+    engine.set_multi_event(True)
+    engine.initialise_teams()
+    for team in engine.team_names():
+        for j in range(1, members + 1):
+            engine.add_member(team, f"{team} Member {j}")
+    engine.select_event("Event 1")
+    engine.compact()
+    return engine
+
+
+def random_score_fields(rng, event_type, matches):
+    if event_type == TOURNAMENT:
+        wins = rng.randint(0, matches)
+        return {"wins": wins, "losses": matches - wins}
+    return {"points": rng.randint(0, 100)}
+
+
+def score_updates(engine, count, matches, seed=0):
+    """A reproducible list of (team, event, fields) score updates."""
+    rng = random.Random(seed)
+    teams = engine.team_names()
+    events = list(engine.event_details)
+    updates = []
+    for _ in range(count):
+        event = rng.choice(events)
+        updates.append((rng.choice(teams), event, random_score_fields(rng, engine.event_type(event), matches)))
+    return updates
+
+
+# --- Timing helpers ---
+def time_each(operation, items):
+    """Runs operation(item) for every item; returns the result dict with latency percentiles."""
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        before = time.perf_counter()
+        operation(item)
+        latencies.append(time.perf_counter() - before)
+    return summarise(len(latencies), time.perf_counter() - started, latencies)
+
+
+def time_once(operation, ops=1):
+    """Times a single call that performs ops operations."""
+    started = time.perf_counter()
+    operation()
+    return summarise(ops, time.perf_counter() - started)
+
+
+def summarise(ops, seconds, latencies=None):
+    result = {"ops": ops, "seconds": seconds, "ops_per_sec": ops / seconds if seconds else float("inf")}
+    if latencies:
+        latencies.sort()
+        result["p50_us"] = latencies[len(latencies) // 2] * 1e6
+        result["p99_us"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6
+    return result
+
+
+# --- Benchmarks ---
+def run_benchmarks(args, workdir):
+    results = {}
+    data_file = os.path.join(workdir, "bench_data.json")
+    engine = build_tournament(data_file, args.teams, args.members, args.events)
+    updates = score_updates(engine, args.updates, args.matches, args.seed)
+
+    results["record_score"] = time_each(
+        lambda update: engine.record_score(update[0], update[1], **update[2]), updates)
+    results["build_score_data"] = time_each(
+        lambda update: build_score_data(engine.event_type(update[1]), **update[2]), updates)
+
+    teams = engine.team_names()
+    rng = random.Random(args.seed)
+    sample = [rng.choice(teams) for _ in range(min(args.updates, 10000))]
+    results["rank_of"] = time_each(engine.rank_of, sample)
+    results["top_10"] = time_each(lambda _: engine.top_teams(10), range(1000))
+    results["leaderboard_full"] = time_once(lambda: sum(1 for _ in engine.overall_rows()), len(teams))
+    results["leaderboard_page"] = time_each(
+        lambda start: list(engine.leaderboard_rows("Event 1", start, start + 40)), range(0, len(teams), 40))
+
+    for backend in ("json", "journal", "sqlite", "binary"):
+        path = default_data_file(backend, os.path.join(workdir, f"bench_{backend}"))
+        store = open_store(backend, path)
+        engine.store = store
+        engine.compact()
+        more_updates = score_updates(engine, args.saves, args.matches, args.seed + 1)
+
+        def record_and_save(update):
+            engine.record_score(update[0], update[1], **update[2])
+            engine.save()
+
+        results[f"save_{backend}"] = time_each(record_and_save, more_updates)
+        results[f"compact_{backend}"] = time_once(engine.compact)
+        store.close()
+        reloaded = TournamentEngine(path, store=open_store(backend, path))
+        results[f"load_{backend}"] = time_once(reloaded.load, len(teams))
+        reloaded.store.close()
+
+    csv_path = os.path.join(workdir, "bench_leaderboard.csv")
+    results["export_csv"] = time_once(lambda: export_leaderboard(engine, csv_path, "Event 1"), len(teams))
+
+    import_path = os.path.join(workdir, "bench_import.jsonl")
+    with open(import_path, 'w') as f:
+        for team, event, fields in score_updates(engine, args.updates, args.matches, args.seed + 2):
+            f.write(json.dumps(dict(fields, team=team, event=event)) + "\n")
+    engine.store = open_store("json", data_file)
+    results["bulk_import"] = time_once(lambda: import_scores(engine, import_path), args.updates)
+
+    member_ops = [(team, f"Bench Member {i}") for i, team in enumerate(sample[:2000])]
+    engine.members_per_team = args.members + len(member_ops)
+
+    def add_and_remove(op):
+        engine.add_member(*op)
+        engine.remove_member(*op)
+
+    results["member_add_remove"] = time_each(add_and_remove, member_ops)
+    return results
+
+
+# --- Reporting ---
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Prints a comparison table; returns the names of benchmarks slower than threshold."""
+    regressions = []
+    print(f"{'benchmark':<22}{'baseline ops/s':>16}{'current ops/s':>16}{'change':>10}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:<22}{'-':>16}{result['ops_per_sec']:>16.1f}{'new':>10}")
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        flag = " <-- regression" if change < -threshold else ""
+        print(f"{name:<22}{before['ops_per_sec']:>16.1f}{result['ops_per_sec']:>16.1f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teams", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--events", type=int, default=5)
+    parser.add_argument("--matches", type=int, default=10, help="Matches per team in Tournament events")
+    parser.add_argument("--updates", type=int, default=20000, help="Score updates for the in-memory benchmarks")
+    parser.add_argument("--saves", type=int, default=500, help="Record-and-save operations per storage backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before failing (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="tournament_bench_")
+    try:
+        results = run_benchmarks(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["parameters"] != report["meta"]["parameters"]:
+            print("Warning: baseline was run with different parameters.", file=sys.stderr)
+        if compare(results, baseline["results"], args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""Binary tournament snapshots, read through mmap.
+
+Loading tournament_data.json parses the whole indented file and builds a dict
+per team and per score before the engine can turn them into its columns
+(model.py). A binary snapshot (.tsb) stores those columns as they are, so
+loading one is mostly a few memory copies:
+
+    header        magic, counts, seq and the offset of every section below
+    strings       string_count + 1 uint64 offsets, then the UTF-8 text of every
+                  distinct team, member and event name, each stored once
+    teams         per team: name string id, first member, member count (3 x uint32)
+    members       member string ids (uint32), team after team
+    member keys   string id of each member's normalised name (member_index.py),
+                  in the same order, so loading skips normalising every name
+    totals        total_score per team (int64)
+    events        per event: name string id and the offsets of its columns
+    columns       per event: kind (one byte per team, as ScoreColumns.kind),
+                  then wins, losses and points (int64 per team)
+    state         compact JSON: every other top-level key of the data file
+                  (event_details, selected_event, multi_event, brackets, seq)
+                  and the rare per-team score inputs ScoreColumns keeps in
+                  "extras"
+
+All numbers are little-endian and every array starts on an 8-byte boundary.
+
+SnapshotReader maps the file and decodes nothing up front beyond the header
+and event table: a single team, name or score can be read without touching
+the rest (team(), score()), team_table() builds the engine's TeamTable
+straight from the column bytes, and to_dict() gives back the JSON layout.
+json_to_snapshot() and snapshot_to_json() convert losslessly between the two
+formats; the "binary" storage backend (persistence.BinaryStore) keeps its
+snapshot in this format with the usual change journal beside it.
+
+Command line: python binary_snapshot.py tournament_data.json tournament_data.tsb (or the other way round)
+"""
+import collections
+import copy
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from member_index import normalise
+from model import ScoreColumns, TeamTable, UNSCORED, WINS_LOSSES
+
+MAGIC = b"TSNAP1\n\0"
+SNAPSHOT_SUFFIX = ".tsb"
+# magic, teams, events, strings, reserved, seq,
+# offsets of strings/teams/members/member keys/totals/events/state, state length
+_HEADER = struct.Struct("<8sIIIIq8Q")
+_EVENT = struct.Struct("<II4Q") # Name string id, reserved, offsets of kind/wins/losses/points
+_SWAP = sys.byteorder == "big" # Arrays are stored little-endian
+
+# A detached copy of a TeamTable's columns, safe to write on another thread
+TableCopy = collections.namedtuple("TableCopy", "names members totals events")
+
+
+def _little_endian(values):
+    if _SWAP:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _copy(typecode, column):
+    """An array('<typecode>') copy of a column view, copied as raw bytes."""
+    if _SWAP:
+        return array(typecode, column) # Already a byte-swapped array
+    values = array(typecode)
+    values.frombytes(column.cast("B")) # frombytes only takes byte-format buffers
+    return values
+
+
+def _pad(f):
+    f.write(bytes(-f.tell() % 8))
+
+
+def capture(engine):
+    """(TableCopy, state) of engine, copied under its lock so they can be written while it keeps changing."""
+    with engine.lock:
+        teams = engine.teams
+        events = {}
+        for event, columns in teams.events.items():
+            column_copy = ScoreColumns()
+            column_copy.wins, column_copy.losses, column_copy.points = (
+                columns.wins[:], columns.losses[:], columns.points[:])
+            column_copy.kind = bytearray(columns.kind)
+            column_copy.extras = copy.deepcopy(columns.extras)
+            events[event] = column_copy
+        table = TableCopy(list(teams.names), [list(members) for members in teams.members],
+                          teams.totals[:], events)
+        state = {
+            "event_details": copy.deepcopy(engine.event_details),
+            "selected_event": engine.selected_event,
+            "multi_event": engine.multi_event,
+            "brackets": copy.deepcopy({event: bracket.to_dict() for event, bracket in engine.brackets.items()}),
+            "seq": engine.seq
+        }
+    return table, state
+
+
+def write_snapshot(path, table, state):
+    """Writes table (a TeamTable or TableCopy) and state (the data file's other keys) to path atomically."""
+    string_ids = {}
+    strings = []
+
+    def string_id(text):
+        found = string_ids.get(text)
+        if found is None:
+            found = string_ids[text] = len(strings)
+            strings.append(text.encode())
+        return found
+
+    team_count = len(table.names)
+    team_records = array("I")
+    member_ids = array("I")
+    key_ids = array("I")
+    for team_id, name in enumerate(table.names):
+        team_records.extend((string_id(name), len(member_ids), len(table.members[team_id])))
+        member_ids.extend(string_id(member) for member in table.members[team_id])
+        key_ids.extend(string_id(normalise(member)) for member in table.members[team_id])
+    event_names = [string_id(event) for event in table.events]
+    string_offsets = array("Q", [0])
+    for text in strings:
+        string_offsets.append(string_offsets[-1] + len(text))
+    extras = {event: {str(team_id): values for team_id, values in columns.extras.items()}
+              for event, columns in table.events.items() if columns.extras}
+    state_bytes = json.dumps(dict(state, extras=extras), separators=(",", ":")).encode()
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(bytes(_HEADER.size))
+        strings_offset = f.tell()
+        f.write(_little_endian(string_offsets).tobytes())
+        f.write(b"".join(strings))
+        _pad(f)
+        teams_offset = f.tell()
+        f.write(_little_endian(team_records).tobytes())
+        _pad(f)
+        members_offset = f.tell()
+        f.write(_little_endian(member_ids).tobytes())
+        _pad(f)
+        keys_offset = f.tell()
+        f.write(_little_endian(key_ids).tobytes())
+        _pad(f)
+        totals_offset = f.tell()
+        f.write(_little_endian(array("q", table.totals[:team_count])).tobytes())
+        column_offsets = []
+        for columns in table.events.values():
+            missing = max(0, team_count - len(columns.kind)) # Columns grow lazily; unscored teams read as zero
+            _pad(f)
+            offsets = [f.tell()]
+            f.write(bytes(columns.kind[:team_count]) + bytes(missing))
+            for column in (columns.wins, columns.losses, columns.points):
+                _pad(f)
+                offsets.append(f.tell())
+                f.write(_little_endian(column[:team_count]).tobytes() + bytes(8 * missing))
+            column_offsets.append(offsets)
+        _pad(f)
+        events_offset = f.tell()
+        for name_id, offsets in zip(event_names, column_offsets):
+            f.write(_EVENT.pack(name_id, 0, *offsets))
+        state_offset = f.tell()
+        f.write(state_bytes)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, team_count, len(event_names), len(strings), 0, state.get("seq", 0),
+                             strings_offset, teams_offset, members_offset, keys_offset, totals_offset, events_offset,
+                             state_offset, len(state_bytes)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class SnapshotReader:
+    """A binary snapshot mapped into memory; names and scores are decoded only when read."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        self._view = memoryview(self._map)
+        if len(self._map) < _HEADER.size or self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a binary tournament snapshot.")
+        try:
+            self._read_sections()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_sections(self):
+        """Maps the header's sections, checking each lies inside the file (a truncated copy fails here)."""
+        (_, self.team_count, event_count, string_count, _, self.seq, strings_offset, teams_offset, members_offset,
+         keys_offset, totals_offset, events_offset, self._state_offset,
+         self._state_length) = _HEADER.unpack_from(self._map)
+        self._check_section(self._state_offset, self._state_length)
+        self._check_section(events_offset, event_count * _EVENT.size)
+        self._string_offsets = self._column("Q", strings_offset, string_count + 1)
+        self._strings_start = strings_offset + 8 * (string_count + 1)
+        self._check_section(self._strings_start, self._string_offsets[-1])
+        self._teams = self._column("I", teams_offset, 3 * self.team_count)
+        self._member_count = sum(self._teams[2::3]) if self.team_count else 0
+        self._members = self._column("I", members_offset, self._member_count)
+        self._member_keys = self._column("I", keys_offset, self._member_count)
+        self._totals = self._column("q", totals_offset, self.team_count)
+        self.events = {} # event -> (kind offset, wins, losses, points column views)
+        for index in range(event_count):
+            name_id, _, kind_offset, wins_offset, losses_offset, points_offset = _EVENT.unpack_from(
+                self._map, events_offset + index * _EVENT.size)
+            if name_id >= string_count:
+                self._damaged()
+            self._check_section(kind_offset, self.team_count)
+            self.events[self.string(name_id)] = (kind_offset, self._column("q", wins_offset, self.team_count),
+                                                 self._column("q", losses_offset, self.team_count),
+                                                 self._column("q", points_offset, self.team_count))
+        self._state = None
+        self._ids = None
+
+    def _check_section(self, offset, length):
+        if offset + length > len(self._map):
+            self._damaged()
+
+    def _damaged(self):
+        raise ValueError(f"'{self.path}' is not a binary tournament snapshot (it is truncated or damaged).")
+
+    def _column(self, typecode, offset, count):
+        """A read-only view of count numbers at offset (a copy on big-endian machines)."""
+        size = array(typecode).itemsize
+        self._check_section(offset, count * size)
+        raw = self._view[offset:offset + count * size]
+        if _SWAP:
+            values = array(typecode, bytes(raw))
+            values.byteswap()
+            return values
+        column = raw.cast(typecode)
+        self._views.extend((raw, column)) # Released by close() before the map is
+        return column
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.team_count
+
+    # --- Lazy reads ---
+    def string(self, string_id):
+        if string_id >= len(self._string_offsets) - 1:
+            self._damaged()
+        start = self._strings_start + self._string_offsets[string_id]
+        return str(self._view[start:self._strings_start + self._string_offsets[string_id + 1]], "utf-8")
+
+    def state(self):
+        """The data file's other top-level keys (decoded on first use)."""
+        if self._state is None:
+            start = self._state_offset
+            self._state = json.loads(str(self._view[start:start + self._state_length], "utf-8"))
+            self._state["extras"] = {event: {int(team_id): values for team_id, values in extras.items()}
+                                     for event, extras in self._state.get("extras", {}).items()}
+        return self._state
+
+    def team_name(self, team_id):
+        return self.string(self._teams[3 * team_id])
+
+    def team_names(self):
+        return [self.team_name(team_id) for team_id in range(self.team_count)]
+
+    def team_id(self, name):
+        """The id of the team called name (the name -> id map is built on first use); KeyError if none."""
+        if self._ids is None:
+            self._ids = {team_name: team_id for team_id, team_name in enumerate(self.team_names())}
+        return self._ids[name]
+
+    def members(self, team_id):
+        first, count = self._teams[3 * team_id + 1], self._teams[3 * team_id + 2]
+        if first + count > self._member_count:
+            self._damaged()
+        return [self.string(self._members[index]) for index in range(first, first + count)]
+
+    def total(self, team_id):
+        return self._totals[team_id]
+
+    def score(self, team_id, event):
+        """The team's score_data for event, or None, read like ScoreColumns.get."""
+        kind_offset, wins, losses, points = self.events[event]
+        kind = self._map[kind_offset + team_id]
+        if kind == UNSCORED:
+            return None
+        score = {"wins": wins[team_id], "losses": losses[team_id]} if kind == WINS_LOSSES else {}
+        extras = self.state()["extras"].get(event, {}).get(team_id)
+        if extras:
+            score.update(extras)
+        score["points"] = points[team_id]
+        return score
+
+    def team_dict(self, team_id):
+        """One team in the data file's layout."""
+        event_scores = {}
+        for event in self.events:
+            score = self.score(team_id, event)
+            if score is not None:
+                event_scores[event] = score
+        return {"members": self.members(team_id), "event_scores": event_scores, "total_score": self.total(team_id)}
+
+    def team(self, name):
+        return self.team_dict(self.team_id(name))
+
+    def teams(self):
+        """Yields (name, team dict) one team at a time."""
+        for team_id in range(self.team_count):
+            yield self.team_name(team_id), self.team_dict(team_id)
+
+    # --- Whole snapshot ---
+    def strings(self):
+        """Every string in the table, in id order."""
+        offsets = self._string_offsets
+        start = self._strings_start
+        text = str(self._view[start:start + offsets[-1]], "utf-8")
+        if len(text) == offsets[-1]: # All ASCII, so the byte offsets are character offsets too
+            return [text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        return [self.string(string_id) for string_id in range(len(offsets) - 1)]
+
+    def team_table(self):
+        """The engine's TeamTable, built from the column bytes without a dict per team or score."""
+        strings = self.strings()
+        teams = self._teams
+        # Ids past the string table or member ranges past the member columns mean the file is damaged
+        if (any(max(column, default=-1) >= len(strings) for column in (teams[0::3], self._members, self._member_keys))
+                or any(first + count > self._member_count for first, count in zip(teams[1::3], teams[2::3]))):
+            self._damaged()
+        names = [strings[name_id] for name_id in teams[0::3]]
+        members = [strings[string_id] for string_id in self._members]
+        keys = [strings[string_id] for string_id in self._member_keys]
+        team_members = [members[first:first + count] for first, count in zip(teams[1::3], teams[2::3])]
+        member_keys = [keys[first:first + count] for first, count in zip(teams[1::3], teams[2::3])]
+        extras = self.state()["extras"]
+        events = {}
+        for event, (kind_offset, wins, losses, points) in self.events.items():
+            columns = events[event] = ScoreColumns()
+            columns.wins, columns.losses, columns.points = (_copy("q", wins), _copy("q", losses), _copy("q", points))
+            columns.kind = bytearray(self._map[kind_offset:kind_offset + self.team_count])
+            columns.extras = {team_id: dict(values) for team_id, values in extras.get(event, {}).items()}
+        return TeamTable.from_columns(names, team_members, _copy("q", self._totals), events, member_keys)
+
+    def snapshot(self):
+        """The loaded-data dict the engine reads, with "teams" already a TeamTable."""
+        state = {key: value for key, value in self.state().items() if key != "extras"}
+        return dict(state, teams=self.team_table())
+
+    def to_dict(self):
+        """The snapshot in the JSON data file's layout."""
+        data = {"teams": dict(self.teams())}
+        data.update((key, value) for key, value in self.state().items() if key != "extras")
+        return data
+
+
+def read_snapshot(path):
+    """The engine's loaded-data dict for the snapshot at path, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with SnapshotReader(path) as reader:
+        return reader.snapshot()
+
+
+def json_to_snapshot(json_path, snapshot_path):
+    """Converts a JSON data file to a binary snapshot."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    table = TeamTable.from_dict(data.get("teams", {}))
+    write_snapshot(snapshot_path, table, {key: value for key, value in data.items() if key != "teams"})
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    """Converts a binary snapshot back to a JSON data file."""
+    from persistence import atomic_write_json # persistence imports this module for its binary store
+    with SnapshotReader(snapshot_path) as reader:
+        atomic_write_json(json_path, reader.to_dict())
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("Usage: python binary_snapshot.py <from> <to>  (one .json data file and one .tsb snapshot)",
+              file=sys.stderr)
+        return 2
+    source, target = argv
+    try:
+        if source.endswith(SNAPSHOT_SUFFIX):
+            snapshot_to_json(source, target)
+        else:
+            json_to_snapshot(source, target)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Converted {source} to {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""Match-level pairing and standings for Tournament-type events.
+
+A Bracket generates pairings one round at a time in one of four formats and
+keeps each team's wins, losses, points for/against and opponents up to date as
+results are recorded, so the wins/losses/points the score popup asks for are
+derived from the individual matches.
+
+- round_robin: circle method, every team meets every other team once.
+- swiss: teams are sorted by standing (O(n log n)) and paired greedily with the
+  closest-ranked team they have not met yet, searching at most SWISS_WINDOW
+  places down, so a 1,000+ team round costs O(n log n + n * SWISS_WINDOW).
+- single_elimination: standard seeding with byes for the top seeds; a team is
+  out after one loss.
+- double_elimination: teams with no losses are paired with each other, teams
+  with one loss with each other, and a team is out after two losses. The two
+  last survivors meet in the final, replayed if the unbeaten team loses it.
+
+Pairings are returned as plain rows ([match_id, round, team_a, team_b, stage],
+team_b None for a bye) so the engine can journal them and replay them without
+re-running the pairing logic.
+"""
+from scoring_engine import ScoringError, calculate_tournament_points
+
+ROUND_ROBIN = "round_robin"
+SWISS = "swiss"
+SINGLE_ELIMINATION = "single_elimination"
+DOUBLE_ELIMINATION = "double_elimination"
+FORMATS = (ROUND_ROBIN, SWISS, SINGLE_ELIMINATION, DOUBLE_ELIMINATION)
+
+SWISS_WINDOW = 32 # How far down the standings Swiss pairing looks for an unplayed opponent
+
+
+class Match:
+    """One pairing; team_b is None for a bye."""
+
+    __slots__ = ("match_id", "round", "team_a", "team_b", "stage", "winner", "score_a", "score_b")
+
+    def __init__(self, match_id, round_number, team_a, team_b, stage=""):
+        self.match_id = match_id
+        self.round = round_number
+        self.team_a = team_a
+        self.team_b = team_b
+        self.stage = stage # "W"/"L"/"F" for double elimination, "" otherwise
+        self.winner = None
+        self.score_a = None
+        self.score_b = None
+
+    @property
+    def is_bye(self):
+        return self.team_b is None
+
+    @property
+    def loser(self):
+        if self.winner is None or self.is_bye:
+            return None
+        return self.team_b if self.winner == self.team_a else self.team_a
+
+    def to_row(self):
+        return [self.match_id, self.round, self.team_a, self.team_b, self.stage]
+
+    def to_dict(self):
+        return {"row": self.to_row(), "winner": self.winner, "score_a": self.score_a, "score_b": self.score_b}
+
+
+def seed_order(size):
+    """Bracket positions for seeds 1..size (size a power of two), e.g. 8 -> 1,8,4,5,2,7,3,6."""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+class Bracket:
+    """Pairings and incrementally maintained standings for one event."""
+
+    def __init__(self, event, fmt, teams):
+        if fmt not in FORMATS:
+            raise ScoringError(f"Unknown bracket format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+        if len(teams) < 2:
+            raise ScoringError("A bracket needs at least two teams.")
+        self.event = event
+        self.format = fmt
+        self.teams = list(teams) # In seed order
+        self.seeds = {team: seed for seed, team in enumerate(self.teams, start=1)}
+        self.matches = {}
+        self.rounds = [] # Match ids per round
+        self.wins = dict.fromkeys(self.teams, 0)
+        self.losses = dict.fromkeys(self.teams, 0)
+        self.points_for = dict.fromkeys(self.teams, 0)
+        self.points_against = dict.fromkeys(self.teams, 0)
+        self.opponents = {team: [] for team in self.teams}
+        self.byes = set()
+        self.wins_against = {team: {} for team in self.teams} # team -> {opponent: wins over them}
+
+    # --- Standings ---
+    def record(self, team):
+        """(wins, losses, points) for a team under the 3-per-win/1-per-loss rule."""
+        wins, losses = self.wins[team], self.losses[team]
+        return wins, losses, calculate_tournament_points(wins, losses)
+
+    def standings(self):
+        """Teams ordered by points, then seed: [(team, wins, losses, points)]."""
+        rows = [(team,) + self.record(team) for team in self.teams]
+        return sorted(rows, key=lambda row: (-row[3], self.seeds[row[0]]))
+
+    def alive(self):
+        """Teams not yet knocked out (everyone for round robin and Swiss)."""
+        if self.format == SINGLE_ELIMINATION:
+            return [team for team in self.teams if self.losses[team] == 0]
+        if self.format == DOUBLE_ELIMINATION:
+            return [team for team in self.teams if self.losses[team] < 2]
+        return list(self.teams)
+
+    def round_complete(self):
+        return not self.rounds or all(self.matches[match_id].winner is not None for match_id in self.rounds[-1])
+
+    def is_finished(self):
+        if not self.round_complete():
+            return False
+        if self.format == ROUND_ROBIN:
+            return len(self.rounds) >= self._round_robin_rounds()
+        if self.format == SWISS:
+            return False # Organisers decide how many Swiss rounds to play
+        return len(self.alive()) <= 1
+
+    def remaining_pairings(self):
+        """(round, team_a, team_b) of every known match still to be played.
+
+        That is the open matches of the current round and, for round robin,
+        every later round too; the other formats pair later rounds from the
+        results, so those matches are not known yet.
+        """
+        pairings = [(match.round, match.team_a, match.team_b) for match in self.matches.values()
+                    if match.winner is None and not match.is_bye]
+        if self.format == ROUND_ROBIN:
+            for round_number in range(len(self.rounds) + 1, self._round_robin_rounds() + 1):
+                pairings.extend((round_number, a, b) for a, b, _ in self._round_robin_pairs(round_number)
+                                if b is not None)
+        return pairings
+
+    # --- Pairing ---
+    def generate_round(self):
+        """Pairing rows for the next round, or [] if the bracket is finished.
+
+        Does not change the bracket; pass the rows to add_round to play them.
+        """
+        if not self.round_complete():
+            raise ScoringError("Record every result in the current round before pairing the next one.")
+        if self.is_finished():
+            return []
+        round_number = len(self.rounds) + 1
+        if self.format == ROUND_ROBIN:
+            pairs = self._round_robin_pairs(round_number)
+        elif self.format == SWISS:
+            pairs = self._swiss_pairs()
+        elif self.format == SINGLE_ELIMINATION:
+            pairs = self._elimination_pairs(round_number, self.alive())
+        else:
+            pairs = self._double_elimination_pairs(round_number)
+        next_id = len(self.matches) + 1
+        return [[next_id + i, round_number, a, b, stage] for i, (a, b, stage) in enumerate(pairs)]
+
+    def add_round(self, rows):
+        """Adds a round of pairing rows; byes are decided immediately."""
+        round_ids = []
+        for match_id, round_number, team_a, team_b, stage in rows:
+            match = Match(match_id, round_number, team_a, team_b, stage)
+            self.matches[match_id] = match
+            round_ids.append(match_id)
+            if match.is_bye:
+                self.byes.add(team_a)
+                match.winner = team_a
+                if self.format == SWISS:
+                    self.wins[team_a] += 1 # A Swiss bye scores as a win
+        self.rounds.append(round_ids)
+
+    def _round_robin_rounds(self):
+        return len(self.teams) - 1 if len(self.teams) % 2 == 0 else len(self.teams)
+
+    def _round_robin_pairs(self, round_number):
+        # Circle method: fix the first team and rotate the rest one place per round
+        teams = self.teams + ([None] if len(self.teams) % 2 else [])
+        rest = teams[1:]
+        shift = (round_number - 1) % len(rest)
+        rotated = [teams[0]] + rest[-shift:] + rest[:-shift] if shift else teams
+        half = len(rotated) // 2
+        pairs = []
+        for a, b in zip(rotated[:half], reversed(rotated[half:])):
+            if a is None or b is None:
+                pairs.append((a or b, None, ""))
+            else:
+                pairs.append((a, b, ""))
+        return pairs
+
+    def _swiss_pairs(self):
+        ordered = [team for team, *_ in self.standings()]
+        pairs = []
+        if len(ordered) % 2:
+            # Bye to the lowest-ranked team that has not had one yet
+            bye_team = next((team for team in reversed(ordered) if team not in self.byes), ordered[-1])
+            ordered.remove(bye_team)
+            pairs.append((bye_team, None, ""))
+        paired = [False] * len(ordered)
+        for i, team in enumerate(ordered):
+            if paired[i]:
+                continue
+            played = set(self.opponents[team])
+            partner_index = None
+            looked_at = 0
+            for j in range(i + 1, len(ordered)):
+                if paired[j]:
+                    continue
+                if partner_index is None:
+                    partner_index = j # Fallback: the next team down, even if it is a rematch
+                if ordered[j] not in played:
+                    partner_index = j
+                    break
+                looked_at += 1
+                if looked_at >= SWISS_WINDOW:
+                    break
+            paired[i] = paired[partner_index] = True
+            pairs.append((team, ordered[partner_index], ""))
+        return pairs
+
+    def _elimination_pairs(self, round_number, teams, stage=""):
+        if round_number == 1:
+            size = 1
+            while size < len(teams):
+                size *= 2
+            slots = [self.teams[seed - 1] if seed <= len(teams) else None for seed in seed_order(size)]
+            pairs = []
+            for a, b in zip(slots[0::2], slots[1::2]):
+                pairs.append((a or b, b if a else None, stage))
+            return pairs
+        # Later rounds: survivors in bracket order (the order of the matches they won)
+        return self._pair_in_order(self._bracket_order(teams), stage)
+
+    def _double_elimination_pairs(self, round_number):
+        if round_number == 1:
+            return self._elimination_pairs(1, self.teams, "W")
+        unbeaten = self._bracket_order([team for team in self.teams if self.losses[team] == 0])
+        one_loss = self._bracket_order([team for team in self.teams if self.losses[team] == 1])
+        finalists = unbeaten + one_loss
+        if len(finalists) == 2:
+            return [(finalists[0], finalists[1], "F")]
+        if len(unbeaten) == 1:
+            # The winners bracket champion waits for the losers bracket to produce a finalist
+            return self._pair_in_order(one_loss, "L")
+        return self._pair_in_order(unbeaten, "W") + self._pair_in_order(one_loss, "L")
+
+    def _bracket_order(self, teams):
+        last_match = {}
+        for match_id, match in self.matches.items():
+            for team in (match.team_a, match.team_b):
+                if team is not None:
+                    last_match[team] = match_id
+        return sorted(teams, key=lambda team: (last_match.get(team, 0), self.seeds[team]))
+
+    @staticmethod
+    def _pair_in_order(teams, stage):
+        pairs = [(a, b, stage) for a, b in zip(teams[0::2], teams[1::2])]
+        if len(teams) % 2:
+            pairs.append((teams[-1], None, stage))
+        return pairs
+
+    # --- Results ---
+    def result_effect(self, match_id, winner):
+        """Validates a result and returns {team: (wins, losses)} as they will be after it."""
+        match = self._match(match_id)
+        if match.is_bye:
+            raise ScoringError(f"Match {match_id} is a bye.")
+        if winner not in (match.team_a, match.team_b):
+            raise ScoringError(f"'{winner}' is not playing in match {match_id}.")
+        if match.winner is not None and self.format in (SINGLE_ELIMINATION, DOUBLE_ELIMINATION) \
+                and match.round != len(self.rounds):
+            raise ScoringError("Results from earlier elimination rounds cannot be changed.")
+        effect = {team: [self.wins[team], self.losses[team]] for team in (match.team_a, match.team_b)}
+        if match.winner is not None:
+            effect[match.winner][0] -= 1
+            effect[match.loser][1] -= 1
+        loser = match.team_b if winner == match.team_a else match.team_a
+        effect[winner][0] += 1
+        effect[loser][1] += 1
+        return {team: tuple(counts) for team, counts in effect.items()}
+
+    def apply_result(self, match_id, winner, score_a=None, score_b=None):
+        """Records (or corrects) a match result, updating only the two teams involved."""
+        match = self._match(match_id)
+        a, b = match.team_a, match.team_b
+        if match.winner is not None:
+            self.wins[match.winner] -= 1
+            self.losses[match.loser] -= 1
+            self.wins_against[match.winner][match.loser] -= 1
+            self._add_points(match, -1)
+        else:
+            self.opponents[a].append(b)
+            self.opponents[b].append(a)
+        match.winner = winner
+        match.score_a = score_a
+        match.score_b = score_b
+        loser = b if winner == a else a
+        self.wins[winner] += 1
+        self.losses[loser] += 1
+        self.wins_against[winner][loser] = self.wins_against[winner].get(loser, 0) + 1
+        self._add_points(match, 1)
+
+    def _add_points(self, match, sign):
+        if match.score_a is None or match.score_b is None:
+            return
+        self.points_for[match.team_a] += sign * match.score_a
+        self.points_against[match.team_a] += sign * match.score_b
+        self.points_for[match.team_b] += sign * match.score_b
+        self.points_against[match.team_b] += sign * match.score_a
+
+    def _match(self, match_id):
+        try:
+            return self.matches[match_id]
+        except KeyError:
+            raise ScoringError(f"Unknown match {match_id}.")
+
+    # --- Persistence ---
+    def to_dict(self):
+        return {
+            "format": self.format,
+            "teams": self.teams,
+            "matches": [self.matches[match_id].to_dict() for round_ids in self.rounds for match_id in round_ids],
+        }
+
+    @classmethod
+    def from_dict(cls, event, data):
+        bracket = cls(event, data["format"], data["teams"])
+        by_round = {}
+        for match_data in data["matches"]:
+            by_round.setdefault(match_data["row"][1], []).append(match_data)
+        for round_number in sorted(by_round):
+            bracket.add_round([match_data["row"] for match_data in by_round[round_number]])
+            for match_data in by_round[round_number]:
+                match_id = match_data["row"][0]
+                if match_data["winner"] is not None and not bracket.matches[match_id].is_bye:
+                    bracket.apply_result(match_id, match_data["winner"], match_data["score_a"], match_data["score_b"])
+        return bracket
@@ -0,0 +1,123 @@
+"""Bulk score import from CSV, JSON Lines or JSON files.
+
+Rows are streamed from the file one at a time, validated with the same rules as
+the record score popup (engine.build_score) and staged per (team, event), so
+memory is bounded by the number of teams and events rather than by the number
+of rows. Nothing is committed unless every row is valid; a valid file becomes a
+single change record and a single save.
+
+Each row needs "team" and optionally "event" (defaults to the selected event),
+plus "wins" and "losses" for Tournament events or "points" for Elimination
+events, and any extra inputs the event's scoring rule uses ("draws", "bonus",
+"placement"). A later row for the same team and event replaces an earlier one.
+"""
+import csv
+import json
+import os
+import re
+
+from scoring_engine import ScoringError
+
+MAX_REPORTED_ERRORS = 100 # Errors beyond this are counted but not listed
+READ_CHUNK_SIZE = 1 << 16
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class BulkImportError(ScoringError):
+    """Raised when an import file has invalid rows; nothing from the file is committed."""
+
+    def __init__(self, errors, error_count):
+        self.errors = errors # [(row_number, message), ...] for the first MAX_REPORTED_ERRORS rows
+        self.error_count = error_count
+        lines = [f"Row {row_number}: {message}" for row_number, message in errors]
+        if error_count > len(errors):
+            lines.append(f"... and {error_count - len(errors)} more errors.")
+        super().__init__(f"{error_count} invalid rows, nothing imported:\n" + "\n".join(lines))
+
+
+def _iter_json_array(f):
+    """Yields the items of a top-level JSON array without parsing the whole file at once."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_CHUNK_SIZE)
+    position = _SEPARATORS.match(buffer).end()
+    if buffer[position:position + 1] != "[":
+        raise ScoringError("JSON import file must contain a list of score rows.")
+    position += 1
+    at_eof = False
+    while True:
+        position = _SEPARATORS.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if at_eof:
+                raise ScoringError("JSON import file is truncated or malformed.")
+            # Item runs past the end of the buffer: drop what was consumed and read more
+            chunk = f.read(READ_CHUNK_SIZE)
+            at_eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def iter_score_rows(path):
+    """Yields (row_number, row_dict) from a .csv, .jsonl or .json score file."""
+    extension = os.path.splitext(path)[1].lower()
+    # utf-8-sig drops the byte order mark Excel's "CSV UTF-8" (and Notepad) put at the start of the file
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        if extension == ".csv":
+            reader = csv.reader(f)
+            header = [column.strip().lower() for column in next(reader, [])]
+            # Row 1 is the header, so data rows start at 2 like in a spreadsheet
+            for row_number, row in enumerate(reader, start=2):
+                yield row_number, dict(zip(header, row))
+        elif extension == ".jsonl":
+            for row_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield row_number, json.loads(line)
+                    except ValueError:
+                        yield row_number, None # Reported as an invalid row
+        elif extension == ".json":
+            yield from enumerate(_iter_json_array(f), start=1)
+        else:
+            raise ScoringError(f"Unsupported import file type '{extension}'. Use .csv, .jsonl or .json.")
+
+
+def stage_scores(engine, rows, max_reported_errors=MAX_REPORTED_ERRORS):
+    """Validates rows and returns {(team, event): score_data}, or raises BulkImportError."""
+    staged = {}
+    errors = []
+    error_count = 0
+    rule_inputs = {event: engine.rule_inputs(event) for event in engine.event_details}
+    for row_number, row in rows:
+        try:
+            if not isinstance(row, dict):
+                raise ScoringError("Row must be an object with team/event/score fields.")
+            team = str(row.get("team") or "").strip()
+            event = str(row.get("event") or "").strip() or engine.selected_event
+            if not engine.has_team(team):
+                raise ScoringError(f"Unknown team '{team}'.")
+            if event not in rule_inputs:
+                raise ScoringError(f"Unknown event '{event}'.")
+            staged[team, event] = engine.build_score(event, wins=row.get("wins"), losses=row.get("losses"),
+                                                     points=row.get("points"),
+                                                     **{name: row.get(name) for name in rule_inputs[event]})
+        except ScoringError as e:
+            error_count += 1
+            if len(errors) < max_reported_errors:
+                errors.append((row_number, str(e)))
+    if error_count:
+        raise BulkImportError(errors, error_count)
+    return staged
+
+
+def import_scores(engine, path):
+    """Imports every score in path as one batch and saves once; returns the number of scores stored."""
+    staged = stage_scores(engine, iter_score_rows(path))
+    engine.record_scores((team, event, score_data) for (team, event), score_data in staged.items())
+    engine.save()
+    return len(staged)
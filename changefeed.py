@@ -0,0 +1,81 @@
+"""Publish/subscribe feed of leaderboard changes.
+
+Every committed change to the engine is published as a list of small change
+dicts, so views can patch the rows that moved instead of redrawing:
+
+- {"type": "rank", "board", "team", "old_rank", "new_rank", "old_score",
+  "new_score", "start", "stop"}: a team's score changed on a leaderboard.
+  Ranks are 1-based positions (old_rank is None for a team new to the board);
+  start/stop are the 0-based positions whose rows may read differently now:
+  every row between the old and new position shifts by one, and the tied
+  groups at either end may share a different rank.
+- {"type": "reorder", "board", "start", "stop"}: tie-breakers changed the order
+  within positions start..stop-1 without any score moving (a match result
+  changes the opponents' Buchholz and Sonneborn-Berger).
+- {"type": "reset", "board"}: the board was rebuilt (new teams, event switch,
+  a large bulk import or a reload); re-read whatever is shown. board None in a
+  reset means every board.
+
+board is None for the overall standings and the event name for an event's
+leaderboard. In single-event mode both read the same ranking, so a change is
+published for None and for the selected event.
+
+Subscribers are called synchronously on the thread that made the change, with
+the engine's lock held, so the feed is in commit order. They must not block:
+hand the changes to your own thread (a queue, loop.call_soon_threadsafe).
+"""
+import queue
+import sys
+import threading
+import traceback
+
+RANK = "rank"
+REORDER = "reorder"
+RESET = "reset"
+
+
+class ChangeFeed:
+    """Fan-out of (seq, changes) notifications to any number of subscribers."""
+
+    def __init__(self):
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        """True while anyone is subscribed, so the engine can skip building diffs otherwise."""
+        return bool(self._subscribers)
+
+    def subscribe(self, callback):
+        """Calls callback(seq, changes) for every published change; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers += (callback,)
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = tuple(s for s in self._subscribers if s is not callback)
+        return unsubscribe
+
+    def publish(self, seq, changes):
+        for callback in self._subscribers:
+            try:
+                callback(seq, changes)
+            except Exception:
+                # A broken display must never stop scores from being recorded
+                traceback.print_exc(file=sys.stderr)
+
+
+class ChangeQueue:
+    """Subscriber that buffers changes for another thread to drain (the Tk event loop)."""
+
+    def __init__(self, feed):
+        self._queue = queue.SimpleQueue()
+        self.unsubscribe = feed.subscribe(lambda seq, changes: self._queue.put(changes))
+
+    def drain(self):
+        """Every change published since the last drain, oldest first."""
+        changes = []
+        while True:
+            try:
+                changes.extend(self._queue.get_nowait())
+            except queue.Empty:
+                return changes
@@ -0,0 +1,212 @@
+"""Streaming leaderboard export to CSV, JSON Lines and a compact columnar format.
+
+Rows are read from the engine's ranking generators in one pass under
+engine.lock (the Tk thread and the scoring server change the ranking while an
+export runs, and a half-updated ranking can repeat or skip teams), then written
+with the lock released. ExportJob runs an export on a worker thread and exposes
+its progress for the GUI to poll with root.after, keeping the Tk event loop
+responsive during large exports.
+
+The columnar format (.tsc) stores rows in groups of COLUMNAR_GROUP_SIZE. Each
+group is a little-endian uint32 row count followed by the rank (int32), score
+(int64), wins and losses (int32, -1 when not a Tournament event) columns and
+the team names as uint32 byte lengths plus one UTF-8 blob. A row count of 0
+ends the file.
+"""
+import csv
+import json
+import os
+import struct
+import threading
+from array import array
+
+from scoring_engine import TOURNAMENT
+
+COLUMNAR_MAGIC = b"TSCOL1\n"
+COLUMNAR_GROUP_SIZE = 4096
+OVERALL_NAME = "Overall"
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".tsc": "columnar",
+}
+
+
+def format_for_path(path):
+    """Picks the export format from a file extension (CSV if unknown)."""
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def _int32_array(values):
+    # array('i') is 4 bytes on every platform CPython supports
+    return array('i', values)
+
+
+def _little_endian(column):
+    if struct.pack("=i", 1) != struct.pack("<i", 1):
+        column.byteswap()
+    return column
+
+
+# --- Writers: each takes an open binary/text file and an iterator of rows ---
+def write_csv(f, rows, show_wins_losses):
+    csv_writer = csv.writer(f)
+    headers = ["Rank", "Team Name", "Score"]
+    if show_wins_losses:
+        headers.append("Wins/Losses")
+    csv_writer.writerow(headers)
+    for rank, team_name, team_score, wins, losses in rows:
+        row = [rank, team_name, team_score]
+        if show_wins_losses:
+            row.append(f"{wins}/{losses}")
+        csv_writer.writerow(row)
+        yield
+
+
+def write_jsonl(f, rows, show_wins_losses):
+    for rank, team_name, team_score, wins, losses in rows:
+        row = {"rank": rank, "team": team_name, "score": team_score}
+        if show_wins_losses:
+            row["wins"] = wins
+            row["losses"] = losses
+        f.write(json.dumps(row) + "\n")
+        yield
+
+
+def write_columnar(f, rows, show_wins_losses):
+    f.write(COLUMNAR_MAGIC)
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) == COLUMNAR_GROUP_SIZE:
+            _write_columnar_group(f, group)
+            group = []
+        yield
+    if group:
+        _write_columnar_group(f, group)
+    f.write(struct.pack("<I", 0))
+
+
+def _write_columnar_group(f, group):
+    ranks, names, scores, wins, losses = zip(*group)
+    encoded_names = [name.encode("utf-8") for name in names]
+    f.write(struct.pack("<I", len(group)))
+    f.write(_little_endian(_int32_array(ranks)).tobytes())
+    f.write(_little_endian(array('q', scores)).tobytes())
+    f.write(_little_endian(_int32_array(-1 if w is None else w for w in wins)).tobytes())
+    f.write(_little_endian(_int32_array(-1 if l is None else l for l in losses)).tobytes())
+    f.write(_little_endian(array('I', map(len, encoded_names))).tobytes())
+    f.write(b"".join(encoded_names))
+
+
+def read_columnar(path):
+    """Yields (rank, team_name, score, wins, losses) rows back out of a .tsc export."""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"'{path}' is not a columnar leaderboard export.")
+        while True:
+            (count,) = struct.unpack("<I", f.read(4))
+            if count == 0:
+                return
+            columns = []
+            for typecode in ("i", "q", "i", "i", "I"):
+                column = array(typecode)
+                column.frombytes(f.read(column.itemsize * count))
+                columns.append(_little_endian(column))
+            ranks, scores, wins, losses, name_lengths = columns
+            names_blob = f.read(sum(name_lengths))
+            offset = 0
+            for i in range(count):
+                name = names_blob[offset:offset + name_lengths[i]].decode("utf-8")
+                offset += name_lengths[i]
+                yield (ranks[i], name, scores[i],
+                       None if wins[i] < 0 else wins[i], None if losses[i] < 0 else losses[i])
+
+
+WRITERS = {
+    "csv": (write_csv, {"mode": "w", "newline": ""}),
+    "jsonl": (write_jsonl, {"mode": "w"}),
+    "columnar": (write_columnar, {"mode": "wb"}),
+}
+
+
+# --- Export entry points ---
+def leaderboard_source(engine, event):
+    """Returns (rows, show_wins_losses) for an event, or the overall standings if event is None.
+
+    The rows are a consistent copy taken under engine.lock, so callers on other threads can write them
+    out at their own pace.
+    """
+    with engine.lock:
+        if event is None:
+            return list(engine.overall_rows()), False
+        return list(engine.leaderboard_rows(event)), engine.event_type(event) == TOURNAMENT
+
+
+def export_leaderboard(engine, path, event=None, fmt=None, progress=None):
+    """Streams one leaderboard to path; returns the number of rows written.
+
+    progress, if given, is called as progress(rows_done) every 1,000 rows.
+    """
+    fmt = fmt or format_for_path(path)
+    writer, open_options = WRITERS[fmt]
+    rows, show_wins_losses = leaderboard_source(engine, event)
+    written = 0
+    with open(path, **open_options) as f:
+        for _ in writer(f, rows, show_wins_losses):
+            written += 1
+            if progress and written % 1000 == 0:
+                progress(written)
+    if progress:
+        progress(written)
+    return written
+
+
+def export_all(engine, directory, fmt="csv", progress=None):
+    """Exports the overall standings plus every event's leaderboard into directory.
+
+    Returns {table name: file path}. progress(rows_done) counts rows across all files.
+    """
+    extension = {value: key for key, value in FORMAT_EXTENSIONS.items()}[fmt]
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    done = 0
+
+    def report(rows_in_file):
+        if progress:
+            progress(done + rows_in_file)
+
+    for event in [None] + list(engine.event_details):
+        name = event or OVERALL_NAME
+        path = os.path.join(directory, f"{name}{extension}")
+        done += export_leaderboard(engine, path, event, fmt, report)
+        paths[name] = path
+    return paths
+
+
+class ExportJob(threading.Thread):
+    """Runs an export function on a daemon thread.
+
+    The GUI polls rows_done, total_rows and is_alive() from root.after and reads
+    result or error once the job has finished.
+    """
+
+    def __init__(self, export_function, *args, total_rows=0, **kwargs):
+        super().__init__(daemon=True)
+        self.export_function = export_function
+        self.args = args
+        self.kwargs = kwargs
+        self.total_rows = total_rows
+        self.rows_done = 0
+        self.result = None
+        self.error = None
+
+    def _progress(self, rows_done):
+        self.rows_done = rows_done
+
+    def run(self):
+        try:
+            self.result = self.export_function(*self.args, progress=self._progress, **self.kwargs)
+        except Exception as e:
+            self.error = e
@@ -0,0 +1,252 @@
+"""Permanent, timestamped history of every change to the tournament.
+
+The stores only keep what is needed to load the current state: the journal is
+emptied at every compaction and the JSON and SQLite stores overwrite scores in
+place. HistoryLog keeps every change record the engine commits, in order and
+never rewritten, each stamped with its "time" (seconds since the epoch) and
+"operator" (who made it, when known). Overwritten scores, wiped events and
+undone changes therefore stay visible.
+
+Two files sit next to the data file:
+
+- <data>.history: one change record per line, append-only;
+- <data>.checkpoints: every checkpoint_every records, a full snapshot of the
+  tournament, written as a small header line ({"seq", "time", "offset",
+  "length"}) followed by the snapshot line. offset is where the history file
+  ended when the snapshot was taken, so rebuilding the tournament as it stood at
+  any point loads the nearest earlier snapshot and replays at most about
+  checkpoint_every records, however long the history grows. Opening the log
+  only reads the headers.
+
+HistoryStore wraps another store so the history is written by whichever
+thread writes the saves (BackgroundStore's writer, for the GUI).
+"""
+import collections
+import json
+import os
+import time
+
+HISTORY_SUFFIX = ".history"
+CHECKPOINT_SUFFIX = ".checkpoints"
+CHECKPOINT_EVERY = 200 # History records between snapshots: bounds the replay for a point in time
+
+Checkpoint = collections.namedtuple("Checkpoint", "seq time offset state_offset length")
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":")) + "\n"
+
+
+def _cut_torn_tail(path, start=0):
+    """Reads path from start, truncating a torn last line left by a crash; returns the good lines."""
+    lines = []
+    if not os.path.exists(path):
+        return lines
+    good_offset = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                lines.append(json.loads(line))
+            except ValueError:
+                break
+            good_offset += len(line)
+    if good_offset != os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good_offset)
+    return lines
+
+
+class HistoryLog:
+    """Append-only history of change records plus periodic snapshots for point-in-time replay."""
+
+    def __init__(self, path, checkpoint_every=CHECKPOINT_EVERY):
+        self.path = path + HISTORY_SUFFIX
+        self.checkpoint_path = path + CHECKPOINT_SUFFIX
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints = self._read_checkpoints()
+        last_offset = self.checkpoints[-1].offset if self.checkpoints else 0
+        self.records_since_checkpoint = len(_cut_torn_tail(self.path, min(last_offset, self._size())))
+        self.first_seq = self._first_seq()
+        self._file = None
+
+    def _size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _first_seq(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            line = f.readline()
+        return json.loads(line)["seq"] if line else None
+
+    def _read_checkpoints(self):
+        """Reads the checkpoint headers (skipping the snapshots), dropping one cut short by a crash."""
+        checkpoints = []
+        if not os.path.exists(self.checkpoint_path):
+            return checkpoints
+        size = os.path.getsize(self.checkpoint_path)
+        good_offset = 0
+        with open(self.checkpoint_path, 'rb') as f:
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    header = json.loads(line)
+                except ValueError:
+                    break
+                state_offset = good_offset + len(line)
+                if state_offset + header["length"] > size:
+                    break
+                checkpoints.append(Checkpoint(header["seq"], header["time"], header["offset"], state_offset,
+                                              header["length"]))
+                good_offset = state_offset + header["length"]
+                f.seek(good_offset)
+        if good_offset != size:
+            with open(self.checkpoint_path, 'r+b') as f:
+                f.truncate(good_offset)
+        return checkpoints
+
+    # --- Writing ---
+    def append(self, records, engine):
+        """Adds records to the history, taking a snapshot of engine every checkpoint_every records."""
+        if not records:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write("".join(_dumps(record) for record in records).encode())
+        self._file.flush()
+        if self.first_seq is None:
+            self.first_seq = records[0]["seq"]
+        self.records_since_checkpoint += len(records)
+        # A history that does not start at the first change needs a snapshot to replay from
+        if self.records_since_checkpoint >= self.checkpoint_every or (not self.checkpoints and self.first_seq != 1):
+            self.checkpoint(engine)
+
+    def checkpoint(self, engine):
+        """Writes a snapshot of engine's current state."""
+        state = engine.snapshot()
+        offset = self._file.tell() if self._file is not None else self._size()
+        line = _dumps(state).encode()
+        header = {"seq": state["seq"], "time": time.time(), "offset": offset, "length": len(line)}
+        with open(self.checkpoint_path, 'ab') as f:
+            f.write(_dumps(header).encode())
+            state_offset = f.tell()
+            f.write(line)
+        self.checkpoints.append(Checkpoint(header["seq"], header["time"], offset, state_offset, len(line)))
+        self.records_since_checkpoint = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Reading ---
+    def records(self, offset=0):
+        """Yields the history records from byte offset on, oldest first."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return # Still being written
+                yield json.loads(line)
+
+    def recent(self, limit):
+        """The last limit records, oldest first, read from a nearby checkpoint instead of the whole file."""
+        back = limit // self.checkpoint_every + 2
+        offset = self.checkpoints[-back].offset if len(self.checkpoints) >= back else 0
+        return list(collections.deque(self.records(offset), maxlen=limit))
+
+    def state_at(self, seq=None, at=None):
+        """(snapshot, records) to rebuild the tournament as of change seq and/or time at.
+
+        snapshot is the nearest earlier checkpoint's state (None to start from
+        an empty tournament) and records are the changes to replay on top of it.
+        Raises LookupError if the history does not reach back that far.
+        """
+        base = None
+        for checkpoint in reversed(self.checkpoints):
+            if (seq is None or checkpoint.seq <= seq) and (at is None or checkpoint.time <= at):
+                base = checkpoint
+                break
+        if base is None and self.first_seq not in (None, 1):
+            raise LookupError(f"The history only reaches back to change {self.first_seq}.")
+        state = None
+        if base is not None:
+            with open(self.checkpoint_path, 'rb') as f:
+                f.seek(base.state_offset)
+                state = json.loads(f.read(base.length))
+        base_seq = state["seq"] if state else 0
+        records = []
+        for record in self.records(base.offset if base else 0):
+            if (seq is not None and record["seq"] > seq) or (at is not None and record.get("time", 0) > at):
+                break
+            if record["seq"] > base_seq:
+                records.append(record)
+        return state, records
+
+
+class HistoryStore:
+    """Store wrapper that also appends every committed record to a HistoryLog."""
+
+    def __init__(self, inner, history):
+        self.inner = inner
+        self.history = history
+
+    def load(self):
+        return self.inner.load()
+
+    def commit(self, records, engine):
+        self.inner.commit(records, engine)
+        self.history.append(records, engine)
+
+    def compact(self, engine):
+        self.inner.compact(engine)
+
+    def close(self):
+        self.inner.close()
+        self.history.close()
+
+
+def describe(record):
+    """One line describing a change record, for history lists and undo prompts."""
+    op = record["op"]
+    if op == "initialise_teams":
+        return f"Created {record['num_teams']} empty teams"
+    if op == "import_roster":
+        return (f"{'Replaced the teams with' if record['replace'] else 'Imported'} a roster of "
+                f"{sum(len(members) for _, members in record['teams'])} members in {len(record['teams'])} teams")
+    if op == "add_member":
+        return f"Added {record['member']} to {record['team']}"
+    if op == "remove_member":
+        return f"Removed {record['member']} from {record['team']}"
+    if op == "move_member":
+        return f"Moved {record['member']} from {record['from']} to {record['to']}"
+    if op == "set_members":
+        return f"Set the members of {record['team']}"
+    if op == "select_event":
+        return f"Selected event {record['event']}"
+    if op == "set_multi_event":
+        return f"Multi-event scoring {'on' if record['enabled'] else 'off'}"
+    if op == "record_score":
+        return f"{record['team']}: {record['score']['points']} points in {record['event']}"
+    if op in ("record_scores", "restore_scores"):
+        return f"{'Recorded' if op == 'record_scores' else 'Restored'} {len(record['scores'])} scores"
+    if op == "set_scoring_rule":
+        return f"Scoring rule for {record['event']}: {record['formula'] or 'default'}"
+    if op == "create_bracket":
+        return f"Started a {record['format']} bracket for {record['event']}"
+    if op == "pair_round":
+        return f"Paired the next round of {record['event']}"
+    if op == "record_match":
+        return f"{record['winner']} won match {record['match_id']} in {record['event']}"
+    if op == "restore_bracket":
+        return f"Restored the {record['event']} bracket"
+    if op == "restore":
+        return "Restored all teams and scores"
+    return op
@@ -0,0 +1,221 @@
+"""Timing histograms, counters and optional profiling for the scoring hot paths.
+
+Metrics records how long each named action takes (a GUI handler, a save, a
+store commit on the writer thread) in a Histogram of power-of-two latency
+buckets, so recording costs O(1) and the memory used stays fixed however long
+the event day runs. Percentiles read from the buckets are accurate to within a
+factor of two, which is enough to tell a 2ms save from a 200ms stall; count,
+mean and maximum are exact.
+
+Two optional captures help diagnose a slowdown after the fact:
+
+- profile_actions: actions to run under cProfile. Each action has one
+  profile that every call adds to, written on flush() to
+  <profile_dir>/<action>.prof (read it with python -m pstats).
+- trace_memory: starts tracemalloc and records each action's peak memory
+  growth. Tracing slows every allocation, so leave it off unless memory is
+  the suspect.
+
+Only the outermost measured action on a thread is profiled or memory-traced,
+since nested captures would measure each other.
+
+flush() writes everything to a JSON metrics file (replaced whole each time, so
+a reader never sees half a file). MeasuredStore wraps a store so load, commit
+and compact are timed on whichever thread runs them.
+"""
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+METRICS_FILE = "tournament_metrics.json" # Where the GUI writes its metrics by default
+METRICS_FLUSH_SECONDS = 10.0 # How often the GUI writes the metrics file
+BUCKETS = 32 # Histogram buckets: bucket i holds latencies under 2**i microseconds (the last takes the rest)
+
+
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0 # Seconds
+        self.max = 0.0
+        self.peak_memory = 0 # Largest memory growth seen during one call, in bytes (with trace_memory)
+
+    def add(self, seconds):
+        self.buckets[min(BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls, in seconds (capped at max)."""
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(self.max, (1 << i) / 1e6)
+        return self.max
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "total_ms": round(self.total * 1e3, 3),
+            "mean_ms": round(self.total * 1e3 / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1e3, 3),
+            "p95_ms": round(self.percentile(0.95) * 1e3, 3),
+            "p99_ms": round(self.percentile(0.99) * 1e3, 3),
+            "max_ms": round(self.max * 1e3, 3),
+        }
+        if self.peak_memory:
+            summary["peak_memory_kb"] = round(self.peak_memory / 1024, 1)
+        return summary
+
+
+class Metrics:
+    """Timing histograms and counters by name, safe to record into from any thread."""
+
+    def __init__(self, path=None, profile_actions=(), profile_dir="profiles", trace_memory=False):
+        self.path = path
+        self.profile_actions = set(profile_actions)
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.histograms = {}
+        self.counters = {}
+        self.profiles = {} # action -> cProfile.Profile accumulating every profiled call
+        self.started = time.time()
+        self.last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local() # .depth: measured actions running on this thread
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record(self, name, seconds, memory=0):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+            if memory > histogram.peak_memory:
+                histogram.peak_memory = memory
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """Times the with block as one call of action name."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        profile = None
+        memory_base = None
+        if depth == 0:
+            if name in self.profile_actions:
+                profile = self._profile(name)
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+                memory_base = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+            memory = tracemalloc.get_traced_memory()[1] - memory_base if memory_base is not None else 0
+            self._local.depth = depth
+            self.record(name, elapsed, memory)
+
+    def _profile(self, name):
+        """Enables and returns name's profile, or None if another profiler is already running."""
+        with self._lock:
+            profile = self.profiles.get(name)
+            if profile is None:
+                profile = self.profiles[name] = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError: # Another thread is profiling (Python 3.12+ allows one profiler at a time)
+            return None
+        return profile
+
+    def measure(self, name=None):
+        """Decorator timing every call of a function, as action name (default: the function's name)."""
+        def decorate(function):
+            action = name or function.__name__
+
+            @functools.wraps(function)
+            def measured(*args, **kwargs):
+                with self.timed(action):
+                    return function(*args, **kwargs)
+            return measured
+        return decorate
+
+    # --- Reporting ---
+    def snapshot(self):
+        """{"time", "uptime_s", "actions": {name: summary}, "counters"} for the metrics file or a report."""
+        with self._lock:
+            actions = {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {"time": time.time(), "uptime_s": round(time.time() - self.started, 1),
+                "actions": actions, "counters": counters}
+
+    def summary_lines(self, limit=8):
+        """The actions that took the most time in total, one line each, for the on-screen overlay."""
+        actions = self.snapshot()["actions"]
+        busiest = sorted(actions.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]
+        return [f"{name}: {s['count']}x  p50 {s['p50_ms']:.1f}ms  p95 {s['p95_ms']:.1f}ms  max {s['max_ms']:.1f}ms"
+                for name, s in busiest]
+
+    def flush(self):
+        """Writes the metrics file and any profiles (without fsync: metrics are not worth a disk stall)."""
+        self.last_flush = time.monotonic()
+        if self.path:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(temp_path, self.path)
+        with self._lock:
+            profiles = list(self.profiles.items())
+        if profiles:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for name, profile in profiles:
+                profile.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+
+    def flush_if_due(self, interval=METRICS_FLUSH_SECONDS):
+        if time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+
+class MeasuredStore:
+    """Store wrapper that times load, commit and compact and counts the records committed."""
+
+    def __init__(self, inner, metrics, prefix="store"):
+        self.inner = inner
+        self.metrics = metrics
+        self.prefix = prefix
+
+    def load(self):
+        with self.metrics.timed(f"{self.prefix}.load"):
+            return self.inner.load()
+
+    def commit(self, records, engine):
+        with self.metrics.timed(f"{self.prefix}.commit"):
+            self.inner.commit(records, engine)
+        self.metrics.count(f"{self.prefix}.records", len(records))
+
+    def compact(self, engine):
+        with self.metrics.timed(f"{self.prefix}.compact"):
+            self.inner.compact(engine)
+
+    def close(self):
+        self.inner.close()
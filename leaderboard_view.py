@@ -0,0 +1,148 @@
+"""Virtualised leaderboard widget for the tkinter front end.
+
+Instead of three or four Label widgets per team, the view keeps one small pool
+of canvas text items - just enough rows to fill the visible height - and
+re-points them at whichever slice of the ranking is scrolled into view. Opening
+or refreshing the leaderboard therefore costs the same for 5 teams or 5,000.
+
+While open, the view is fed the engine's change feed (changefeed.py) through
+apply_changes(): only visible rows inside a change's span are re-read, and
+only canvas items whose text differs are touched, so a projector leaderboard
+keeps up with a high rate of results without flicker.
+"""
+import tkinter as tk
+
+from changefeed import RESET
+from scoring_engine import TOURNAMENT
+
+ROW_HEIGHT = 24
+HEADER_FONT = ("Arial", 10, "bold")
+ROW_FONT = ("Arial", 10)
+
+
+class VirtualLeaderboard(tk.Frame):
+    """Scrollable leaderboard that only draws the rows currently visible.
+
+    event=None shows the overall standings (total score across events).
+    """
+
+    def __init__(self, parent, engine, event, row_height=ROW_HEIGHT, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.engine = engine
+        self.row_height = row_height
+        self.first_row = 0 # Leaderboard position drawn in the top slot
+        self.slots = [] # One tuple of canvas text item ids per visible row
+        self.slot_values = [] # Text currently shown in each slot, to skip unchanged items
+        self._set_columns(event)
+
+        self.canvas = tk.Canvas(self, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel) # Windows / macOS
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_to(self.first_row - 3)) # X11
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_to(self.first_row + 3))
+
+    def _set_columns(self, event):
+        self.event = event
+        self.show_wins_losses = bool(event) and self.engine.event_type(event) == TOURNAMENT
+        self.columns = [("Rank", 0.08, "w"), ("Team Name", 0.12, "w"), ("Score", 0.70, "e")]
+        if self.show_wins_losses:
+            self.columns.append(("W/L", 0.85, "e"))
+
+    def set_event(self, event):
+        """Switches the view to another event's leaderboard (None for overall)."""
+        self._set_columns(event)
+        self.first_row = 0
+        self._layout(self.canvas.winfo_width(), self.canvas.winfo_height())
+
+    # --- Layout ---
+    def _on_resize(self, event):
+        self._layout(event.width, event.height)
+
+    def _layout(self, width, height):
+        self.canvas.delete("all")
+        self.slots = []
+        self.slot_values = []
+        for text, x_fraction, anchor in self.columns:
+            self.canvas.create_text(width * x_fraction, self.row_height // 2, text=text,
+                                    anchor=anchor, font=HEADER_FONT)
+        visible_rows = max(1, height // self.row_height - 1)
+        for slot in range(visible_rows):
+            y = (slot + 1) * self.row_height + self.row_height // 2
+            self.slots.append(tuple(
+                self.canvas.create_text(width * x_fraction, y, text="", anchor=anchor, font=ROW_FONT)
+                for _, x_fraction, anchor in self.columns
+            ))
+            self.slot_values.append(("",) * len(self.columns))
+        self.refresh()
+
+    # --- Scrolling ---
+    def scroll_to(self, first_row):
+        last_first_row = max(0, self.engine.team_count() - len(self.slots))
+        first_row = min(max(0, first_row), last_first_row)
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.refresh()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.engine.team_count()))
+        elif action == "scroll":
+            step = len(self.slots) if unit == "pages" else 1
+            self.scroll_to(self.first_row + int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.first_row - (event.delta // 120) * 3)
+
+    # --- Live updates ---
+    def apply_changes(self, changes):
+        """Patches the visible rows touched by a batch of change-feed diffs."""
+        first, last = self.first_row, self.first_row + len(self.slots)
+        start = stop = None
+        for change in changes:
+            if change["type"] == RESET:
+                if change["board"] is None or change["board"] == self.event:
+                    self.refresh()
+                    return
+            elif change["board"] == self.event and change["start"] < last and change["stop"] > first:
+                start = change["start"] if start is None else min(start, change["start"])
+                stop = change["stop"] if stop is None else max(stop, change["stop"])
+        if start is not None:
+            self._draw(max(start, first), min(stop, last))
+
+    # --- Drawing ---
+    def refresh(self):
+        """Re-reads the visible slice of the ranking into the existing row items."""
+        with self.engine.lock: # The scoring server thread may be changing the ranking
+            total = self.engine.team_count()
+            self._draw(self.first_row, self.first_row + len(self.slots))
+        if total:
+            self.scrollbar.set(self.first_row / total, min(1.0, (self.first_row + len(self.slots)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _draw(self, start, stop):
+        """Redraws the slots showing leaderboard positions start..stop-1."""
+        with self.engine.lock: # Read the rows in one go; the generators walk the live ranking
+            if self.event is None:
+                rows = list(self.engine.overall_rows(start, stop))
+            else:
+                rows = list(self.engine.leaderboard_rows(self.event, start, stop))
+        rows = iter(rows)
+        for index in range(start - self.first_row, stop - self.first_row):
+            slot = self.slots[index]
+            row = next(rows, None)
+            if row is None:
+                values = ("",) * len(slot)
+            else:
+                rank, team_name, team_score, wins, losses = row
+                values = (str(rank), team_name, str(team_score))
+                if self.show_wins_losses:
+                    values += (f"{wins}/{losses}",)
+            for item_id, text, shown in zip(slot, values, self.slot_values[index]):
+                if text != shown:
+                    self.canvas.itemconfigure(item_id, text=text)
+            self.slot_values[index] = values
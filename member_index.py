@@ -0,0 +1,150 @@
+"""Index of every team member by normalised name, for registration desks.
+
+Member names are compared by key: Unicode-normalised (NFKC), case-folded and
+with runs of whitespace collapsed, so "Zoë  Smith", "zoë smith" and "ZOË SMITH"
+are the same person. MemberIndex keeps:
+
+- key -> [(name, team)]: O(1) duplicate detection across every team (a list
+  only because data files from before the index may hold the same person
+  twice);
+- the keys in sorted order, so the names starting with what has been typed
+  are found by binary search;
+- trigram -> keys, over each word of the name padded with leading spaces, so
+  a search also finds surnames ("smi" -> "John Smith"), middles of names and
+  near misses ("jon smiht") without scanning every member.
+
+The sorted keys and trigrams are only built on the first search, so loading a
+large tournament pays just for the key -> entries dict.
+"""
+import bisect
+import heapq
+import math
+import unicodedata
+from collections import Counter
+
+FUZZY_MATCH = 0.5 # Fraction of the query's trigrams a fuzzy result must share
+
+# Result ranks, best first
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+def normalise(name):
+    """The key member names are compared by."""
+    if not name.isascii():
+        name = unicodedata.normalize("NFKC", name)
+    return " ".join(name.casefold().split())
+
+
+def trigrams(key, complete=True):
+    """Trigrams of each word of key, padded with two leading spaces (and a trailing one if complete)."""
+    grams = set()
+    for word in key.split(" "):
+        padded = "  " + word + (" " if complete else "")
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class MemberIndex:
+    """Every member's name and team, looked up by normalised name, prefix or trigram."""
+
+    def __init__(self, members=()):
+        self.entries = {} # key -> [(name, team)]
+        self.keys = None # Sorted keys, for prefix search (built by the first search)
+        self.grams = None # trigram -> set of keys (built by the first search)
+        for name, team in members:
+            self.entries.setdefault(normalise(name), []).append((name, team))
+
+    @classmethod
+    def from_keyed(cls, members):
+        """An index over (key, name, team) triples whose keys are already normalise(name), as a binary snapshot stores them."""
+        members = list(members)
+        index = cls()
+        index.entries = {key: [(name, team)] for key, name, team in members}
+        if len(index.entries) < len(members): # Someone listed twice: keep every entry, as __init__ does
+            index.entries = {}
+            for key, name, team in members:
+                index.entries.setdefault(key, []).append((name, team))
+        return index
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+    def __contains__(self, name):
+        return normalise(name) in self.entries
+
+    def find(self, name, team=None):
+        """(name as stored, team) for a member (only in team, if given), or None."""
+        for entry in self.entries.get(normalise(name), ()):
+            if team is None or entry[1] == team:
+                return entry
+        return None
+
+    def add(self, name, team):
+        key = normalise(name)
+        entries = self.entries.get(key)
+        if entries is None:
+            self.entries[key] = [(name, team)]
+            if self.keys is not None:
+                bisect.insort(self.keys, key)
+                for gram in trigrams(key):
+                    self.grams.setdefault(gram, set()).add(key)
+        else:
+            entries.append((name, team))
+
+    def remove(self, name, team):
+        key = normalise(name)
+        entries = self.entries[key]
+        entries.remove((name, team))
+        if entries:
+            return
+        del self.entries[key]
+        if self.keys is None:
+            return
+        del self.keys[bisect.bisect_left(self.keys, key)]
+        for gram in trigrams(key):
+            keys = self.grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self.grams[gram]
+
+    def _build_search(self):
+        self.keys = sorted(self.entries)
+        self.grams = {}
+        for key in self.keys:
+            for gram in trigrams(key):
+                self.grams.setdefault(gram, set()).add(key)
+
+    def search(self, query, limit=20):
+        """[(name, team)] best matching query, best first: exact, name prefix, word prefix, substring, fuzzy."""
+        key = normalise(query)
+        if not key or limit <= 0:
+            return []
+        if self.keys is None:
+            self._build_search()
+        # Names starting with the query come straight off the sorted keys
+        start = bisect.bisect_left(self.keys, key)
+        ranked = []
+        for found in self.keys[start:start + limit]:
+            if not found.startswith(key):
+                break
+            ranked.append(((EXACT if found == key else PREFIX, 0, found), found))
+        if len(ranked) < limit:
+            query_grams = trigrams(key, complete=False)
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self.grams.get(gram, ()))
+            needed = max(1, math.ceil(len(query_grams) * FUZZY_MATCH))
+            prefixed = {found for _, found in ranked}
+            for found, count in shared.items():
+                if count < needed or found in prefixed:
+                    continue
+                if (" " + found).find(" " + key) >= 0:
+                    rank = WORD_PREFIX
+                elif key in found:
+                    rank = SUBSTRING
+                else:
+                    rank = FUZZY
+                ranked.append(((rank, -count, found), found))
+        results = []
+        for _, found in heapq.nsmallest(limit, ranked):
+            results.extend(self.entries[found])
+        return results[:limit]
@@ -0,0 +1,251 @@
+"""Compact in-memory team and score storage for the engine.
+
+The data file keeps one dict per team ({"members", "event_scores",
+"total_score"}) with a dict per score. Held like that in memory, a large
+tournament costs a few hundred bytes per team per event and every whole-field
+pass chases pointers through thousands of small dicts. TeamTable instead gives
+each team an integer id and keeps:
+
+- names and members as lists of interned strings (so a name shared by the
+  ranking, brackets and change records is stored once), with a MemberIndex
+  over every member for cross-team lookups and search;
+- total scores in one array('q');
+- each event's scores in ScoreColumns: parallel wins/losses/points arrays
+  indexed by team id plus a byte per team saying which fields are set. The
+  rarer inputs that only custom scoring rules use (draws, bonus, placement,
+  awarded) are kept in a small per-team dict beside the arrays.
+
+A scored team costs 25 bytes per event, and columns() exposes the arrays as
+buffers that analytics code can wrap without copying (numpy.frombuffer).
+to_dict()/from_dict() convert to and from the unchanged JSON layout.
+"""
+import sys
+from array import array
+
+from member_index import MemberIndex
+
+# ScoreColumns.kind values
+UNSCORED = 0
+POINTS_ONLY = 1 # Elimination-style {"points"}
+WINS_LOSSES = 2 # Tournament-style {"wins", "losses", "points"}
+
+
+def _zeros(size):
+    return array("q", bytes(8 * size))
+
+
+class ScoreColumns:
+    """One event's scores for every team, stored column-wise by team id."""
+
+    __slots__ = ("wins", "losses", "points", "kind", "extras")
+
+    def __init__(self, size=0):
+        self.wins = _zeros(size)
+        self.losses = _zeros(size)
+        self.points = _zeros(size)
+        self.kind = bytearray(size)
+        self.extras = {} # team id -> {input: value} for fields other than wins/losses/points
+
+    def grow(self, size):
+        extra = size - len(self.kind)
+        if extra > 0:
+            for column in (self.wins, self.losses, self.points):
+                column.extend(_zeros(extra))
+            self.kind.extend(bytes(extra))
+
+    def get(self, team_id):
+        """The score_data dict for a team, or None if it has no score."""
+        kind = self.kind[team_id]
+        if kind == UNSCORED:
+            return None
+        score = {"wins": self.wins[team_id], "losses": self.losses[team_id]} if kind == WINS_LOSSES else {}
+        extras = self.extras.get(team_id)
+        if extras:
+            score.update(extras)
+        score["points"] = self.points[team_id]
+        return score
+
+    def set(self, team_id, score_data):
+        self.points[team_id] = score_data["points"]
+        if "wins" in score_data:
+            self.wins[team_id] = score_data["wins"]
+            self.losses[team_id] = score_data["losses"]
+            self.kind[team_id] = WINS_LOSSES
+        else:
+            self.wins[team_id] = self.losses[team_id] = 0
+            self.kind[team_id] = POINTS_ONLY
+        if len(score_data) > (3 if "wins" in score_data else 1):
+            self.extras[team_id] = {key: value for key, value in score_data.items()
+                                    if key not in ("wins", "losses", "points")}
+        elif self.extras:
+            self.extras.pop(team_id, None)
+
+    def clear(self, team_id):
+        self.wins[team_id] = self.losses[team_id] = self.points[team_id] = 0
+        self.kind[team_id] = UNSCORED
+        self.extras.pop(team_id, None)
+
+    def scored_ids(self):
+        """Ids of the teams with a score, in id order."""
+        kind = self.kind
+        return [team_id for team_id in range(len(kind)) if kind[team_id]]
+
+
+class TeamTable:
+    """Every team's members, total and per-event scores, addressed by name or id.
+
+    Iterating, len() and `in` behave like the old dict of teams (names in
+    insertion order), so code that only needs the names is unchanged.
+    """
+
+    __slots__ = ("names", "ids", "members", "totals", "events", "member_index")
+
+    def __init__(self, names=()):
+        self.names = [] # team id -> interned name
+        self.ids = {} # name -> team id
+        self.members = [] # team id -> list of interned member names
+        self.totals = _zeros(0) # team id -> total_score
+        self.events = {} # event -> ScoreColumns
+        self.member_index = MemberIndex() # Every member by normalised name (see member_index.py)
+        for name in names:
+            self.add_team(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def add_team(self, name):
+        name = sys.intern(name)
+        team_id = self.ids[name] = len(self.names)
+        self.names.append(name)
+        self.members.append([])
+        self.totals.append(0)
+        for columns in self.events.values(): # Keep every event's columns sized to the teams
+            columns.grow(len(self.names))
+        return team_id
+
+    # --- Members ---
+    def add_member(self, team_id, member, position=None):
+        member = sys.intern(member)
+        members = self.members[team_id]
+        members.insert(len(members) if position is None else position, member)
+        self.member_index.add(member, self.names[team_id])
+
+    def remove_member(self, team_id, member):
+        """Removes member from the team and returns the position it had."""
+        position = self.members[team_id].index(member)
+        del self.members[team_id][position]
+        self.member_index.remove(member, self.names[team_id])
+        return position
+
+    def set_members(self, team_id, members):
+        team = self.names[team_id]
+        for member in self.members[team_id]:
+            self.member_index.remove(member, team)
+        self.members[team_id] = [sys.intern(member) for member in members]
+        for member in self.members[team_id]:
+            self.member_index.add(member, team)
+
+    # --- Scores ---
+    def score(self, team_id, event):
+        columns = self.events.get(event)
+        return columns.get(team_id) if columns is not None else None
+
+    def has_score(self, team_id, event):
+        columns = self.events.get(event)
+        return columns is not None and columns.kind[team_id] != UNSCORED
+
+    def points(self, team_id, event):
+        columns = self.events.get(event)
+        return columns.points[team_id] if columns is not None else 0
+
+    def set_score(self, team_id, event, score_data):
+        columns = self.events.get(event)
+        if columns is None:
+            columns = self.events[sys.intern(event)] = ScoreColumns(len(self.names))
+        columns.grow(len(self.names))
+        columns.set(team_id, score_data)
+
+    def clear_score(self, team_id, event):
+        columns = self.events.get(event)
+        if columns is not None and team_id < len(columns.kind):
+            columns.clear(team_id)
+
+    def event_scores(self, team_id):
+        """{event: score_data} for every event the team has a score in."""
+        scores = {}
+        for event, columns in self.events.items():
+            score = columns.get(team_id) if team_id < len(columns.kind) else None
+            if score is not None:
+                scores[event] = score
+        return scores
+
+    def clear_scores(self):
+        """Drops every score and total (single-event mode switching events)."""
+        self.events = {}
+        self.totals = _zeros(len(self.names))
+
+    def columns(self, event):
+        """The event's ScoreColumns sized to every team (all zero if nobody has scored)."""
+        columns = self.events.get(event)
+        if columns is None:
+            return ScoreColumns(len(self.names))
+        columns.grow(len(self.names))
+        return columns
+
+    # --- JSON layout ---
+    def team_dict(self, team_id):
+        return {
+            "members": list(self.members[team_id]),
+            "event_scores": self.event_scores(team_id),
+            "total_score": self.totals[team_id]
+        }
+
+    def to_dict(self):
+        """The "teams" mapping of the data file."""
+        return {name: self.team_dict(team_id) for team_id, name in enumerate(self.names)}
+
+    @classmethod
+    def from_columns(cls, names, members, totals, events, member_keys=None):
+        """A table over ready-built columns (e.g. read from a binary snapshot): names and members as lists of
+        strings, totals an array('q') and events {event: ScoreColumns}, all already sized to the teams.
+        member_keys, if given, holds each member's normalised name in the same layout as members."""
+        table = cls()
+        intern = sys.intern
+        table.names = [intern(name) for name in names]
+        table.ids = {name: team_id for team_id, name in enumerate(table.names)}
+        table.members = [[intern(member) for member in team_members] for team_members in members]
+        table.totals = totals
+        table.events = {intern(event): columns for event, columns in events.items()}
+        if member_keys is None:
+            table.member_index = MemberIndex((member, table.names[team_id])
+                                             for team_id, team_members in enumerate(table.members)
+                                             for member in team_members)
+        else:
+            table.member_index = MemberIndex.from_keyed(
+                (key, member, table.names[team_id]) for team_id, (team_members, keys)
+                in enumerate(zip(table.members, member_keys)) for member, key in zip(team_members, keys))
+        return table
+
+    @classmethod
+    def from_dict(cls, teams):
+        table = cls(teams)
+        size = len(table.names)
+        events = table.events
+        intern = sys.intern
+        for team_id, data in enumerate(teams.values()):
+            table.members[team_id] = [intern(member) for member in data.get("members", ())]
+            for event, score_data in data.get("event_scores", {}).items():
+                columns = events.get(event)
+                if columns is None:
+                    columns = events[intern(event)] = ScoreColumns(size)
+                columns.set(team_id, score_data)
+            table.totals[team_id] = data.get("total_score", 0)
+        table.member_index = MemberIndex((member, table.names[team_id])
+                                         for team_id, members in enumerate(table.members) for member in members)
+        return table
@@ -0,0 +1,294 @@
+"""Storage backends for the scoring engine.
+
+A store is handed the list of change records the engine produced since the
+last save, and decides how to make them durable:
+
+- JsonFileStore rewrites the whole tournament_data.json file (the original
+  behaviour), atomically via a temp file and rename.
+- SqliteStore (sqlite_store.py) keeps the tournament in indexed SQLite tables
+  and applies each save as one transaction.
+- JournalStore appends each record as one compact JSON line to a journal next
+  to the data file and only rewrites the full snapshot every so often, so the
+  cost of a save stays proportional to what changed, not to the whole
+  tournament.
+- BinaryStore is JournalStore with its snapshot in the binary .tsb format
+  (binary_snapshot.py), which loads without parsing JSON.
+
+Every store implements load() -> (snapshot_dict_or_None, records_to_replay),
+commit(records, engine), compact(engine) and close(). BackgroundStore wraps any
+of them so commits and compactions happen on a writer thread instead of the
+caller's.
+"""
+import json
+import os
+import queue
+import threading
+
+from binary_snapshot import SNAPSHOT_SUFFIX, capture, read_snapshot, write_snapshot
+from sqlite_store import SqliteStore
+
+JOURNAL_SUFFIX = ".journal"
+COMPACT_EVERY = 500 # Journal records written before the snapshot is rewritten
+SAVE_DEBOUNCE_SECONDS = 0.25 # How long the background writer waits to coalesce a burst of saves
+BACKEND_SUFFIXES = {"sqlite": ".db", "binary": SNAPSHOT_SUFFIX} # The other backends keep a .json data file
+
+
+def atomic_write_json(path, data, indent=4):
+    """Writes data as JSON to path without ever leaving a half-written file behind."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    """Returns the parsed JSON file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class JsonFileStore:
+    """Rewrites the entire JSON data file on every save."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        return read_json(self.path), []
+
+    def commit(self, records, engine):
+        self.compact(engine)
+
+    def compact(self, engine):
+        atomic_write_json(self.path, engine.snapshot())
+
+    def close(self):
+        pass
+
+
+class MemoryStore:
+    """Keeps nothing: for engines that are never saved, such as past states rebuilt from history."""
+
+    def load(self):
+        return None, []
+
+    def commit(self, records, engine):
+        pass
+
+    def compact(self, engine):
+        pass
+
+    def close(self):
+        pass
+
+
+class JournalStore:
+    """Snapshot file plus an append-only journal of change records.
+
+    The snapshot keeps the usual tournament_data.json layout (with an extra
+    "seq" key); the journal holds one record per line. On load the records
+    newer than the snapshot are replayed, and a torn last line left by a crash
+    is cut off so later appends stay readable.
+    """
+
+    def __init__(self, path, compact_every=COMPACT_EVERY, fsync=False):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.records_since_compact = 0
+        self._journal = None
+
+    def _read_snapshot(self):
+        return read_json(self.path)
+
+    def _write_snapshot(self, engine):
+        atomic_write_json(self.path, engine.snapshot())
+
+    def load(self):
+        snapshot = self._read_snapshot()
+        records = []
+        if os.path.exists(self.journal_path):
+            good_offset = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break # Torn write from a crash: everything after it is unreliable
+                    good_offset += len(line)
+            if good_offset != os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(good_offset)
+        self.records_since_compact = len(records)
+        return snapshot, records
+
+    def commit(self, records, engine):
+        if not records:
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a')
+        self._journal.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.records_since_compact += len(records)
+        if self.records_since_compact >= self.compact_every:
+            self.compact(engine)
+
+    def compact(self, engine):
+        """Writes a fresh snapshot and empties the journal."""
+        # The snapshot records the last applied seq, so a crash between these two
+        # steps only leaves journal records that load() will skip.
+        self._write_snapshot(engine)
+        self.close()
+        open(self.journal_path, 'w').close()
+        self.records_since_compact = 0
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class BinaryStore(JournalStore):
+    """JournalStore whose snapshot is a binary .tsb file (binary_snapshot.py) instead of JSON.
+
+    Loading reads the score columns straight out of the mapped file rather than
+    parsing a dict per team and score, which is most of a large tournament's
+    start-up time.
+    """
+
+    def __init__(self, path, **options):
+        if not path.endswith(SNAPSHOT_SUFFIX): # A .tsb written under a .json name would not load as JSON
+            raise ValueError(f"A binary snapshot's file name must end in {SNAPSHOT_SUFFIX}, not '{path}'.")
+        super().__init__(path, **options)
+
+    def _read_snapshot(self):
+        return read_snapshot(self.path)
+
+    def _write_snapshot(self, engine):
+        write_snapshot(self.path, *capture(engine))
+
+
+class BackgroundStore:
+    """Runs another store's commits and compactions on a dedicated writer thread.
+
+    commit() and compact() only queue work, so the caller (the Tk event loop)
+    never waits on the disk. The writer waits debounce seconds after the first
+    queued save so a burst of edits becomes one commit, and retries records
+    from a failed commit with the next one. on_result(ok, message) is called
+    from the writer thread after each write; the GUI hands the result back to
+    the Tk thread itself.
+    """
+
+    def __init__(self, inner, on_result=None, debounce=SAVE_DEBOUNCE_SECONDS):
+        self.inner = inner
+        self.on_result = on_result
+        self.debounce = debounce
+        self._queue = queue.Queue()
+        self._unsaved = [] # Records from failed commits, retried first next time
+        self._engine = None # Engine of the last queued save, needed to retry _unsaved
+        self._thread = threading.Thread(target=self._run, name="persistence-writer", daemon=True)
+        self._thread.start()
+
+    def load(self):
+        return self.inner.load()
+
+    def commit(self, records, engine):
+        if records:
+            self._queue.put(("commit", records, engine))
+
+    def compact(self, engine):
+        self._queue.put(("compact", None, engine))
+
+    def flush(self):
+        """Blocks until everything queued so far has been written."""
+        done = threading.Event()
+        self._queue.put(("flush", done, None))
+        done.wait()
+
+    def close(self):
+        """Writes everything still queued, stops the writer thread and closes the inner store."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(("stop", None, None))
+        self._thread.join()
+        self.inner.close()
+
+    def _run(self):
+        while True:
+            work = [self._queue.get()]
+            if work[0][0] == "commit" and self.debounce:
+                threading.Event().wait(self.debounce) # Let a burst of saves pile up
+            while True:
+                try:
+                    work.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            compact_engine = None
+            flushed = []
+            stop = False
+            for kind, payload, engine in work:
+                if kind == "commit":
+                    records.extend(payload)
+                    self._engine = engine
+                elif kind == "compact":
+                    compact_engine = engine
+                elif kind == "flush":
+                    flushed.append(payload)
+                elif kind == "stop":
+                    stop = True
+
+            if records or self._unsaved:
+                # Committed even when a compaction follows: the snapshot would cover
+                # them, but a wrapped HistoryStore still has to see every record
+                records, self._unsaved = self._unsaved + records, []
+                if not self._write(self.inner.commit, records, self._engine):
+                    self._unsaved = records
+            if compact_engine is not None:
+                self._unsaved = [] # A fresh snapshot contains every record, even those that failed above
+                self._write(self.inner.compact, compact_engine)
+            for done in flushed:
+                done.set()
+            if stop:
+                return
+
+    def _write(self, write, *args):
+        try:
+            write(*args)
+        except Exception as e:
+            if self.on_result:
+                self.on_result(False, str(e))
+            return False
+        if self.on_result:
+            self.on_result(True, None)
+        return True
+
+
+STORE_TYPES = {
+    "json": JsonFileStore,
+    "journal": JournalStore,
+    "sqlite": SqliteStore,
+    "binary": BinaryStore,
+}
+
+
+def default_data_file(backend, stem="tournament_data"):
+    """The data file a backend uses when none is given: stem plus .db (sqlite), .tsb (binary) or .json."""
+    return stem + BACKEND_SUFFIXES.get(backend, ".json")
+
+
+def open_store(backend, path, **options):
+    """Creates the store named by backend ("json", "journal", "sqlite" or "binary") for path."""
+    try:
+        store_type = STORE_TYPES[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(STORE_TYPES)}")
+    return store_type(path, **options)
@@ -0,0 +1,141 @@
+"""Popup windows that are built once and re-shown, for the tkinter front end.
+
+Opening a popup used to build a new Toplevel and every widget in it, and
+the score screen destroyed and re-created its Entry widgets on every change of
+team. ViewCache instead builds each screen the first time it is opened, hides
+it (withdraw) when it is closed and, on every later open, only calls the
+screen's refresh function to re-read the engine. Reopening is therefore about
+as fast as showing a window, and widgets no longer pile up in Tk over a long
+event day.
+
+ScoreInputs does the same for the score fields: the Entry widgets for each
+distinct set of inputs (wins/losses, final points, plus whatever a scoring
+rule adds) are built once and swapped in and out with pack/pack_forget.
+"""
+import contextlib
+import tkinter as tk
+
+from scoring_engine import TOURNAMENT, ELIMINATION
+from scoring_rules import INPUT_LABELS
+
+FIELD_LABELS = {"wins": "Matches Won", "losses": "Matches Lost", "points": "Final Points Awarded"}
+SCORE_FIELDS = ("wins", "losses", "points") # The usual fields, passed to engine.build_score even when unused
+
+
+def set_options(option_menu, variable, options):
+    """Replaces an OptionMenu's choices, keeping variable's value if it is still one of them."""
+    menu = option_menu["menu"]
+    menu.delete(0, tk.END)
+    for option in options:
+        menu.add_command(label=option, command=tk._setit(variable, option))
+    if options and variable.get() not in options:
+        variable.set(options[0])
+
+
+class ViewCache:
+    """Popup windows by name, each built on its first open and hidden instead of destroyed on close."""
+
+    def __init__(self, root, lock=None):
+        self.root = root
+        self.lock = lock if lock is not None else contextlib.nullcontext() # Held while a view reads the engine
+        self.views = {} # name -> (window, refresh)
+
+    def show(self, name, title, build, fullscreen=False):
+        """Shows the view called name, building it first if needed; returns its window.
+
+        build(window) adds the widgets and returns a refresh function, which is
+        called before every showing (including the first) to bring the view up
+        to date with the engine. Closing the window only hides it.
+        """
+        view = self.views.get(name)
+        if view is None or not view[0].winfo_exists():
+            window = tk.Toplevel(self.root)
+            window.withdraw()
+            window.title(title)
+            window.protocol("WM_DELETE_WINDOW", window.withdraw)
+            if fullscreen:
+                # Allow escaping fullscreen for the popup
+                window.bind("<Escape>", lambda e: window.attributes('-fullscreen', False))
+            with self.lock:
+                view = self.views[name] = (window, build(window))
+        window, refresh = view
+        with self.lock:
+            refresh()
+        window.deiconify()
+        if fullscreen:
+            window.attributes('-fullscreen', True)
+        window.lift()
+        window.focus_set()
+        return window
+
+    def refresh_open(self):
+        """Re-reads the engine into every view being shown (after an undo, an import or a new event)."""
+        for window, refresh in self.views.values():
+            if window.winfo_exists() and window.state() != "withdrawn":
+                with self.lock:
+                    refresh()
+
+
+class ScoreInputs(tk.Frame):
+    """The score fields for an event, with one pre-built set of Entry widgets per combination of inputs."""
+
+    def __init__(self, parent, engine, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.engine = engine
+        self.layouts = {} # Field names -> (frame, {field: Entry}, formula label)
+        self.current = None
+
+    def fields_for(self, event):
+        """The fields an event's scores are entered with, in display order."""
+        fields = ()
+        event_type = self.engine.event_type(event)
+        if event_type == TOURNAMENT:
+            fields = ("wins", "losses")
+        elif event_type == ELIMINATION and "awarded" in self.engine.scoring_rule(event).inputs:
+            fields = ("points",)
+        return fields + self.engine.rule_inputs(event)
+
+    def _build(self, fields):
+        frame = tk.Frame(self)
+        entries = {}
+        for name in fields:
+            tk.Label(frame, text=f"{FIELD_LABELS.get(name) or INPUT_LABELS[name]}:").pack(pady=2)
+            entries[name] = tk.Entry(frame)
+            entries[name].pack(pady=2)
+        formula_label = tk.Label(frame, fg="gray")
+        formula_label.pack(pady=2)
+        return frame, entries, formula_label
+
+    @property
+    def entries(self):
+        return self.current[1] if self.current else {}
+
+    def show(self, event, score_data):
+        """Shows the fields for event, filled in from score_data (the team's current score, or {})."""
+        fields = self.fields_for(event)
+        layout = self.layouts.get(fields)
+        if layout is None:
+            layout = self.layouts[fields] = self._build(fields)
+        if layout is not self.current:
+            if self.current:
+                self.current[0].pack_forget()
+            layout[0].pack()
+            self.current = layout
+        frame, entries, formula_label = layout
+        formula_label.config(text=f"Points = {self.engine.scoring_rule(event).formula}")
+        self.clear()
+        if not score_data:
+            return
+        for name, entry in entries.items():
+            value = score_data.get("awarded", score_data.get("points", "")) if name == "points" else score_data.get(name, "")
+            entry.insert(0, str(value))
+
+    def values(self):
+        """The raw field values, as keyword arguments for engine.build_score and record_score."""
+        values = dict.fromkeys(SCORE_FIELDS)
+        values.update((name, entry.get()) for name, entry in self.entries.items())
+        return values
+
+    def clear(self):
+        for entry in self.entries.values():
+            entry.delete(0, tk.END)
@@ -0,0 +1,359 @@
+"""Monte Carlo projections of how a Tournament event will finish, vectorised with NumPy.
+
+While an event's bracket is being played, Projection simulates its remaining
+matches many times and counts where each team finishes, giving each team's
+probability of every final place (and so its chance of a top-three finish).
+
+- The matches simulated are the bracket's remaining_pairings(): the open
+  matches of the current round, plus every later round of a round robin.
+  Swiss and elimination rounds are paired from the results, so for those
+  formats a projection covers the round being played.
+- Team_a wins a simulated match with probability
+  strength_a / (strength_a + strength_b), where a team's strength is its win
+  rate when the projection is made, smoothed towards 50%:
+  (wins + 1) / (played + 2). Pass win_probability(team_a, team_b) to use
+  another model.
+- Final points use the 3-per-win/1-per-loss rule of the bracket standings.
+  Teams level on points share a place, as on the leaderboard (tie-breakers
+  need match details a simulation does not have).
+
+Simulations run a batch at a time as (simulations x matches) arrays and are
+split across worker processes. The outcome of every simulated match is kept,
+one bit each, which makes updates incremental: record_result() conditions the
+existing simulations on a new result instead of starting again. Matches are
+simulated independently, so setting that match to the actual result in every
+simulation still leaves a valid sample of the rest; only the simulations that
+had it going the other way are re-ranked. refresh(engine) does this for every
+newly decided match and only starts again when the event changed in some other
+way (a new round paired, a corrected result, an edited score).
+
+NumPy is optional for the rest of the application and only imported here.
+Command line: python projections.py --data tournament_data.json [--event "Ping Pong Tournament"] [--simulations 100000]
+"""
+import argparse
+import concurrent.futures
+import csv
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError: # Projections are unavailable, the rest of the app still works
+    np = None
+
+from persistence import default_data_file, open_store
+from scoring_engine import TOURNAMENT, ScoringError, TournamentEngine, calculate_tournament_points
+
+DEFAULT_SIMULATIONS = 100_000
+DEFAULT_PLACES = 3 # "Top three" unless asked otherwise
+BATCH_CELLS = 1 << 21 # Simulations x teams ranked at a time, to bound the memory of one batch
+WORKER_CELLS = 1 << 23 # Simulations x teams worth a worker process of their own
+
+WIN_POINTS = calculate_tournament_points(1, 0)
+LOSS_POINTS = calculate_tournament_points(0, 1)
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Projections need NumPy. Install it with: pip install numpy")
+
+
+def form_probability(wins, losses):
+    """The default win_probability(team_a, team_b), from {team: wins} and {team: losses}."""
+    def probability(team_a, team_b):
+        strength_a = (wins[team_a] + 1) / (wins[team_a] + losses[team_a] + 2)
+        strength_b = (wins[team_b] + 1) / (wins[team_b] + losses[team_b] + 2)
+        return strength_a / (strength_a + strength_b)
+    return probability
+
+
+# --- Simulation (module level so worker processes can run it) ---
+def _final_points(base, played, team_a, team_b, outcomes):
+    """Each simulation's final points (simulations x teams), given outcomes[i, k]: team_a won match k.
+
+    played is how many of the matches each team is in; every match is worth
+    LOSS_POINTS to both teams and the difference to its winner.
+    """
+    count, teams = len(outcomes), len(base)
+    winners = np.where(outcomes, team_a, team_b) + (np.arange(count) * teams)[:, None]
+    wins = np.bincount(winners.ravel(), minlength=count * teams).reshape(count, teams)
+    return base + LOSS_POINTS * played + (WIN_POINTS - LOSS_POINTS) * wins
+
+
+def _places(points):
+    """0-based place of every team in each row of points: how many teams have more points.
+
+    Points are whole numbers over a small range, so the places come from a
+    histogram of each row (linear time) rather than sorting it, unless the
+    range is much wider than the field.
+    """
+    count, teams = points.shape
+    values = points - points.min()
+    span = int(values.max()) + 2 if count else 1
+    if span > 4 * teams:
+        order = np.argsort(-points, axis=1, kind="stable")
+        ordered = np.take_along_axis(points, order, axis=1)
+        starts = np.ones(ordered.shape, dtype=bool)
+        starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        positions = np.maximum.accumulate(np.where(starts, np.arange(teams), 0), axis=1)
+        places = np.empty_like(positions)
+        np.put_along_axis(places, order, positions, axis=1)
+        return places
+    cells = values + (np.arange(count) * span)[:, None]
+    histogram = np.bincount(cells.ravel(), minlength=count * span).reshape(count, span)
+    at_least = np.cumsum(histogram[:, ::-1], axis=1)[:, ::-1] # [row, v]: teams on v points or more
+    return at_least.ravel()[cells + 1] # The last column of each row is always 0
+
+
+def _tally(points):
+    """(team x place counts, flattened; points summed per team) over a batch of simulations."""
+    teams = points.shape[1]
+    counts = np.bincount((_places(points) + np.arange(teams) * teams).ravel(), minlength=teams * teams)
+    return counts, points.sum(axis=0)
+
+
+def _batch_size(teams):
+    return max(1, BATCH_CELLS // max(1, teams))
+
+
+def _simulate(job):
+    """Runs one worker's simulations: (packed outcomes, place counts, points sums)."""
+    base, played, team_a, team_b, probabilities, simulations, seed = job
+    rng = np.random.default_rng(seed)
+    teams = len(base)
+    counts = np.zeros(teams * teams, dtype=np.int64)
+    points_sum = np.zeros(teams)
+    packed = []
+    step = _batch_size(teams)
+    for start in range(0, simulations, step):
+        outcomes = rng.random((min(step, simulations - start), len(probabilities))) < probabilities
+        batch_counts, batch_points = _tally(_final_points(base, played, team_a, team_b, outcomes))
+        counts += batch_counts
+        points_sum += batch_points
+        packed.append(np.packbits(outcomes, axis=1))
+    return np.concatenate(packed), counts, points_sum
+
+
+def _condition(job):
+    """Sets match k to the actual result in one worker's simulations and drops it from their outcomes.
+
+    Returns (packed outcomes without match k, change in place counts, change in points sums).
+    """
+    base, played, team_a, team_b, packed, k, a_won = job
+    teams = len(base)
+    outcomes = np.unpackbits(packed, axis=1, count=len(team_a)).astype(bool)
+    flipped = np.flatnonzero(outcomes[:, k] != a_won)
+    # Those simulations had the other team winning: the actual winner gains the difference, the loser drops it
+    winner, loser = (team_a[k], team_b[k]) if a_won else (team_b[k], team_a[k])
+    swing = np.zeros(teams, dtype=np.int64)
+    swing[winner], swing[loser] = WIN_POINTS - LOSS_POINTS, LOSS_POINTS - WIN_POINTS
+    counts = np.zeros(teams * teams, dtype=np.int64)
+    step = _batch_size(teams)
+    for start in range(0, len(flipped), step):
+        points = _final_points(base, played, team_a, team_b, outcomes[flipped[start:start + step]])
+        counts -= _tally(points)[0]
+        counts += _tally(points + swing)[0]
+    outcomes[flipped, k] = a_won
+    return np.packbits(np.delete(outcomes, k, axis=1), axis=1), counts, swing * len(flipped)
+
+
+def _run_jobs(function, jobs, workers):
+    if workers <= 1 or len(jobs) <= 1:
+        return list(map(function, jobs))
+    with concurrent.futures.ProcessPoolExecutor(min(workers, len(jobs))) as executor:
+        return list(executor.map(function, jobs))
+
+
+def _default_workers(cells):
+    return max(1, min(os.cpu_count() or 1, cells // WORKER_CELLS))
+
+
+class Projection:
+    """Place probabilities for one Tournament event, from simulations of its remaining matches.
+
+    teams and points are the event's teams and their points now; matches are
+    the (round, team_a, team_b) still to play, and probabilities the chance
+    team_a wins each of them.
+    """
+
+    def __init__(self, event, teams, points, matches, probabilities, seed=None):
+        require_numpy()
+        self.event = event
+        self.teams = list(teams)
+        self.index = {team: i for i, team in enumerate(self.teams)}
+        self.base = np.asarray(points, dtype=np.int64) # Points so far, plus results applied by record_result
+        self.matches = [tuple(match) for match in matches]
+        self.probabilities = np.asarray(probabilities, dtype=float).reshape(len(self.matches))
+        self.win_probability = None # The model from_engine was given, reused when refresh() starts again
+        self.simulations = 0
+        self.counts = np.zeros((len(self.teams), len(self.teams)), dtype=np.int64) # [team, place]
+        self.points_sum = np.zeros(len(self.teams))
+        self._blocks = [] # Packed outcomes (simulations x matches bits), one block per worker job
+        self._seeds = np.random.SeedSequence(seed)
+        self._index_matches()
+
+    def _index_matches(self):
+        self._team_a = np.array([self.index[a] for _, a, _ in self.matches], dtype=np.int64)
+        self._team_b = np.array([self.index[b] for _, _, b in self.matches], dtype=np.int64)
+        self._played = np.bincount(np.concatenate([self._team_a, self._team_b]), minlength=len(self.teams))
+
+    @classmethod
+    def from_engine(cls, engine, event=None, win_probability=None, seed=None):
+        """A projection (not yet run) of an event's bracket as it stands (the selected event by default)."""
+        with engine.lock:
+            event = event or engine.selected_event
+            if not event:
+                raise ScoringError("No event selected for the tournament.")
+            if engine.event_type(event) != TOURNAMENT:
+                raise ScoringError("Projections are only available for Tournament events.")
+            bracket = engine.bracket(event)
+            teams = list(bracket.teams)
+            matches = bracket.remaining_pairings()
+            scores = [engine.teams.score(engine.teams.ids[team], event) or {} for team in teams]
+        wins = {team: score.get("wins", 0) for team, score in zip(teams, scores)}
+        losses = {team: score.get("losses", 0) for team, score in zip(teams, scores)}
+        probability = win_probability or form_probability(wins, losses)
+        projection = cls(event, teams, [score.get("points", 0) for score in scores], matches,
+                         [probability(a, b) for _, a, b in matches], seed)
+        projection.win_probability = win_probability
+        return projection
+
+    def run(self, simulations=DEFAULT_SIMULATIONS, workers=None):
+        """Adds simulations, split across worker processes (by default as many as the work is worth); returns self."""
+        if simulations < 1:
+            raise ValueError("Run at least one simulation.")
+        workers = min(simulations, workers or _default_workers(simulations * len(self.teams)))
+        sizes = [simulations // workers + (i < simulations % workers) for i in range(workers)]
+        jobs = [(self.base, self._played, self._team_a, self._team_b, self.probabilities, size, seed)
+                for size, seed in zip(sizes, self._seeds.spawn(workers))]
+        for packed, counts, points_sum in _run_jobs(_simulate, jobs, workers):
+            self._blocks.append(packed)
+            self.counts += counts.reshape(self.counts.shape)
+            self.points_sum += points_sum
+        self.simulations += simulations
+        return self
+
+    def record_result(self, team_a, team_b, winner, workers=None):
+        """Conditions the simulations on the result of one of the remaining matches (teams in either order)."""
+        pair = {team_a, team_b}
+        k = next((k for k, (_, a, b) in enumerate(self.matches) if {a, b} == pair), None)
+        if k is None:
+            raise ScoringError(f"{team_a} v {team_b} is not one of the matches being projected.")
+        _, a, b = self.matches[k]
+        if winner not in pair:
+            raise ScoringError(f"'{winner}' is not playing in {a} v {b}.")
+        a_won = winner == a
+        flipped = 1 - self.probabilities[k] if a_won else self.probabilities[k] # Expected share re-ranked
+        workers = workers or _default_workers(int(2 * flipped * self.simulations * len(self.teams)))
+        jobs = [(self.base, self._played, self._team_a, self._team_b, packed, k, a_won) for packed in self._blocks]
+        results = _run_jobs(_condition, jobs, workers)
+        self._blocks = [packed for packed, _, _ in results]
+        for _, counts, points_sum in results:
+            self.counts += counts.reshape(self.counts.shape)
+            self.points_sum += points_sum
+        self.base[self.index[winner]] += WIN_POINTS
+        self.base[self.index[b if a_won else a]] += LOSS_POINTS
+        del self.matches[k]
+        self.probabilities = np.delete(self.probabilities, k)
+        self._index_matches()
+
+    def refresh(self, engine, workers=None):
+        """Brings the projection up to date with the engine; returns the projection to use from now on.
+
+        Results of the matches being simulated are applied with record_result.
+        Anything else that changed the event gives a fresh projection, run with
+        as many simulations as this one.
+        """
+        with engine.lock:
+            bracket = engine.brackets.get(self.event)
+            if bracket is None or list(bracket.teams) != self.teams:
+                current = None
+            else:
+                current = set(bracket.remaining_pairings())
+                winners = {(match.round, match.team_a, match.team_b): match.winner
+                           for match in bracket.matches.values()}
+                points = [(engine.teams.score(engine.teams.ids[team], self.event) or {}).get("points", 0)
+                          for team in self.teams]
+        if current is not None and current <= set(self.matches):
+            for match in [match for match in self.matches if match not in current]:
+                if winners.get(match) is None:
+                    break
+                self.record_result(match[1], match[2], winners[match], workers)
+            else:
+                if np.array_equal(self.base, points):
+                    return self
+        projection = Projection.from_engine(engine, self.event, self.win_probability)
+        return projection.run(self.simulations or DEFAULT_SIMULATIONS, workers)
+
+    # --- Results ---
+    def place_probabilities(self):
+        """{team: [P(1st), P(2nd), ...]}; a shared place counts as the better one."""
+        probabilities = self.counts / max(1, self.simulations)
+        return {team: probabilities[i].tolist() for i, team in enumerate(self.teams)}
+
+    def top_probabilities(self, places=DEFAULT_PLACES):
+        """{team: P(finishing in the top places)}."""
+        probabilities = self.counts[:, :places].sum(axis=1) / max(1, self.simulations)
+        return dict(zip(self.teams, probabilities.tolist()))
+
+    def summary(self, places=DEFAULT_PLACES):
+        """[(team, points now, expected points, P(1st), P(top places), expected place)], likeliest to finish top first."""
+        simulations = max(1, self.simulations)
+        first = self.counts[:, 0] / simulations
+        top = self.counts[:, :places].sum(axis=1) / simulations
+        expected_place = self.counts @ np.arange(1, len(self.teams) + 1) / simulations
+        expected_points = self.points_sum / simulations if self.simulations else self.base
+        rows = [(team, float(self.base[i]), float(expected_points[i]), float(first[i]), float(top[i]),
+                 float(expected_place[i])) for i, team in enumerate(self.teams)]
+        return sorted(rows, key=lambda row: (-row[4], row[5]))
+
+
+def write_summary_csv(rows, path, places=DEFAULT_PLACES):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Team Name", "Points", "Expected Points", "P(1st)", f"P(Top {places})", "Expected Place"])
+        for team, points, expected, first, top, place in rows:
+            writer.writerow([team, f"{points:g}", f"{expected:.2f}", f"{first:.4f}", f"{top:.4f}", f"{place:.2f}"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo projections of a Tournament event's final places.")
+    parser.add_argument("--data", help="Tournament data file (default: tournament_data.json, .db or .tsb by backend)")
+    parser.add_argument("--backend", default="journal", help="Storage backend: json, journal, sqlite or binary")
+    parser.add_argument("--event", help="Tournament event with a match bracket (default: the selected event)")
+    parser.add_argument("--simulations", type=int, default=DEFAULT_SIMULATIONS)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: as many as the work is worth)")
+    parser.add_argument("--places", type=int, default=DEFAULT_PLACES, help="Report the chance of finishing in the top N")
+    parser.add_argument("--seed", type=int, help="Random seed, for repeatable projections")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print")
+    parser.add_argument("--output", help="Write every team's projection to this CSV file")
+    args = parser.parse_args(argv)
+    args.data = args.data or default_data_file(args.backend)
+
+    try:
+        require_numpy()
+        store = open_store(args.backend, args.data)
+        engine = TournamentEngine(args.data, store=store)
+        if not engine.load():
+            print(f"No tournament data found in {args.data}.", file=sys.stderr)
+            return 1
+        store.close()
+        projection = Projection.from_engine(engine, args.event, seed=args.seed)
+        projection.run(args.simulations, args.workers)
+    except (ImportError, ScoringError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    rows = projection.summary(args.places)
+    print(f"{projection.event}: {len(projection.matches)} matches left, {projection.simulations} simulations")
+    print(f"{'Team':<30}{'Points':>8}{'Expected':>10}{'P(1st)':>9}{f'P(Top {args.places})':>10}{'Place':>8}")
+    for team, points, expected, first, top, place in rows[:args.top]:
+        print(f"{team:<30}{points:>8g}{expected:>10.2f}{first:>9.1%}{top:>10.1%}{place:>8.2f}")
+    if args.output:
+        write_summary_csv(rows, args.output, args.places)
+        print(f"Full projection written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
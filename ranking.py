@@ -0,0 +1,92 @@
+"""Incrementally maintained leaderboard index.
+
+The leaderboard used to be rebuilt with sorted(...) on every view. RankingIndex
+keeps the teams in a list sorted by (-score, order), where order is the order
+teams were added, so equal scores keep their team order exactly as the stable
+sort did. A score change finds the old key and the new position with a bisect
+each (O(log n) comparisons), but deleting from and inserting into the list
+shifts the entries after that position, so an update is O(n) in the worst
+case - a memmove of pointers, far cheaper than re-sorting, but not
+logarithmic. Rank lookups are a bisect on the team's current key, O(log n).
+"""
+from bisect import bisect_left, bisect_right, insort
+
+
+class RankingIndex:
+    """Teams ordered by score (highest first) with rank, top-k and range queries."""
+
+    def __init__(self, scores=()):
+        self._entries = [] # Sorted (-score, order, team) tuples
+        self._keys = {} # team -> its current entry
+        self._next_order = 0
+        for team, score in scores:
+            self.update(team, score)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, team):
+        return team in self._keys
+
+    def __iter__(self):
+        """Yields (team, score) from first place down."""
+        for neg_score, _, team in self._entries:
+            yield team, -neg_score
+
+    def clear(self):
+        self._entries = []
+        self._keys = {}
+        self._next_order = 0
+
+    def update(self, team, score):
+        """Adds a team or moves it to its new score's position (O(n): the list shifts on delete and insert)."""
+        old_entry = self._keys.get(team)
+        if old_entry is not None:
+            if -old_entry[0] == score:
+                return
+            del self._entries[bisect_left(self._entries, old_entry)]
+            order = old_entry[1]
+        else:
+            order = self._next_order
+            self._next_order += 1
+        entry = (-score, order, team)
+        insort(self._entries, entry)
+        self._keys[team] = entry
+
+    def discard(self, team):
+        entry = self._keys.pop(team, None)
+        if entry is not None:
+            del self._entries[bisect_left(self._entries, entry)]
+
+    def score_of(self, team):
+        return -self._keys[team][0]
+
+    def rank_of(self, team):
+        """1-based position of team in the leaderboard."""
+        return bisect_left(self._entries, self._keys[team]) + 1
+
+    def score_at(self, position):
+        """Score of the team at a 0-based leaderboard position."""
+        return -self._entries[position][0]
+
+    def score_bounds(self, score):
+        """(first, stop) 0-based positions of the teams on exactly this score."""
+        return bisect_left(self._entries, (-score,)), bisect_right(self._entries, (-score, float("inf")))
+
+    def top(self, k):
+        """The first k (team, score) pairs."""
+        return [(team, -neg_score) for neg_score, _, team in self._entries[:k]]
+
+    def range(self, start, stop=None):
+        """Yields (rank, team, score) for 0-based leaderboard positions start..stop-1."""
+        stop = len(self._entries) if stop is None else min(stop, len(self._entries))
+        for position in range(max(start, 0), stop):
+            neg_score, _, team = self._entries[position]
+            yield position + 1, team, -neg_score
+
+    def score_range(self, low, high):
+        """Yields (team, score) for teams scoring between low and high inclusive, highest first."""
+        start = bisect_left(self._entries, (-high,))
+        stop = bisect_right(self._entries, (-low, float("inf")))
+        for neg_score, _, team in self._entries[start:stop]:
+            yield team, -neg_score
@@ -0,0 +1,139 @@
+"""Roster import: create and fill teams from a registration file.
+
+Reads participants from a .csv, .jsonl or .json file (streamed the same way
+as bulk_import.py) with one participant per row:
+
+- "name": the participant (required);
+- "team": a team to put them in (optional; a new name creates that team);
+- "skill": a rating used when balancing (optional; any numeric column can be
+  named instead, e.g. last season's points).
+
+Participants without a team fill the teams that have room, in order, and new
+teams ("Team N", continuing the numbering) are created as needed. With
+balance=True they are instead dealt out by skill, strongest first, each to
+the team with the lowest total skill that still has room (the greedy
+longest-processing-time rule, using a heap so each placement is O(log teams)).
+That keeps the strongest teams within about one participant's skill of the
+weakest. Members already in a team, and participants without a skill, count
+as the roster's average skill.
+
+Every row is validated before anything changes; a valid roster becomes a
+single change record (engine.import_roster) and a single save.
+"""
+import heapq
+import math
+
+from bulk_import import MAX_REPORTED_ERRORS, BulkImportError, iter_score_rows
+from member_index import normalise
+from scoring_engine import ScoringError, validate_member_name
+
+DEFAULT_SKILL_FIELD = "skill"
+
+
+def read_roster(rows, skill_field=DEFAULT_SKILL_FIELD, max_reported_errors=MAX_REPORTED_ERRORS):
+    """Validates roster rows and returns [(name, team or None, skill or None)], or raises BulkImportError."""
+    skill_field = skill_field.strip().lower() # CSV headers are read in lower case
+    participants = []
+    seen = {} # normalised name -> row number
+    errors = []
+    error_count = 0
+    for row_number, row in rows:
+        try:
+            if not isinstance(row, dict):
+                raise ScoringError("Row must be an object with name/team/skill fields.")
+            name = validate_member_name(str(row.get("name") or ""))
+            key = normalise(name)
+            if key in seen:
+                raise ScoringError(f"'{name}' is already listed on row {seen[key]}.")
+            seen[key] = row_number
+            team = str(row.get("team") or "").strip() or None
+            skill = row.get(skill_field)
+            if skill is None or (isinstance(skill, str) and not skill.strip()):
+                skill = None
+            else:
+                try:
+                    skill = float(skill)
+                except (TypeError, ValueError):
+                    raise ScoringError(f"{skill_field} must be a number.")
+                if not math.isfinite(skill):
+                    raise ScoringError(f"{skill_field} must be a number.")
+            participants.append((name, team, skill))
+        except ScoringError as e:
+            error_count += 1
+            if len(errors) < max_reported_errors:
+                errors.append((row_number, str(e)))
+    if error_count:
+        raise BulkImportError(errors, error_count)
+    return participants
+
+
+def new_team_names(existing, count):
+    """count unused names continuing the "Team N" numbering after the existing teams."""
+    names = []
+    number = len(existing)
+    while len(names) < count:
+        number += 1
+        name = f"Team {number}"
+        if name not in existing:
+            names.append(name)
+    return names
+
+
+def assign_teams(engine, participants, balance=False, num_teams=None, replace=False):
+    """Works out which team each participant joins; returns [(team, [members])] for engine.import_roster.
+
+    num_teams is the total number of teams wanted (default: just enough for
+    everyone at members_per_team each).
+    """
+    capacity = engine.members_per_team
+    current = set() if replace else set(engine.team_names())
+    rosters = {team: [] for team in engine.team_names() if team in current}
+    sizes = {team: len(engine.members(team)) for team in rosters}
+    skills = [skill for _, _, skill in participants if skill is not None]
+    average = sum(skills) / len(skills) if skills else 0.0
+    totals = {team: size * average for team, size in sizes.items()} # Skill already in each team
+    unplaced = []
+    for name, team, skill in participants:
+        skill = average if skill is None else skill
+        if team is None:
+            unplaced.append((skill, name))
+            continue
+        rosters.setdefault(team, []).append(name)
+        sizes[team] = sizes.get(team, 0) + 1
+        totals[team] = totals.get(team, 0.0) + skill
+
+    free = sum(max(0, capacity - size) for size in sizes.values())
+    needed = math.ceil(max(0, len(unplaced) - free) / capacity)
+    if num_teams is not None:
+        if num_teams < len(rosters) + needed:
+            raise ScoringError(f"{len(participants)} participants need at least {len(rosters) + needed} teams "
+                               f"of {capacity}.")
+        needed = num_teams - len(rosters)
+    for team in new_team_names(current | set(rosters), needed):
+        rosters[team] = []
+        sizes[team] = 0
+        totals[team] = 0.0
+
+    # The heap's top is the team the next participant joins: the lowest total
+    # skill when balancing, otherwise simply the first team with room
+    heap = [(totals[team], size, order, team) if balance else (0, 0, order, team)
+            for order, (team, size) in enumerate(sizes.items()) if size < capacity]
+    heapq.heapify(heap)
+    if balance:
+        unplaced.sort(key=lambda participant: -participant[0]) # Strongest first; file order among equals
+    for skill, name in unplaced:
+        total, size, order, team = heapq.heappop(heap)
+        rosters[team].append(name)
+        sizes[team] += 1
+        if sizes[team] < capacity:
+            heapq.heappush(heap, (total + skill, size + 1, order, team) if balance else (total, size, order, team))
+    return [(team, members) for team, members in rosters.items() if members or team not in current]
+
+
+def import_roster(engine, path, balance=False, num_teams=None, replace=False, skill_field=DEFAULT_SKILL_FIELD):
+    """Imports a roster file as one batch and saves once; returns (members added, teams created)."""
+    participants = read_roster(iter_score_rows(path), skill_field)
+    with engine.lock:
+        result = engine.import_roster(assign_teams(engine, participants, balance, num_teams, replace), replace)
+    engine.save()
+    return result
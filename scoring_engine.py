@@ -0,0 +1,1108 @@
+"""Headless tournament scoring engine.
+
+Holds the teams, members, events and scores that the tkinter front end in
+scoring_system.py displays. Nothing in here imports tkinter, so the engine can
+be driven from scripts, tests and benchmarks on a machine with no display.
+"""
+import collections
+import contextlib
+import copy
+import functools
+import threading
+import time
+
+from changefeed import RANK, REORDER, RESET, ChangeFeed
+from model import TeamTable
+from history import describe
+from member_index import normalise
+from persistence import JsonFileStore, MemoryStore, atomic_write_json
+from ranking import RankingIndex
+from scoring_rules import INPUT_LABELS, MAX_POINTS, OPTIONAL_INPUTS, SIGNED_INPUTS, VARIABLES, RuleError, compile_rule
+from tiebreakers import DEFAULT_ORDER, TieBreaker
+
+# --- Configuration Constants ---
+DATA_FILE = "tournament_data.json"
+NUM_TEAMS = 5
+MEMBERS_PER_TEAM = 4
+
+TOURNAMENT = "Tournament"
+ELIMINATION = "Elimination"
+
+POINTS_PER_WIN = 3
+POINTS_PER_LOSS = 1
+
+# Scoring rule of events whose event_details have no "formula" (see scoring_rules.py)
+DEFAULT_FORMULAS = {
+    TOURNAMENT: f"wins * {POINTS_PER_WIN} + losses * {POINTS_PER_LOSS}",
+    ELIMINATION: "awarded",
+}
+
+FEED_BATCH_LIMIT = 256 # Bulk score batches larger than this publish one reset instead of per-team diffs
+UNDO_LIMIT = 100 # Changes that can be undone
+
+
+# Define events with their type and description
+DEFAULT_EVENT_DETAILS = {
+    "Ping Pong Tournament": {
+        "type": TOURNAMENT,
+        "description": "Teams compete in a series of ping pong matches. Points: 3 per match won, 1 per match lost.",
+    },
+    "Video Game Tournament": {
+        "type": TOURNAMENT,
+        "description": "Teams battle it out in a selected video game. Points: 3 per match won, 1 per match lost.",
+    },
+    "College Quiz": {
+        "type": ELIMINATION,
+        "description": "Teams answer a series of general knowledge questions; incorrect answers lead to elimination. Enter the final points awarded based on standing.",
+    },
+    "Spelling Bee": {
+        "type": ELIMINATION,
+        "description": "Teams participate in a spelling challenge. Teams are eliminated for incorrect spellings. Enter the final points awarded based on standing.",
+    },
+    "Scavenger Hunt": {
+        "type": ELIMINATION,
+        "description": "Teams follow clues to find hidden items around campus. Enter the final points awarded based on completion/items found.",
+    }
+}
+
+
+class ScoringError(ValueError):
+    """Raised when a team, member, event or score operation is rejected."""
+
+
+class VersionConflict(ScoringError):
+    """Raised when a write names a team version that another client has already replaced."""
+
+    def __init__(self, team, current_version):
+        self.team = team
+        self.current_version = current_version
+        super().__init__(f"'{team}' was changed by another station (now version {current_version}). Reload and try again.")
+
+
+def locked(method):
+    """Runs an engine method under engine.lock so validation and commit happen atomically."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# --- Score Rules ---
+def calculate_tournament_points(wins, losses):
+    """Points for a Tournament event: 3 per match won, 1 per match lost."""
+    return (wins * POINTS_PER_WIN) + (losses * POINTS_PER_LOSS)
+
+
+def _to_int(value):
+    """Converts an int or a (possibly padded) string to an int.
+
+    Floats are accepted only when whole (JSON clients send 3.0); 2.7 raises
+    ValueError rather than being truncated, and booleans raise TypeError.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+    elif isinstance(value, bool):
+        raise TypeError("expected a number, not a boolean")
+    elif isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not a whole number")
+    return int(value)
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def build_score_data(event_type, wins=None, losses=None, points=None):
+    """Validates raw score fields for an event type and returns the score_data dict.
+
+    Accepts ints or the strings typed into the GUI. Raises ScoringError with the
+    same messages the record score popup shows.
+    """
+    if event_type == TOURNAMENT:
+        if _is_empty(wins) or _is_empty(losses):
+            raise ScoringError("Matches Won/Lost cannot be empty.")
+        try:
+            wins = _to_int(wins)
+            losses = _to_int(losses)
+        except (TypeError, ValueError):
+            raise ScoringError("Matches Won/Lost must be whole numbers.")
+        if wins < 0 or losses < 0:
+            raise ScoringError("Matches Won/Lost cannot be negative.")
+        if max(wins, losses) > MAX_POINTS: # Scores are stored in 64-bit columns (model.py)
+            raise ScoringError(f"Matches Won/Lost cannot be more than {MAX_POINTS:,}.")
+        return {"wins": wins, "losses": losses, "points": calculate_tournament_points(wins, losses)}
+
+    if event_type == ELIMINATION:
+        if _is_empty(points):
+            raise ScoringError("Final Points cannot be empty.")
+        try:
+            points = _to_int(points)
+        except (TypeError, ValueError):
+            raise ScoringError("Points must be a whole number.")
+        if points < 0:
+            raise ScoringError("Points cannot be negative.")
+        if points > MAX_POINTS:
+            raise ScoringError(f"Points cannot be more than {MAX_POINTS:,}.")
+        return {"points": points}
+
+    raise ScoringError(f"Unknown event type '{event_type}'.")
+
+
+def _rule_input(name, value):
+    """Validates one of the extra inputs a custom scoring rule uses (draws, bonus, placement)."""
+    label = INPUT_LABELS[name]
+    if _is_empty(value):
+        if name in OPTIONAL_INPUTS:
+            return 0
+        raise ScoringError(f"{label} cannot be empty.")
+    try:
+        value = _to_int(value)
+    except (TypeError, ValueError):
+        raise ScoringError(f"{label} must be a whole number.")
+    if value < 0 and name not in SIGNED_INPUTS:
+        raise ScoringError(f"{label} cannot be negative.")
+    if abs(value) > MAX_POINTS:
+        raise ScoringError(f"{label} cannot be more than {MAX_POINTS:,} either way." if name in SIGNED_INPUTS else
+                           f"{label} cannot be more than {MAX_POINTS:,}.")
+    return value
+
+
+def check_score_data(score_data):
+    """Rejects score_data that did not come from build_score: a non-dict, missing points, or a field that is
+    not a whole number within MAX_POINTS (the score columns are 64-bit)."""
+    if not isinstance(score_data, dict) or "points" not in score_data:
+        raise ScoringError("A score must have points.")
+    for name, value in score_data.items():
+        if name not in VARIABLES and name != "points":
+            raise ScoringError(f"Unknown score field '{name}'.")
+        if isinstance(value, bool) or not isinstance(value, int) or abs(value) > MAX_POINTS:
+            raise ScoringError(f"Score field '{name}' must be a whole number no larger than {MAX_POINTS:,}.")
+
+
+def build_rule_score(event_type, rule, wins=None, losses=None, points=None, **inputs):
+    """Validates the inputs a compiled scoring rule uses and returns score_data with the rule's points.
+
+    Tournament scores always keep wins and losses; points is the final points
+    typed in for an Elimination event (the rule's `awarded`). The other inputs
+    the rule uses are stored alongside, so the score can be recalculated when
+    the rule changes.
+    """
+    unknown = set(inputs) - set(VARIABLES)
+    if unknown:
+        raise ScoringError(f"Unknown score field '{sorted(unknown)[0]}'.")
+    if event_type == TOURNAMENT:
+        score_data = build_score_data(TOURNAMENT, wins=wins, losses=losses)
+        del score_data["points"]
+    elif event_type == ELIMINATION:
+        score_data = {}
+    else:
+        raise ScoringError(f"Unknown event type '{event_type}'.")
+    values = dict.fromkeys(VARIABLES, 0)
+    values.update(score_data)
+    for name in rule.inputs:
+        if name in score_data:
+            continue
+        if name == "awarded":
+            value = build_score_data(ELIMINATION, points=inputs.get("awarded") if points is None else points)["points"]
+        else:
+            value = _rule_input(name, inputs.get(name))
+        values[name] = score_data[name] = value
+    try:
+        score_data["points"] = rule(values)
+    except RuleError as e:
+        raise ScoringError(str(e))
+    return score_data
+
+
+def validate_member_name(member_name):
+    """Strips a member name and rejects empty or purely numeric names."""
+    member_name = (member_name or "").strip()
+    if not member_name:
+        raise ScoringError("Member name cannot be empty.")
+    if member_name.isdigit():
+        raise ScoringError("Member name cannot be a number.")
+    return member_name
+
+
+def new_team_entry():
+    """Returns the data file's layout for an empty team."""
+    return {
+        "members": [],
+        "event_scores": {},
+        "total_score": 0
+    }
+
+
+class TournamentEngine:
+    """In-memory tournament state plus the rules that mutate it."""
+
+    def __init__(self, data_file=DATA_FILE, num_teams=NUM_TEAMS, members_per_team=MEMBERS_PER_TEAM, store=None,
+                 multi_event=False, history=None):
+        self.data_file = data_file
+        self.store = store or JsonFileStore(data_file)
+        self.history = history # history.HistoryLog the store writes to, for as_of() and history_entries()
+        self.operator = None # Stamped on every change record (see acting_as)
+        self.lock = threading.RLock() # Guards state against background writers and other threads
+        self.num_teams = num_teams
+        self.members_per_team = members_per_team
+        self.teams = TeamTable() # Compact team/score storage (see model.py)
+        self.event_details = copy.deepcopy(DEFAULT_EVENT_DETAILS)
+        self.selected_event = None
+        # Multi-event mode: scores accumulate across events and selecting an event no longer clears them
+        self.multi_event = multi_event
+        self._initial_multi_event = multi_event # What replaying the history from the start begins with
+        self.ranking = RankingIndex() # Teams ordered by total_score, kept up to date by _apply_record
+        self.event_rankings = {} # event -> RankingIndex of teams by points in that event
+        self.event_totals = {} # event -> {"teams_scored": n, "points": sum of points}
+        self.brackets = {} # event -> brackets.Bracket for Tournament events played match by match
+        self.tiebreakers = {} # event -> TieBreaker caching tie-break metrics for that leaderboard
+        self._rules = {} # event -> compiled ScoringRule, recompiled when its formula changes
+        self._overall_ties = TieBreaker() # Overall standings: equal totals share a rank
+        self.seq = 0 # Sequence number of the last applied change record
+        self.team_versions = {} # team -> seq of the last change to it, for optimistic concurrency
+        self._applying_seq = 0 # seq of the record being applied, stamped into team_versions
+        self._pending = [] # Change records not yet handed to the store
+        self.feed = ChangeFeed() # Leaderboard diffs for live views (see changefeed.py)
+        self._changes = None # Diffs collected while a commit is applied, when anyone subscribes
+        self._undo = collections.deque(maxlen=UNDO_LIMIT) # (change record, record that reverts it)
+        self._redo = []
+
+    # --- Queries ---
+    def team_names(self):
+        return list(self.teams)
+
+    def team_count(self):
+        return len(self.teams)
+
+    def has_team(self, team):
+        return team in self.teams
+
+    def members(self, team):
+        return list(self.teams.members[self._team(team)])
+
+    def find_member(self, member_name, team=None):
+        """(team, member name as stored) for a member in any team (or only in team), matched ignoring case
+        and spacing; None if nobody by that name is registered."""
+        with self.lock:
+            found = self.teams.member_index.find(member_name or "", team)
+        return (found[1], found[0]) if found else None
+
+    def search_members(self, query, limit=20):
+        """[(member, team)] whose names best match query: whole name or surname prefix, substring, or near miss."""
+        with self.lock:
+            return [(member, team) for member, team in self.teams.member_index.search(query or "", limit)]
+
+    def event_type(self, event=None):
+        event = event or self.selected_event
+        if event not in self.event_details:
+            raise ScoringError(f"Unknown event '{event}'.")
+        return self.event_details[event]["type"]
+
+    def scoring_rule(self, event=None):
+        """The compiled ScoringRule for an event: its "formula", or the default for its type."""
+        event = event or self.selected_event
+        event_type = self.event_type(event)
+        formula = self.event_details[event].get("formula") or DEFAULT_FORMULAS[event_type]
+        rule = self._rules.get(event)
+        if rule is None or rule.formula != formula:
+            try:
+                rule = self._rules[event] = compile_rule(formula)
+            except RuleError as e:
+                raise ScoringError(f"'{event}': {e}")
+        return rule
+
+    def rule_inputs(self, event=None):
+        """The inputs an event's rule needs beyond the usual fields for its type (e.g. ("draws", "bonus"))."""
+        event = event or self.selected_event
+        usual = ("wins", "losses") if self.event_type(event) == TOURNAMENT else ("awarded",)
+        return tuple(name for name in self.scoring_rule(event).inputs if name not in usual)
+
+    def build_score(self, event=None, wins=None, losses=None, points=None, **inputs):
+        """Validates raw score fields for an event and returns its score_data, applying the event's rule.
+
+        Events without a "formula" use build_score_data, so their stored scores
+        look exactly as they always have.
+        """
+        event = event or self.selected_event
+        if not event:
+            raise ScoringError("No event selected for the tournament.")
+        event_type = self.event_type(event)
+        if not self.event_details[event].get("formula"):
+            if inputs:
+                raise ScoringError(f"Unknown score field '{sorted(inputs)[0]}'.")
+            return build_score_data(event_type, wins=wins, losses=losses, points=points)
+        return build_rule_score(event_type, self.scoring_rule(event), wins, losses, points, **inputs)
+
+    def event_score(self, team, event=None):
+        """Returns the stored score_data for a team and event (empty dict if unscored)."""
+        event = event or self.selected_event
+        return self.teams.score(self._team(team), event) or {}
+
+    def has_score(self, team, event=None):
+        event = event or self.selected_event
+        return self.teams.has_score(self._team(team), event)
+
+    def version_of(self, team):
+        """The team's current version; pass it back as expected_version to detect concurrent edits."""
+        self._team(team)
+        return self.team_versions.get(team, 0)
+
+    def total_score(self, team):
+        return self.teams.totals[self._team(team)]
+
+    def ranked_teams(self):
+        """Returns team names ordered by total score, highest first (ties keep team order)."""
+        return [team for team, _ in self.ranking]
+
+    def rank_of(self, team):
+        """1-based leaderboard position of a team."""
+        self._team(team)
+        return self.ranking.rank_of(team)
+
+    def top_teams(self, k):
+        """The k highest (team, total_score) pairs."""
+        return self.ranking.top(k)
+
+    def event_summary(self, event=None):
+        """Returns {"teams_scored", "points", "average"} for an event, kept up to date on every save."""
+        event = event or self.selected_event
+        totals = self.event_totals.get(event, {"teams_scored": 0, "points": 0})
+        average = totals["points"] / totals["teams_scored"] if totals["teams_scored"] else 0
+        return dict(totals, average=average)
+
+    def leaderboard_rows(self, event=None, start=0, stop=None):
+        """Yields (rank, team_name, score, wins, losses) for the leaderboard of an event.
+
+        The score shown is the team's points for that event; wins and losses are
+        None unless the event is a Tournament. Ties are broken by the event's
+        tie-breakers and teams still level share a rank. start/stop select
+        0-based leaderboard positions, so a view can read just the rows it shows.
+        """
+        event = event or self.selected_event
+        if not event:
+            yield from ((rank, team, 0, None, None) for rank, team, _ in self._overall_ties.rows(self.ranking, start, stop))
+            return
+        is_tournament_event = self.event_details[event]["type"] == TOURNAMENT
+        ranking = self._board_ranking(event)
+        columns = self.teams.columns(event)
+        ids = self.teams.ids
+        for rank, team_name, _ in self._tiebreaker(event).rows(ranking, start, stop):
+            team_id = ids[team_name]
+            wins = losses = None
+            if is_tournament_event:
+                wins = columns.wins[team_id]
+                losses = columns.losses[team_id]
+            yield rank, team_name, columns.points[team_id], wins, losses
+
+    def overall_rows(self, start=0, stop=None):
+        """Yields (rank, team_name, total_score, None, None) for the overall standings."""
+        for rank, team_name, total_score in self._overall_ties.rows(self.ranking, start, stop):
+            yield rank, team_name, total_score, None, None
+
+    # --- Mutations ---
+    # Every public mutation validates its arguments, then builds a change record
+    # and hands it to _commit. _apply_record is the only code that changes state,
+    # so replaying a journal goes through exactly the same path.
+    @locked
+    def initialise_teams(self, num_teams=None):
+        """Replaces all team data with num_teams empty teams named 'Team 1'..'Team N'."""
+        num_teams = self.num_teams if num_teams is None else num_teams
+        self._commit({"op": "initialise_teams", "num_teams": num_teams})
+        return self.team_names()
+
+    @locked
+    def add_member(self, team, member_name):
+        """Adds a member to a team; names are unique across all teams, ignoring case and spacing."""
+        member_name = validate_member_name(member_name)
+        members = self.teams.members[self._team(team)]
+        existing = self.find_member(member_name)
+        if existing:
+            raise ScoringError(f"'{existing[1]}' is already in {existing[0]}.")
+        if len(members) >= self.members_per_team:
+            raise ScoringError(f"{team} already has {self.members_per_team} members.")
+        self._commit({"op": "add_member", "team": team, "member": member_name})
+        return member_name
+
+    @locked
+    def remove_member(self, team, member_name):
+        """Removes a member (matched ignoring case and spacing) and returns the name as it was stored."""
+        member_name = (member_name or "").strip()
+        if not member_name:
+            raise ScoringError("Member name cannot be empty.")
+        self._team(team)
+        found = self.find_member(member_name, team)
+        if found is None:
+            raise ScoringError(f"'{member_name}' not found in {team}.")
+        self._commit({"op": "remove_member", "team": team, "member": found[1]})
+        return found[1]
+
+    @locked
+    def move_member(self, member_name, to_team):
+        """Moves a member from whichever team they are in to to_team; returns (member, from_team)."""
+        self._team(to_team)
+        found = self.find_member((member_name or "").strip())
+        if found is None:
+            raise ScoringError(f"'{member_name}' is not in any team.")
+        from_team, member_name = found
+        if from_team == to_team:
+            raise ScoringError(f"'{member_name}' is already in {to_team}.")
+        if len(self.teams.members[self._team(to_team)]) >= self.members_per_team:
+            raise ScoringError(f"{to_team} already has {self.members_per_team} members.")
+        self._commit({"op": "move_member", "member": member_name, "from": from_team, "to": to_team})
+        return member_name, from_team
+
+    @locked
+    def import_roster(self, teams, replace=False):
+        """Adds whole teams of members as one change record; returns (members added, teams created).
+
+        teams is [(team, [member, ...])]: existing teams get the members added,
+        other names create new teams. With replace, every current team (and its
+        scores) is dropped first, like initialise_teams. Member names must be
+        unique across the whole tournament and no team may exceed
+        members_per_team; nothing is stored if any of them is not.
+        """
+        rosters = {}
+        for team, members in teams:
+            team = (team or "").strip() if isinstance(team, str) else ""
+            if not team:
+                raise ScoringError("Team name cannot be empty.")
+            rosters.setdefault(team, []).extend(validate_member_name(member) for member in members)
+        if not rosters:
+            raise ScoringError("The roster is empty.")
+        seen = {}
+        created = 0
+        for team, members in rosters.items():
+            existing = self.teams.members[self.teams.ids[team]] if team in self.teams and not replace else ()
+            if replace or team not in self.teams:
+                created += 1
+            if len(existing) + len(members) > self.members_per_team:
+                raise ScoringError(f"{team} would have {len(existing) + len(members)} members "
+                                   f"(at most {self.members_per_team}).")
+            for member in members:
+                key = normalise(member)
+                if key in seen:
+                    raise ScoringError(f"'{member}' is listed in both {seen[key]} and {team}.")
+                seen[key] = team
+                registered = None if replace else self.find_member(member)
+                if registered:
+                    raise ScoringError(f"'{registered[1]}' is already in {registered[0]}.")
+        self._commit({"op": "import_roster", "teams": [[team, members] for team, members in rosters.items()],
+                      "replace": bool(replace)})
+        return len(seen), created
+
+    @locked
+    def select_event(self, event_name):
+        """Makes event_name the current event.
+
+        In single-event mode this also clears every team's scores.
+        """
+        if event_name not in self.event_details:
+            raise ScoringError(f"Unknown event '{event_name}'.")
+        self._commit({"op": "select_event", "event": event_name})
+
+    @locked
+    def set_multi_event(self, enabled):
+        """Switches between single-event and cumulative multi-event scoring.
+
+        Totals are recalculated from the stored event scores: the sum over all
+        events in multi-event mode, the selected event's points otherwise.
+        """
+        if bool(enabled) != self.multi_event:
+            self._commit({"op": "set_multi_event", "enabled": bool(enabled)})
+
+    @locked
+    def record_score(self, team, event=None, wins=None, losses=None, points=None, expected_version=None, **inputs):
+        """Validates and stores a team's score for an event, returning the score_data.
+
+        inputs carries any extra fields the event's scoring rule uses (draws,
+        bonus, placement). With expected_version, raises VersionConflict if the
+        team has changed since the caller read it (optimistic concurrency for
+        multiple stations).
+        """
+        event = event or self.selected_event
+        if not event:
+            raise ScoringError("No event selected for the tournament.")
+        self._team(team)
+        if expected_version is not None and expected_version != self.team_versions.get(team, 0):
+            raise VersionConflict(team, self.team_versions.get(team, 0))
+        score_data = self.build_score(event, wins=wins, losses=losses, points=points, **inputs)
+        self._commit({"op": "record_score", "team": team, "event": event, "score": score_data})
+        return dict(score_data)
+
+    @locked
+    def record_scores(self, scores):
+        """Stores many (team, event, score_data) results, as built by build_score, as one change record.
+
+        Used by bulk import so a whole file costs a single journal entry and a
+        single save.
+        """
+        batch = []
+        for team, event, score_data in scores:
+            self._team(team)
+            self.event_type(event)
+            check_score_data(score_data) # Checked before _commit, so a bad row changes nothing
+            batch.append([team, event, dict(score_data)])
+        if batch:
+            self._commit({"op": "record_scores", "scores": batch})
+        return len(batch)
+
+    # --- Scoring rules ---
+    @locked
+    def set_scoring_rule(self, event, formula):
+        """Sets an event's scoring formula (None or "" restores its type's default) and re-scores the field.
+
+        Every team with a score in the event is recalculated from its stored
+        inputs in the same change record; returns how many scores were redone.
+        Raises ScoringError if the formula is invalid or a stored score lacks an
+        input the new rule needs.
+        """
+        event_type = self.event_type(event)
+        formula = (formula or "").strip() or None
+        rule = None
+        if formula:
+            try:
+                rule = compile_rule(formula)
+            except RuleError as e:
+                raise ScoringError(str(e))
+        scores = self._rescored(event, lambda inputs: build_rule_score(event_type, rule, **inputs) if rule else
+                                build_score_data(event_type, inputs.get("wins"), inputs.get("losses"), inputs.get("points")))
+        self._commit({"op": "set_scoring_rule", "event": event, "formula": formula, "scores": scores})
+        return len(scores)
+
+    @locked
+    def rescore_event(self, event=None):
+        """Recalculates every stored score in an event with its current rule; returns how many changed."""
+        event = event or self.selected_event
+        scores = [[team, event, score_data] for team, score_data in self._rescored(event, lambda inputs:
+                  self.build_score(event, **inputs)) if score_data != self.event_score(team, event)]
+        if scores:
+            self._commit({"op": "record_scores", "scores": scores})
+        return len(scores)
+
+    def _rescored(self, event, build):
+        """[[team, score_data]] for every team scored in event, rebuilt by build(stored inputs)."""
+        is_tournament = self.event_type(event) == TOURNAMENT
+        columns = self.teams.events.get(event)
+        scores = []
+        for team_id in (columns.scored_ids() if columns is not None else ()):
+            team = self.teams.names[team_id]
+            inputs = columns.get(team_id)
+            points = inputs.pop("points")
+            if not is_tournament:
+                inputs["points"] = inputs.pop("awarded", points) # Scores from before a rule keep only points
+            try:
+                scores.append([team, build(inputs)])
+            except ScoringError as e:
+                raise ScoringError(f"Cannot re-score {team}: {e}")
+        return scores
+
+    # --- Brackets ---
+    @locked
+    def create_bracket(self, event, fmt, teams=None):
+        """Starts match-level play for a Tournament event and returns the first round's pairings.
+
+        The bracket's teams get their event score reset to 0 wins / 0 losses;
+        from then on their wins, losses and points come from recorded matches.
+        """
+        from brackets import Bracket
+        if self.event_type(event) != TOURNAMENT:
+            raise ScoringError("Match brackets are only available for Tournament events.")
+        teams = self.team_names() if teams is None else list(teams)
+        for team in teams:
+            self._team(team)
+        bracket = Bracket(event, fmt, teams)
+        rows = bracket.generate_round()
+        bracket.add_round(rows)
+        scores = [[team, self.build_score(event, *bracket.record(team)[:2])] for team in teams]
+        self._commit({"op": "create_bracket", "event": event, "format": fmt, "teams": teams,
+                      "matches": rows, "scores": scores})
+        return rows
+
+    @locked
+    def pair_next_round(self, event):
+        """Generates and stores the next round's pairings; returns [] once the bracket is finished."""
+        from brackets import SWISS
+        bracket = self.bracket(event)
+        rows = bracket.generate_round()
+        if rows:
+            # Swiss byes count as a win, so those teams' scores change with the pairing
+            scores = [[row[2], self.build_score(event, bracket.wins[row[2]] + 1, bracket.losses[row[2]])]
+                      for row in rows if row[3] is None and bracket.format == SWISS]
+            self._commit({"op": "pair_round", "event": event, "matches": rows, "scores": scores})
+        return rows
+
+    @locked
+    def record_match(self, event, match_id, winner, score_a=None, score_b=None):
+        """Records (or corrects) one match result and updates both teams' event scores."""
+        bracket = self.bracket(event)
+        effect = bracket.result_effect(match_id, winner)
+        scores = [[team, self.build_score(event, wins, losses)] for team, (wins, losses) in effect.items()]
+        self._commit({"op": "record_match", "event": event, "match_id": match_id, "winner": winner,
+                      "score_a": score_a, "score_b": score_b, "scores": scores})
+        return dict(scores)
+
+    def bracket(self, event=None):
+        event = event or self.selected_event
+        try:
+            return self.brackets[event]
+        except KeyError:
+            raise ScoringError(f"No match bracket has been started for '{event}'.")
+
+    # --- History ---
+    @contextlib.contextmanager
+    def acting_as(self, operator):
+        """Stamps the changes made inside the with block with operator instead of self.operator."""
+        with self.lock:
+            previous, self.operator = self.operator, operator
+            try:
+                yield self
+            finally:
+                self.operator = previous
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_description(self):
+        """What undo() would revert, or None."""
+        return describe(self._undo[-1][0]) if self._undo else None
+
+    def redo_description(self):
+        return describe(self._redo[-1][0]) if self._redo else None
+
+    @locked
+    def undo(self):
+        """Reverts the most recent change not yet undone; returns its description.
+
+        Undoing is itself a change record (stamped like any other), so the
+        history keeps both the change and its reversal. Changes are undone
+        newest first whoever made them, which keeps every reversal exact.
+        """
+        if not self._undo:
+            raise ScoringError("Nothing to undo.")
+        change, record = self._undo.pop()
+        self._redo.append((change, self._commit(record, undoable=False)))
+        return describe(change)
+
+    @locked
+    def redo(self):
+        """Re-applies the change the last undo() reverted; returns its description."""
+        if not self._redo:
+            raise ScoringError("Nothing to redo.")
+        change, record = self._redo.pop()
+        self._undo.append((change, self._commit(record, undoable=False)))
+        return describe(change)
+
+    def history_entries(self, limit=200):
+        """The last limit change records (with "seq", "time" and "operator"), oldest first."""
+        self._sync_history()
+        return self.history.recent(limit)
+
+    def as_of(self, seq=None, at=None):
+        """A separate, unsaved engine holding the tournament as it stood after change seq or at time at.
+
+        Replays from the nearest history checkpoint, so the cost does not grow
+        with the length of the history. Use it to read past standings; changes
+        made to it are never stored.
+        """
+        self._sync_history()
+        try:
+            state, records = self.history.state_at(seq, at)
+        except LookupError as e:
+            raise ScoringError(str(e))
+        past = TournamentEngine(self.data_file, self.num_teams, self.members_per_team, store=MemoryStore(),
+                                multi_event=self._initial_multi_event)
+        past.load_dict(state or {})
+        for record in records:
+            past._apply_record(record)
+        return past
+
+    def _sync_history(self):
+        """Saves pending changes and waits for them to reach the history."""
+        if self.history is None:
+            raise ScoringError("No history is being kept for this tournament.")
+        self.save()
+        flush = getattr(self.store, "flush", None)
+        if flush:
+            flush()
+
+    def _commit(self, record, undoable=True):
+        """Stamps, applies and queues record; returns the record that reverts it."""
+        with self.lock:
+            inverse = self._inverse(record)
+            record["seq"] = self.seq + 1 # self.seq only advances once _apply_record succeeds
+            record["time"] = time.time()
+            if self.operator:
+                record["operator"] = self.operator
+            self._changes = [] if self.feed else None
+            try:
+                self._apply_record(record)
+            finally:
+                changes, self._changes = self._changes, None
+            self._pending.append(record)
+            inverse["undoes"] = self.seq
+            if undoable:
+                self._undo.append((record, inverse))
+                self._redo.clear()
+            if changes:
+                self.feed.publish(self.seq, changes)
+            return inverse
+
+    def _inverse(self, record):
+        """The change record that puts back whatever record is about to change."""
+        op = record["op"]
+        if op in ("add_member", "remove_member", "set_members"):
+            return {"op": "set_members", "team": record["team"], "members": self.members(record["team"])}
+        if op == "move_member":
+            return {"op": "move_member", "member": record["member"], "from": record["to"], "to": record["from"],
+                    "position": self.members(record["from"]).index(record["member"])}
+        if op == "set_multi_event":
+            return {"op": "set_multi_event", "enabled": self.multi_event}
+        if op == "select_event" and self.multi_event:
+            return {"op": "select_event", "event": self.selected_event}
+        if op == "record_score":
+            return self._restore_scores([(record["team"], record["event"])])
+        if op in ("record_scores", "restore_scores"):
+            return self._restore_scores([(team, event) for team, event, _ in record["scores"]])
+        if op == "set_scoring_rule":
+            event = record["event"]
+            return {"op": "set_scoring_rule", "event": event, "formula": self.event_details[event].get("formula"),
+                    "scores": [[team, self.event_score(team, event)] for team, _ in record["scores"]]}
+        if op in ("create_bracket", "pair_round", "record_match", "restore_bracket"):
+            event = record["event"]
+            bracket = self.brackets.get(event)
+            return {"op": "restore_bracket", "event": event,
+                    "bracket": copy.deepcopy(bracket.to_dict()) if bracket else None,
+                    "scores": [[team, self.teams.score(self.teams.ids[team], event)] for team, _ in record["scores"]]}
+        # Changes that reset the whole tournament are reverted with a full copy of it
+        state = self.snapshot()
+        del state["seq"]
+        return {"op": "restore", "state": state}
+
+    def _restore_scores(self, keys):
+        """A restore_scores record putting back the current score (or no score) of each (team, event)."""
+        return {"op": "restore_scores",
+                "scores": [[team, event, self.teams.score(self.teams.ids[team], event)] for team, event in keys]}
+
+    def _apply_record(self, record):
+        op = record["op"]
+        self._applying_seq = record.get("seq", self.seq)
+        if op == "initialise_teams":
+            self.teams = TeamTable(f"Team {i}" for i in range(1, record["num_teams"] + 1))
+            self.brackets = {}
+            self._rebuild_ranking()
+        elif op == "add_member":
+            self.teams.add_member(self.teams.ids[record["team"]], record["member"])
+            self.team_versions[record["team"]] = self._applying_seq
+        elif op == "remove_member":
+            self.teams.remove_member(self.teams.ids[record["team"]], record["member"])
+            self.team_versions[record["team"]] = self._applying_seq
+        elif op == "set_members":
+            self.teams.set_members(self.teams.ids[record["team"]], record["members"])
+            self.team_versions[record["team"]] = self._applying_seq
+        elif op == "move_member":
+            self.teams.remove_member(self.teams.ids[record["from"]], record["member"])
+            self.teams.add_member(self.teams.ids[record["to"]], record["member"], record.get("position"))
+            self.team_versions[record["from"]] = self.team_versions[record["to"]] = self._applying_seq
+        elif op == "import_roster":
+            if record["replace"]:
+                self.teams = TeamTable()
+                self.brackets = {}
+            for team, members in record["teams"]:
+                team_id = self.teams.ids.get(team)
+                if team_id is None:
+                    team_id = self.teams.add_team(team)
+                for member in members:
+                    self.teams.add_member(team_id, member)
+            self._rebuild_ranking()
+        elif op == "select_event":
+            self.selected_event = record["event"]
+            if not self.multi_event:
+                self.teams.clear_scores()
+                self.brackets = {}
+                self._rebuild_ranking()
+        elif op == "set_multi_event":
+            self.multi_event = record["enabled"]
+            for team_id in range(len(self.teams)):
+                self.teams.totals[team_id] = self._recalculated_total(team_id)
+            self._rebuild_ranking()
+        elif op == "record_score":
+            self._apply_score(record["team"], record["event"], dict(record["score"]))
+        elif op in ("record_scores", "restore_scores"):
+            self._apply_scores(record["scores"])
+        elif op == "set_scoring_rule":
+            details = self.event_details[record["event"]]
+            if record["formula"]:
+                details["formula"] = record["formula"]
+            else:
+                details.pop("formula", None)
+            self._apply_scores([(team, record["event"], score_data) for team, score_data in record["scores"]])
+        elif op in ("create_bracket", "pair_round", "record_match"):
+            self._apply_bracket_record(record)
+        elif op == "restore_bracket":
+            self._restore_bracket(record)
+        elif op == "restore":
+            self._load_state(record["state"])
+        else:
+            raise ScoringError(f"Unknown change record '{op}'.")
+        self.seq = max(self.seq, record.get("seq", 0))
+
+    # --- Persistence ---
+    def to_dict(self):
+        """Returns the JSON layout written to the data file."""
+        return {
+            "teams": self.teams.to_dict(),
+            "event_details": self.event_details,
+            "selected_event": self.selected_event,
+            "multi_event": self.multi_event,
+            "brackets": {event: bracket.to_dict() for event, bracket in self.brackets.items()},
+            "seq": self.seq
+        }
+
+    def snapshot(self):
+        """Returns an independent copy of to_dict(), safe to serialise on another thread."""
+        with self.lock:
+            return {
+                "teams": self.teams.to_dict(), # Built fresh, so already independent
+                "event_details": copy.deepcopy(self.event_details),
+                "selected_event": self.selected_event,
+                "multi_event": self.multi_event,
+                "brackets": copy.deepcopy({event: bracket.to_dict() for event, bracket in self.brackets.items()}),
+                "seq": self.seq
+            }
+
+    def load_dict(self, loaded_data):
+        self.seq = self._applying_seq = loaded_data.get("seq", 0)
+        self._load_state(loaded_data)
+        self._pending = []
+
+    def _load_state(self, loaded_data):
+        teams = loaded_data.get("teams", {})
+        # A binary snapshot (binary_snapshot.py) arrives as a ready-built table
+        self.teams = teams if isinstance(teams, TeamTable) else TeamTable.from_dict(teams)
+        # Ensure event_details is updated without overwriting new default events
+        for event_name, details in loaded_data.get("event_details", {}).items():
+            self.event_details[event_name] = dict(details) # A copy: restore records must not change with the engine
+        self.selected_event = loaded_data.get("selected_event", None)
+        self.multi_event = loaded_data.get("multi_event", self.multi_event)
+        from brackets import Bracket
+        self.brackets = {event: Bracket.from_dict(event, data) for event, data in loaded_data.get("brackets", {}).items()}
+        self._rebuild_ranking()
+
+    def save(self, path=None):
+        """Persists the changes made since the last save.
+
+        With path, writes a full JSON copy of the tournament there instead.
+        """
+        if path:
+            atomic_write_json(path, self.snapshot())
+            return
+        with self.lock:
+            records, self._pending = self._pending, []
+        try:
+            self.store.commit(records, self)
+        except Exception:
+            with self.lock:
+                self._pending = records + self._pending # Keep them for the next attempt
+            raise
+
+    def compact(self):
+        """Rewrites the store's full snapshot (for the journal store, also empties the journal)."""
+        with self.lock:
+            records, self._pending = self._pending, []
+        if records and self.history is not None:
+            self.store.commit(records, self) # The snapshot covers them, but the history must still get them
+        self.store.compact(self)
+
+    def load(self, path=None):
+        """Loads the snapshot and replays any journaled changes; returns False if nothing is stored.
+
+        Raises json.JSONDecodeError for a corrupted file and OSError for I/O errors.
+        """
+        store = JsonFileStore(path) if path else self.store
+        snapshot, records = store.load()
+        if snapshot is None and not records:
+            return False
+        self.load_dict(snapshot or {})
+        for record in records:
+            if record.get("seq", 0) > self.seq: # Already folded into the snapshot otherwise
+                self._apply_record(record)
+        with self.lock:
+            self.feed.publish(self.seq, [{"type": RESET, "board": None}])
+        return True
+
+    def _apply_score(self, team, event, score_data):
+        """Stores score_data (None removes the score) and delta-updates the totals and rankings it affects."""
+        teams = self.teams
+        team_id = teams.ids[team]
+        before = self._board_positions(team, event) if self._changes is not None else None
+        old_score = teams.score(team_id, event)
+        old_points = old_score["points"] if old_score else 0
+        if score_data is None:
+            teams.clear_score(team_id, event)
+        else:
+            teams.set_score(team_id, event, score_data)
+        points = score_data["points"] if score_data else 0
+        self.team_versions[team] = self._applying_seq
+        if event in self.tiebreakers:
+            self.tiebreakers[event].invalidate((team,))
+        if self.multi_event:
+            teams.totals[team_id] += points - old_points
+        elif event == self.selected_event:
+            teams.totals[team_id] = points # Total score is just points from this single event
+        self.ranking.update(team, teams.totals[team_id])
+
+        totals = self.event_totals.setdefault(event, {"teams_scored": 0, "points": 0})
+        totals["points"] += points - old_points
+        totals["teams_scored"] += (score_data is not None) - (old_score is not None)
+        if event not in self.event_rankings:
+            self.event_rankings[event] = self._event_ranking(event)
+            if self._changes is not None and not self._shares_overall_board(event):
+                self._changes.append({"type": RESET, "board": event})
+        else:
+            self.event_rankings[event].update(team, points)
+        if before:
+            self._note_rank_changes(team, before)
+
+    def _apply_scores(self, scores):
+        """Applies a batch of (team, event, score_data); big batches publish one reset instead of diffs."""
+        changes = self._changes
+        if changes is not None and len(scores) > FEED_BATCH_LIMIT:
+            self._changes = None
+            changes.append({"type": RESET, "board": None})
+        for team, event, score_data in scores:
+            self._apply_score(team, event, dict(score_data) if score_data is not None else None)
+        self._changes = changes
+
+    def _board_positions(self, team, event):
+        """[(boards, ranking, position, score)] for the rankings a score change to team in event moves."""
+        if self._shares_overall_board(event):
+            boards = [((None, event), self.ranking)]
+        else:
+            boards = [((None,), self.ranking)]
+            if event in self.event_rankings:
+                boards.append(((event,), self.event_rankings[event]))
+        return [(names, ranking, ranking.rank_of(team) - 1, ranking.score_of(team)) if team in ranking
+                else (names, ranking, None, None) for names, ranking in boards]
+
+    def _shares_overall_board(self, event):
+        """True for the selected event in single-event mode, whose leaderboard is the overall ranking."""
+        return not self.multi_event and event == self.selected_event
+
+    def _note_rank_changes(self, team, before):
+        for boards, ranking, old_position, old_score in before:
+            new_position, new_score = ranking.rank_of(team) - 1, ranking.score_of(team)
+            start, stop = self._span(ranking, new_position, new_score)
+            if old_position is not None:
+                old_start, old_stop = self._span(ranking, old_position, old_score)
+                start, stop = min(start, old_start), max(stop, old_stop)
+            for board in boards:
+                self._changes.append({
+                    "type": RANK, "board": board, "team": team,
+                    "old_rank": None if old_position is None else old_position + 1, "new_rank": new_position + 1,
+                    "old_score": old_score, "new_score": new_score, "start": start, "stop": stop,
+                })
+
+    @staticmethod
+    def _span(ranking, position, score):
+        """Positions covering position and the whole tied group on score (whose shared rank may change)."""
+        first, stop = ranking.score_bounds(score)
+        return min(first, position), max(stop, position + 1)
+
+    def _tiebreaker(self, event):
+        tiebreaker = self.tiebreakers.get(event)
+        if tiebreaker is None:
+            order = self.event_details.get(event, {}).get("tiebreakers", DEFAULT_ORDER)
+            tiebreaker = self.tiebreakers[event] = TieBreaker(self.brackets.get(event), order)
+        return tiebreaker
+
+    def _apply_bracket_record(self, record):
+        from brackets import Bracket
+        event = record["event"]
+        if record["op"] == "create_bracket":
+            self.brackets[event] = Bracket(event, record["format"], record["teams"])
+            self.tiebreakers.pop(event, None)
+        if record["op"] == "record_match":
+            bracket = self.brackets[event]
+            match = bracket.matches[record["match_id"]]
+            bracket.apply_result(record["match_id"], record["winner"], record["score_a"], record["score_b"])
+            if event in self.tiebreakers:
+                affected = self.tiebreakers[event].affected_by_match(match.team_a, match.team_b)
+                self.tiebreakers[event].invalidate(affected)
+                if self._changes is not None:
+                    self._note_reorder(event, affected)
+        else:
+            self.brackets[event].add_round(record["matches"])
+            byes = [row[2] for row in record["matches"] if row[3] is None]
+            if byes and event in self.tiebreakers:
+                # A Swiss bye is a win, which also moves its opponents' Buchholz and Sonneborn-Berger
+                tiebreaker = self.tiebreakers[event]
+                affected = set().union(*(tiebreaker.affected_by_match(team, team) for team in byes))
+                tiebreaker.invalidate(affected)
+                if self._changes is not None:
+                    self._note_reorder(event, affected)
+        for team, score_data in record["scores"]:
+            self._apply_score(team, event, dict(score_data))
+
+    def _restore_bracket(self, record):
+        from brackets import Bracket
+        event = record["event"]
+        if record["bracket"] is None:
+            self.brackets.pop(event, None)
+        else:
+            self.brackets[event] = Bracket.from_dict(event, record["bracket"])
+        self.tiebreakers.pop(event, None) # Rebuilt on the next read, with the restored results
+        if self._changes is not None:
+            self._changes.append({"type": RESET, "board": None})
+        self._apply_scores([(team, event, score_data) for team, score_data in record["scores"]])
+
+    def _note_reorder(self, event, teams):
+        """Publishes the tied groups holding teams, whose tie-broken order may have changed."""
+        ranking = self._board_ranking(event)
+        boards = (None, event) if self._shares_overall_board(event) else (event,)
+        for first, stop in {ranking.score_bounds(ranking.score_of(team)) for team in teams if team in ranking}:
+            if stop - first > 1:
+                for board in boards:
+                    self._changes.append({"type": REORDER, "board": board, "start": first, "stop": stop})
+
+    def _board_ranking(self, event):
+        """The ranking an event's leaderboard reads: the overall one for the selected event in single-event
+        mode (total_score is that event's points, so both orders agree), otherwise the event's own."""
+        if self._shares_overall_board(event):
+            return self.ranking
+        with self.lock:
+            if event not in self.event_rankings:
+                self.event_rankings[event] = self._event_ranking(event) # Nobody has scored yet
+            return self.event_rankings[event]
+
+    def _recalculated_total(self, team_id):
+        if self.multi_event:
+            return sum(columns.points[team_id] for columns in self.teams.events.values() if team_id < len(columns.kind))
+        return self.teams.points(team_id, self.selected_event)
+
+    def _event_ranking(self, event):
+        return RankingIndex(zip(self.teams.names, self.teams.columns(event).points))
+
+    def _rebuild_ranking(self):
+        """Rebuilds the overall and per-event rankings and totals from scratch (bulk changes only)."""
+        self.tiebreakers = {}
+        self.team_versions = dict.fromkeys(self.teams, self._applying_seq)
+        if self._changes is not None:
+            self._changes.append({"type": RESET, "board": None})
+        self.ranking = RankingIndex(zip(self.teams.names, self.teams.totals))
+        self.event_totals = {}
+        for event, columns in self.teams.events.items():
+            scored = columns.scored_ids()
+            if scored:
+                self.event_totals[event] = {"teams_scored": len(scored),
+                                            "points": sum(columns.points[team_id] for team_id in scored)}
+        self.event_rankings = {event: self._event_ranking(event) for event in self.event_totals}
+
+    def _team(self, team):
+        try:
+            return self.teams.ids[team]
+        except KeyError:
+            raise ScoringError(f"Unknown team '{team}'.")
@@ -0,0 +1,130 @@
+"""Scoring-rule expressions for events.
+
+An event in event_details can declare how its points are worked out:
+
+    "Ping Pong Tournament": {"type": "Tournament", "formula": "wins * 3 + draws + losses", ...}
+    "Spelling Bee": {"type": "Elimination", "formula": "lookup(placement, {1: 25, 2: 18, 3: 15}, 5) + bonus", ...}
+
+A formula is a Python-style arithmetic expression over these inputs:
+
+- wins, losses: matches won and lost (Tournament events, always entered);
+- draws: matches drawn (defaults to 0);
+- bonus: extra or penalty points, may be negative (defaults to 0);
+- placement: finishing position (1 = first);
+- awarded: the final points typed in for an Elimination event.
+
+It may use numbers, + - * / // %, comparisons, `and`/`or`/`not`,
+`x if condition else y`, and the functions min, max, abs, round, floor, ceil
+and lookup(key, {key: points, ...}, default=0) for placement-to-points tables.
+Anything else (attribute access, other names, other calls, ** ...) is
+rejected when the rule is compiled. Results are rounded to whole points.
+
+compile_rule() validates the expression once and turns it into an ordinary
+Python function, so evaluating a rule per score is a single function call.
+"""
+import ast
+import math
+
+VARIABLES = ("wins", "losses", "draws", "bonus", "placement", "awarded")
+OPTIONAL_INPUTS = ("draws", "bonus") # Default to 0 when not entered
+SIGNED_INPUTS = ("bonus",) # May be negative
+MAX_POINTS = 10 ** 15 # Well inside the 64-bit score columns
+INPUT_LABELS = {
+    "wins": "Matches Won",
+    "losses": "Matches Lost",
+    "draws": "Matches Drawn",
+    "bonus": "Bonus Points",
+    "placement": "Placement",
+    "awarded": "Final Points",
+}
+
+
+def lookup(key, table, default=0):
+    return table.get(key, default)
+
+
+FUNCTIONS = {
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "round": round,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "lookup": lookup,
+}
+
+_OPERATORS = (
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.UAdd, ast.USub, ast.Not,
+    ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.Name,
+          ast.Load, ast.Constant, ast.Dict) + _OPERATORS
+
+
+class RuleError(ValueError):
+    """Raised for a formula that does not parse or uses something not allowed."""
+
+
+class ScoringRule:
+    """A compiled formula: call it with the input values to get the points."""
+
+    __slots__ = ("formula", "inputs", "_function")
+
+    def __init__(self, formula, inputs, function):
+        self.formula = formula
+        self.inputs = inputs # The VARIABLES the formula uses, in VARIABLES order
+        self._function = function
+
+    def __call__(self, values):
+        try:
+            points = self._function(**values)
+        except (ArithmeticError, TypeError) as e:
+            raise RuleError(f"Scoring rule '{self.formula}' failed: {e}")
+        if isinstance(points, bool) or not isinstance(points, (int, float)) or not math.isfinite(points):
+            raise RuleError(f"Scoring rule '{self.formula}' did not produce a number.")
+        if abs(points) > MAX_POINTS:
+            raise RuleError(f"Scoring rule '{self.formula}' gave {points:g} points, which is out of range.")
+        return int(round(points))
+
+
+def _check(node, formula):
+    if not isinstance(node, _NODES):
+        raise RuleError(f"'{type(node).__name__}' is not allowed in a scoring rule: {formula}")
+    if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+        raise RuleError(f"Only numbers are allowed as constants in a scoring rule: {formula}")
+    if isinstance(node, ast.Name) and node.id not in VARIABLES:
+        raise RuleError(f"Unknown name '{node.id}' in scoring rule. Use: {', '.join(VARIABLES)}")
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise RuleError(f"Only {', '.join(FUNCTIONS)} can be called in a scoring rule: {formula}")
+        for argument in node.args:
+            if isinstance(argument, ast.Dict) and node.func.id != "lookup":
+                raise RuleError(f"Points tables are only allowed in lookup(): {formula}")
+            _check(argument, formula)
+        return
+    if isinstance(node, ast.Dict):
+        if not all(isinstance(part, ast.Constant) for part in node.keys + node.values):
+            raise RuleError(f"Points tables may only hold numbers: {formula}")
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Dict):
+            raise RuleError(f"Points tables are only allowed in lookup(): {formula}")
+        _check(child, formula)
+
+
+def compile_rule(formula):
+    """Validates formula and returns a ScoringRule; raises RuleError if it is not allowed."""
+    formula = (formula or "").strip()
+    if not formula:
+        raise RuleError("Scoring rule cannot be empty.")
+    try:
+        tree = ast.parse(formula, mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Scoring rule does not parse: {e.msg}")
+    _check(tree, formula)
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} - set(FUNCTIONS)
+    # Wrap the validated expression in `lambda wins, losses, ...: <expression>`
+    arguments = ast.arguments(posonlyargs=[], args=[ast.arg(arg=name) for name in VARIABLES], kwonlyargs=[],
+                              kw_defaults=[], defaults=[])
+    wrapper = ast.fix_missing_locations(ast.Expression(ast.Lambda(args=arguments, body=tree.body)))
+    function = eval(compile(wrapper, "<scoring rule>", "eval"), {"__builtins__": {}, **FUNCTIONS})
+    return ScoringRule(formula, tuple(name for name in VARIABLES if name in used), function)
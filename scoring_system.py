@@ -1,631 +1,1126 @@
-import tkinter as tk
-from tkinter import messagebox
-from tkinter import filedialog # Import filedialog for saving files
-import json
-import os
-from ctypes import windll
-import csv # Import csv module for CSV operations
-
-# Ensure proper scaling on high-DPI displays
-windll.shcore.SetProcessDpiAwareness(1)
-
-# --- Configuration Constants ---
-DATA_FILE = "tournament_data.json"
-NUM_TEAMS = 5
-MEMBERS_PER_TEAM = 4
-
-
-# Global data structures
-teams_data = {}
-selected_event_for_tournament = None
-
-
-# Define events with their type and description
-event_details = {
-    "Ping Pong Tournament": {
-        "type": "Tournament",
-        "description": "Teams compete in a series of ping pong matches. Points: 3 per match won, 1 per match lost.",
-    },
-    "Video Game Tournament": {
-        "type": "Tournament",
-        "description": "Teams battle it out in a selected video game. Points: 3 per match won, 1 per match lost.",
-    },
-    "College Quiz": {
-        "type": "Elimination",
-        "description": "Teams answer a series of general knowledge questions; incorrect answers lead to elimination. Enter the final points awarded based on standing.",
-    },
-    "Spelling Bee": {
-        "type": "Elimination",
-        "description": "Teams participate in a spelling challenge. Teams are eliminated for incorrect spellings. Enter the final points awarded based on standing.",
-    },
-    "Scavenger Hunt": {
-        "type": "Elimination",
-        "description": "Teams follow clues to find hidden items around campus. Enter the final points awarded based on completion/items found.",
-    }
-}
-
-
-# --- Utility Functions ---
-def center_window(window, width=600, height=None): # Modified: height is now optional
-    screen_width = window.winfo_screenwidth()
-    screen_height = window.winfo_screenheight()
-    
-    # Temporarily set window to be visible but small to get correct dimensions
-    window.update_idletasks() 
-
-    # Calculate actual width/height if not provided, or use provided values
-    if width is None:
-        actual_width = window.winfo_reqwidth()
-    else:
-        actual_width = width
-    
-    if height is None:
-        actual_height = window.winfo_reqheight()
-    else:
-        actual_height = height
-
-    x = (screen_width // 2) - (actual_width // 2)
-    y = (screen_height // 2) - (actual_height // 2)
-    
-    window.geometry(f"{actual_width}x{actual_height}+{x}+{y}")
-
-
-# --- Data Persistence Functions ---
-def save_data():
-    """Saves the current teams_data, event_details, and selected_event to a JSON file."""
-    data_to_save = {
-        "teams": teams_data,
-        "event_details": event_details,
-        "selected_event": selected_event_for_tournament
-    }
-    try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data_to_save, f, indent=4)
-        # Use global status_label (defined in main app setup)
-        status_label.config(text=f"Data saved to {DATA_FILE}", fg="green")
-    except Exception as e:
-        status_label.config(text=f"Error saving data: {e}", fg="red")
-        messagebox.showerror("Save Error", f"Failed to save data:\n{e}")
-
-def load_data():
-    """Loads teams_data, event_details, and selected_event from a JSON file."""
-    global teams_data, event_details, selected_event_for_tournament
-    if not os.path.exists(DATA_FILE):
-        status_label.config(text=f"No existing data file '{DATA_FILE}' found. Starting fresh.", fg="orange")
-        return False
-
-    try:
-        with open(DATA_FILE, 'r') as f:
-            loaded_data = json.load(f)
-        teams_data = loaded_data.get("teams", {})
-        # Ensure event_details is updated without overwriting new default events
-        for event_name, details in loaded_data.get("event_details", {}).items():
-            event_details[event_name] = details
-        selected_event_for_tournament = loaded_data.get("selected_event", None)
-        status_label.config(text=f"Data loaded from {DATA_FILE}", fg="green")
-        if selected_event_for_tournament:
-            current_event_label.config(text=f"Current Event: {selected_event_for_tournament}")
-        return True
-    except json.JSONDecodeError as e:
-        status_label.config(text=f"Error loading data: Invalid JSON format: {e}", fg="red")
-        messagebox.showerror("Load Error", f"Corrupted data file. Failed to load:\n{e}")
-        return False
-    except Exception as e:
-        status_label.config(text=f"Error loading data: {e}", fg="red")
-        messagebox.showerror("Load Error", f"Failed to load data:\n{e}")
-        return False
-
-# --- Core Tournament Management Functions ---
-
-def initialise_teams():
-    if messagebox.askyesno("Confirm Initialisation",
-                            f"This will reset all existing team data and member data. Do you want to initialise {NUM_TEAMS} empty teams?"):
-        global teams_data
-        teams_data = {}
-        for i in range(1, NUM_TEAMS + 1):
-            team_name = f"Team {i}"
-            teams_data[team_name] = {
-                "members": [],
-                "event_scores": {},
-                "total_score": 0
-            }
-        status_label.config(text=f"{NUM_TEAMS} default teams initialised.", fg="blue")
-        save_data()
-
-def manage_teams_popup():
-    popup = tk.Toplevel(root)
-    popup.title("Manage Teams and Members")
-    center_window(popup, 700, 500) # Keep fixed size for team management
-
-    tk.Label(popup, text="Select a Team to Manage:").pack(pady=5)
-
-    team_names = list(teams_data.keys())
-    if not team_names:
-        tk.Label(popup, text="No teams initialised yet. Please initialise teams first.").pack()
-        return
-
-    selected_team_var = tk.StringVar(popup)
-    selected_team_var.set(team_names[0])
-    team_dropdown = tk.OptionMenu(popup, selected_team_var, *team_names)
-    team_dropdown.pack(pady=5)
-
-    current_members_label = tk.Label(popup, text="Current Members: None")
-    current_members_label.pack(pady=5)
-
-    def update_members_display(*args):
-        team = selected_team_var.get()
-        members = teams_data[team]["members"]
-        current_members_label.config(text=f"Current Members ({len(members)}/{MEMBERS_PER_TEAM}): {', '.join(members) if members else 'None'}")
-
-    selected_team_var.trace_add("write", update_members_display)
-    update_members_display()
-
-    tk.Label(popup, text="Add New Member Name:").pack(pady=5)
-    new_member_entry = tk.Entry(popup)
-    new_member_entry.pack(pady=2)
-
-    member_msg_label = tk.Label(popup, text="", fg="red")
-    member_msg_label.pack(pady=5)
-
-    def add_member_to_team():
-        team = selected_team_var.get()
-        member_name = new_member_entry.get().strip()
-
-        if not member_name:
-            member_msg_label.config(text="Member name cannot be empty.", fg="red")
-            return
-        if member_name.isdigit():
-            member_msg_label.config(text="Member name cannot be a number.", fg="red")
-            return
-
-        if member_name in teams_data[team]["members"]:
-            member_msg_label.config(text=f"'{member_name}' is already in {team}.", fg="red")
-            return
-
-        if len(teams_data[team]["members"]) >= MEMBERS_PER_TEAM:
-            member_msg_label.config(text=f"{team} already has {MEMBERS_PER_TEAM} members.", fg="red")
-            return
-
-        teams_data[team]["members"].append(member_name)
-        new_member_entry.delete(0, tk.END)
-        update_members_display()
-        member_msg_label.config(text=f"'{member_name}' added to {team}.", fg="green")
-        save_data()
-
-    tk.Button(popup, text="Add Member", command=add_member_to_team).pack(pady=5)
-
-    tk.Label(popup, text="Remove Member Name:").pack(pady=5)
-    remove_member_entry = tk.Entry(popup)
-    remove_member_entry.pack(pady=2)
-
-    def remove_member_from_team():
-        team = selected_team_var.get()
-        member_name = remove_member_entry.get().strip()
-
-        if not member_name:
-            member_msg_label.config(text="Member name cannot be empty.", fg="red")
-            return
-
-        if member_name not in teams_data[team]["members"]:
-            member_msg_label.config(text=f"'{member_name}' not found in {team}.", fg="red")
-            return
-
-        teams_data[team]["members"].remove(member_name)
-        remove_member_entry.delete(0, tk.END)
-        update_members_display()
-        member_msg_label.config(text=f"'{member_name}' removed from {team}.", fg="green")
-        save_data()
-
-    tk.Button(popup, text="Remove Member", command=remove_member_from_team).pack(pady=5)
-
-
-def select_event_popup():
-    """Shows a popup to view all events and their descriptions, and allows selecting one."""
-    global selected_event_for_tournament
-    popup = tk.Toplevel(root)
-    popup.title("View & Select Tournament Event")
-    
-    # Set the popup to fullscreen
-    popup.attributes('-fullscreen', True)
-    # Allow escaping fullscreen for the popup
-    popup.bind("<Escape>", lambda e: popup.attributes('-fullscreen', False))
-
-    tk.Label(popup, text="Available Events:", font=("Arial", 12, "bold")).pack(pady=10)
-
-    event_options_frame = tk.Frame(popup)
-    event_options_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-
-    selected_event_name_var = tk.StringVar(popup)
-    if selected_event_for_tournament:
-        selected_event_name_var.set(selected_event_for_tournament)
-
-    canvas = tk.Canvas(event_options_frame)
-    scrollbar = tk.Scrollbar(event_options_frame, orient="vertical", command=canvas.yview)
-    scrollable_frame = tk.Frame(canvas)
-
-    scrollable_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(
-            scrollregion=canvas.bbox("all")
-        )
-    )
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
-
-
-    for event_name, details in event_details.items():
-        rb = tk.Radiobutton(scrollable_frame, text=event_name, variable=selected_event_name_var, value=event_name,
-                            font=("Arial", 10, "bold"), anchor="w", justify=tk.LEFT)
-        rb.pack(fill=tk.X, pady=2, padx=5)
-
-        desc_label = tk.Label(scrollable_frame, text=f"Type: {details['type']}\n{details['description']}",
-                              justify=tk.LEFT, wraplength=450, fg="gray")
-        desc_label.pack(fill=tk.X, padx=15, pady=0)
-        tk.Frame(scrollable_frame, height=1, bg="lightgray").pack(fill=tk.X, padx=5, pady=5)
-
-    selection_msg_label = tk.Label(popup, text="", fg="red")
-    selection_msg_label.pack(pady=5)
-
-    button_frame = tk.Frame(popup)
-    button_frame.pack(pady=10)
-
-    def confirm_event_selection():
-        global selected_event_for_tournament
-        chosen_event = selected_event_name_var.get()
-        if chosen_event:
-            confirm = messagebox.askyesno("Confirm Event",
-                                          f"Are you sure you want to select '{chosen_event}' as the primary event for this tournament? This will clear all existing event scores if you previously scored for other events.")
-            if confirm:
-                selected_event_for_tournament = chosen_event
-                current_event_label.config(text=f"Current Event: {selected_event_for_tournament}")
-                status_label.config(text=f"'{chosen_event}' selected as current event.", fg="blue")
-
-                for team_name in teams_data:
-                    teams_data[team_name]["event_scores"] = {} # Clear event_scores
-                    teams_data[team_name]["total_score"] = 0   # Reset total_score
-                save_data()
-                popup.destroy()
-            else:
-                selection_msg_label.config(text="Event selection cancelled.")
-        else:
-            selection_msg_label.config(text="Please select an event.", fg="red")
-
-    tk.Button(button_frame, text="Confirm Selection", command=confirm_event_selection).pack(side=tk.LEFT, padx=5)
-    tk.Button(button_frame, text="Exit", command=popup.destroy).pack(side=tk.LEFT, padx=5)
-
-
-def record_team_score_popup():
-    popup = tk.Toplevel(root)
-    popup.title("Record Team Scores")
-    
-    # Set the popup to fullscreen
-    popup.attributes('-fullscreen', True)
-    # Allow escaping fullscreen for the popup
-    popup.bind("<Escape>", lambda e: popup.attributes('-fullscreen', False))
-
-    global selected_event_for_tournament
-
-    if not selected_event_for_tournament:
-        tk.Label(popup, text="No event selected for the tournament. Please select an event first.").pack(pady=20)
-        return
-    if not teams_data:
-        tk.Label(popup, text="No teams initialised. Please initialise teams first.").pack(pady=20)
-        return
-
-    tk.Label(popup, text=f"Recording scores for: {selected_event_for_tournament}",
-             font=("Arial", 12, "bold"), fg="purple").pack(pady=5)
-
-    tk.Label(popup, text="Select Team:").pack(pady=5)
-    team_names = list(teams_data.keys())
-    selected_team_var = tk.StringVar(popup)
-    selected_team_var.set(team_names[0])
-    team_dropdown = tk.OptionMenu(popup, selected_team_var, *team_names)
-    team_dropdown.pack(pady=5)
-
-    # Frame to hold dynamic input fields (wins/losses or direct points)
-    dynamic_input_frame = tk.Frame(popup)
-    dynamic_input_frame.pack(pady=10)
-
-    score_msg_label = tk.Label(popup, text="", fg="red")
-    score_msg_label.pack(pady=5)
-
-    # These variables will hold the Entry widgets created dynamically
-    wins_entry = None
-    losses_entry = None
-    points_entry = None
-
-    def update_input_fields(*args):
-        nonlocal wins_entry, losses_entry, points_entry # Declare non-local to modify the variables in the outer scope
-
-        # Clear previous widgets from the dynamic frame
-        for widget in dynamic_input_frame.winfo_children():
-            widget.destroy()
-
-        event_type = event_details[selected_event_for_tournament]["type"]
-        team_name = selected_team_var.get() # Get selected team to pre-fill data
-
-        if event_type == "Tournament":
-            tk.Label(dynamic_input_frame, text="Matches Won:").pack(pady=2)
-            wins_entry = tk.Entry(dynamic_input_frame)
-            wins_entry.pack(pady=2)
-            tk.Label(dynamic_input_frame, text="Matches Lost:").pack(pady=2)
-            losses_entry = tk.Entry(dynamic_input_frame)
-            losses_entry.pack(pady=2)
-            
-            # Pre-fill with existing scores if available for this team and event
-            if selected_event_for_tournament in teams_data[team_name]["event_scores"]:
-                event_score_data = teams_data[team_name]["event_scores"][selected_event_for_tournament]
-                wins_entry.insert(0, str(event_score_data.get("wins", "")))
-                losses_entry.insert(0, str(event_score_data.get("losses", "")))
-
-        elif event_type == "Elimination":
-            tk.Label(dynamic_input_frame, text="Final Points Awarded:").pack(pady=2)
-            points_entry = tk.Entry(dynamic_input_frame)
-            points_entry.pack(pady=2)
-            
-            # Pre-fill with existing scores if available
-            if selected_event_for_tournament in teams_data[team_name]["event_scores"]:
-                event_score_data = teams_data[team_name]["event_scores"][selected_event_for_tournament]
-                points_entry.insert(0, str(event_score_data.get("points", "")))
-
-
-    # Bind update function to team selection change
-    selected_team_var.trace_add("write", update_input_fields)
-    update_input_fields() # Initial call to set up fields for the first team
-
-    button_frame_record = tk.Frame(popup)
-    button_frame_record.pack(pady=10)
-
-    def save_team_score():
-        # Ensure entries are not None before trying to get their value
-        if wins_entry is None and points_entry is None: # This should ideally not happen if update_input_fields ran
-            score_msg_label.config(text="Error: Input fields not initialised. Please re-open.", fg="red")
-            return
-
-        team = selected_team_var.get()
-        current_event = selected_event_for_tournament
-        event_type = event_details[current_event]["type"]
-        score_data = {}
-        total_event_points = 0
-
-        score_msg_label.config(text="", fg="red") # Reset message
-
-        if event_type == "Tournament":
-            wins_str = wins_entry.get().strip()
-            losses_str = losses_entry.get().strip()
-
-            if not wins_str or not losses_str:
-                score_msg_label.config(text="Matches Won/Lost cannot be empty.", fg="red")
-                return
-            try:
-                wins = int(wins_str)
-                losses = int(losses_str)
-                if wins < 0 or losses < 0:
-                    score_msg_label.config(text="Matches Won/Lost cannot be negative.", fg="red")
-                    return
-            except ValueError:
-                score_msg_label.config(text="Matches Won/Lost must be numbers.", fg="red")
-                return
-
-            total_event_points = (wins * 3) + (losses * 1)
-            score_data = {"wins": wins, "losses": losses, "points": total_event_points}
-            msg = f"Saved: {team} - {current_event} (Wins: {wins}, Losses: {losses}, Points: {total_event_points})"
-
-        elif event_type == "Elimination":
-            points_str = points_entry.get().strip()
-            if not points_str:
-                score_msg_label.config(text="Final Points cannot be empty.", fg="red")
-                return
-            try:
-                total_event_points = int(points_str)
-                if total_event_points < 0:
-                    score_msg_label.config(text="Points cannot be negative.", fg="red")
-                    return
-            except ValueError:
-                score_msg_label.config(text="Points must be a number.", fg="red")
-                return
-            score_data = {"points": total_event_points}
-            msg = f"Saved: {team} - {current_event} (Points: {total_event_points})"
-
-        # Confirm overwrite if score already exists for this event
-        if current_event in teams_data[team]["event_scores"]:
-            confirm = messagebox.askyesno("Confirm Overwrite",
-                                           f"'{team}' already has a score for '{current_event}'. Overwrite?")
-            if not confirm:
-                score_msg_label.config(text="Score not saved (overwrite cancelled).", fg="blue")
-                return
-
-        teams_data[team]["event_scores"][current_event] = score_data
-        teams_data[team]["total_score"] = total_event_points # Total score is just points from this single event
-
-        score_msg_label.config(text=msg, fg="green")
-        # Clear entries after saving
-        if wins_entry: wins_entry.delete(0, tk.END)
-        if losses_entry: losses_entry.delete(0, tk.END)
-        if points_entry: points_entry.delete(0, tk.END)
-        save_data()
-
-    tk.Button(button_frame_record, text="Save Team Score", command=save_team_score).pack(side=tk.LEFT, padx=5)
-    tk.Button(button_frame_record, text="Exit", command=popup.destroy).pack(side=tk.LEFT, padx=5)
-
-
-def export_leaderboard_to_csv(popup_window, current_event):
-    """Exports the current leaderboard data to a CSV file."""
-    if not teams_data:
-        messagebox.showinfo("Export CSV", "No teams or scores to export.")
-        return
-
-    # Sort teams by total score in descending order
-    sorted_teams = sorted(teams_data.items(), key=lambda item: item[1]["total_score"], reverse=True)
-
-    file_path = filedialog.asksaveasfilename(
-        defaultextension=".csv",
-        filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-        title="Save Leaderboard as CSV",
-        initialfile="tournament_leaderboard.csv"
-    )
-
-    if not file_path:
-        # User cancelled the save dialog
-        return
-
-    try:
-        with open(file_path, 'w', newline='') as csvfile:
-            csv_writer = csv.writer(csvfile)
-
-            # Define headers based on event type
-            headers = ["Rank", "Team Name", "Score"]
-            is_tournament_event = False
-            if current_event and event_details[current_event]["type"] == "Tournament":
-                headers.append("Wins/Losses")
-                is_tournament_event = True
-            
-            csv_writer.writerow(headers)
-
-            display_rank_counter = 1
-            for team_name, data in sorted_teams:
-                current_event_score_info = data["event_scores"].get(current_event, {})
-                team_score = current_event_score_info.get("points", 0)
-
-                row = [display_rank_counter, team_name, team_score]
-                if is_tournament_event:
-                    wins = current_event_score_info.get("wins", 0)
-                    losses = current_event_score_info.get("losses", 0)
-                    row.append(f"{wins}/{losses}")
-                
-                csv_writer.writerow(row)
-                display_rank_counter += 1
-        
-        messagebox.showinfo("Export CSV", f"Leaderboard successfully exported to:\n{file_path}")
-        status_label.config(text=f"Leaderboard exported to {os.path.basename(file_path)}", fg="green")
-    except Exception as e:
-        messagebox.showerror("Export CSV Error", f"Failed to export leaderboard:\n{e}")
-        status_label.config(text=f"Error exporting leaderboard: {e}", fg="red")
-
-
-def show_leaderboard_popup():
-    popup = tk.Toplevel(root)
-    popup.title("Overall Leaderboard")
-    
-    # Set the popup to fullscreen
-    popup.attributes('-fullscreen', True)
-    # Allow escaping fullscreen for the popup
-    popup.bind("<Escape>", lambda e: popup.attributes('-fullscreen', False))
-
-    if not teams_data:
-        tk.Label(popup, text="No teams or scores recorded yet.").pack()
-        tk.Button(popup, text="Exit", command=popup.destroy).pack(pady=10) # Exit button for empty state
-        return
-
-    # Sort teams by total score in descending order
-    sorted_teams = sorted(teams_data.items(), key=lambda item: item[1]["total_score"], reverse=True)
-
-    tk.Label(popup, text="Tournament Leaderboard:", font=("Arial", 14, "bold")).pack(pady=10)
-    if selected_event_for_tournament:
-        tk.Label(popup, text=f"For Event: {selected_event_for_tournament}", font=("Arial", 10)).pack(pady=2)
-
-    leaderboard_frame = tk.Frame(popup)
-    leaderboard_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-
-    # Headers
-    tk.Label(leaderboard_frame, text="Rank", font=("Arial", 10, "bold"), anchor="w").grid(row=0, column=0, padx=5, pady=2)
-    tk.Label(leaderboard_frame, text="Team Name", font=("Arial", 10, "bold"), anchor="w").grid(row=0, column=1, padx=5, pady=2)
-    tk.Label(leaderboard_frame, text="Score", font=("Arial", 10, "bold"), anchor="e").grid(row=0, column=2, padx=5, pady=2)
-
-    # Conditionally add "Wins/Losses" header if it's a Tournament event
-    if selected_event_for_tournament and event_details[selected_event_for_tournament]["type"] == "Tournament":
-        tk.Label(leaderboard_frame, text="W/L", font=("Arial", 10, "bold"), anchor="e").grid(row=0, column=3, padx=5, pady=2)
-
-
-    display_rank_counter = 1
-    for team_name, data in sorted_teams:
-        current_event_score_info = data["event_scores"].get(selected_event_for_tournament, {})
-        team_score = current_event_score_info.get("points", 0) # Get score for the selected event
-
-        display_text_extra = ""
-        # Only show wins/losses if it's the selected tournament event type
-        if selected_event_for_tournament and event_details[selected_event_for_tournament]["type"] == "Tournament":
-            wins = current_event_score_info.get("wins", 0)
-            losses = current_event_score_info.get("losses", 0)
-            display_text_extra = f"{wins}/{losses}"
-
-        tk.Label(leaderboard_frame, text=str(display_rank_counter), anchor="w").grid(row=display_rank_counter, column=0, padx=5, pady=2)
-        tk.Label(leaderboard_frame, text=team_name, anchor="w").grid(row=display_rank_counter, column=1, padx=5, pady=2)
-        tk.Label(leaderboard_frame, text=str(team_score), anchor="e").grid(row=display_rank_counter, column=2, padx=5, pady=2)
-        if display_text_extra: # Only display the extra column if it's applicable
-            tk.Label(leaderboard_frame, text=display_text_extra, anchor="e").grid(row=display_rank_counter, column=3, padx=5, pady=2)
-        display_rank_counter += 1
-    
-    # Buttons for leaderboard
-    leaderboard_button_frame = tk.Frame(popup)
-    leaderboard_button_frame.pack(pady=10)
-    tk.Button(leaderboard_button_frame, text="Export to CSV", command=lambda: export_leaderboard_to_csv(popup, selected_event_for_tournament)).pack(side=tk.LEFT, padx=5)
-    tk.Button(leaderboard_button_frame, text="Exit", command=popup.destroy).pack(side=tk.LEFT, padx=5)
-
-
-# --- Main Application Window Setup ---
-root = tk.Tk()
-root.title("Tournament Scoring System")
-root.attributes('-fullscreen', True)  # Enable fullscreen
-
-# Optional: Escape to exit fullscreen
-root.bind("<Escape>", lambda e: root.attributes('-fullscreen', False))
-
-# --- Top: Explanation Text ---
-explanation_label = tk.Label(root, text=(
-    "This application manages a team-based tournament.\n"
-    "Phase 1: Create and manage teams.\n"
-    "Phase 2: Select the main event and record scores.\n"
-    "Phase 3: View rankings based on scores entered.\n"
-    "Use Save to back up progress or Exit to quit the application."
-), font=("Arial", 12), justify="center", pady=10)
-explanation_label.pack(pady=20)
-
-# --- Status & Current Event Info ---
-status_label = tk.Label(root, text="", fg="blue", font=("Arial", 10))
-status_label.pack(pady=5)
-
-current_event_label = tk.Label(root, text="Current Event: Not Selected", font=("Arial", 10, "italic"))
-current_event_label.pack(pady=5)
-
-load_data()
-
-# --- Main Button Area Container ---
-button_container = tk.Frame(root)
-button_container.pack(side="bottom", pady=40)
-
-# --- Phase 1: Team Setup ---
-phase1 = tk.LabelFrame(button_container, text="Phase 1: Teams", padx=10, pady=10)
-phase1.pack(side="left", padx=30)
-tk.Button(phase1, text="Create Team Data", command=initialise_teams).pack(pady=5)
-tk.Button(phase1, text="Manage Teams & Members", command=manage_teams_popup).pack(pady=5)
-
-# --- Phase 2: Event & Scores ---
-phase2 = tk.LabelFrame(button_container, text="Phase 2: Event & Scores", padx=10, pady=10)
-phase2.pack(side="left", padx=30)
-tk.Button(phase2, text="View & Select Event", command=select_event_popup).pack(pady=5)
-tk.Button(phase2, text="Record Team Scores", command=record_team_score_popup).pack(pady=5)
-
-# --- Phase 3: Leaderboard ---
-phase3 = tk.LabelFrame(button_container, text="Phase 3: Leaderboard", padx=10, pady=10)
-phase3.pack(side="left", padx=30)
-tk.Button(phase3, text="Show Overall Leaderboard", command=show_leaderboard_popup).pack(pady=15)
-
-# --- Save & Exit Centered ---
-bottom_controls = tk.Frame(root)
-bottom_controls.pack(pady=10)
-tk.Button(bottom_controls, text="Save Current Data", command=save_data).pack(side="left", padx=10)
-tk.Button(bottom_controls, text="Exit Application", command=root.quit).pack(side="left", padx=10)
-
-# Exit Confirmation
-def on_closing():
-    if messagebox.askyesno("Exit Application", "Do you want to save data before exiting?"):
-        save_data()
-    root.destroy()
-
-root.protocol("WM_DELETE_WINDOW", on_closing)
-
-root.mainloop()
\ No newline at end of file
+import tkinter as tk
+from tkinter import messagebox
+from tkinter import filedialog # Import filedialog for saving files
+import getpass
+import json
+import os
+import queue
+import time
+
+from brackets import FORMATS as BRACKET_FORMATS, SWISS
+from changefeed import ChangeQueue
+from bulk_import import import_scores
+from exporters import ExportJob, export_all, export_leaderboard
+from history import HistoryLog, HistoryStore, describe
+from instrumentation import METRICS_FILE as DEFAULT_METRICS_FILE, Metrics, MeasuredStore
+from leaderboard_view import VirtualLeaderboard
+from persistence import BackgroundStore, default_data_file, open_store
+from popup_views import ScoreInputs, ViewCache, set_options
+from roster_import import DEFAULT_SKILL_FIELD, import_roster
+from scoring_engine import TournamentEngine, ScoringError, VersionConflict, TOURNAMENT
+from server import start_server_thread, stop_server_thread
+
+# Ensure proper scaling on high-DPI displays (Windows only)
+try:
+    from ctypes import windll
+    windll.shcore.SetProcessDpiAwareness(1)
+except (ImportError, AttributeError, OSError):
+    pass
+
+# --- Configuration Constants ---
+NUM_TEAMS = 5
+MEMBERS_PER_TEAM = 4
+# "journal" appends each change to DATA_FILE + ".journal" and periodically compacts it
+# into DATA_FILE; "json" rewrites the whole DATA_FILE on every save; "sqlite" keeps
+# the tournament in an indexed SQLite database; "binary" is "journal" with the snapshot
+# in the binary .tsb format (binary_snapshot.py), which loads large tournaments faster.
+STORAGE_BACKEND = "journal"
+DATA_FILE = default_data_file(STORAGE_BACKEND)
+# Set to a port (e.g. 8765) to let other scoring stations submit results over the local
+# HTTP/WebSocket API in server.py while this window is open; None keeps it single-station.
+SERVER_PORT = None
+# Name stamped on every change made from this window in the tournament history; None uses the login name
+OPERATOR = None
+HISTORY_ROWS = 500 # Most recent changes listed in the history window
+MEMBER_SEARCH_RESULTS = 12 # Matches listed while typing in the member search
+# Timings of every button, save and store write are written to METRICS_FILE every few seconds
+# (None keeps them in memory only); F12 shows the busiest ones under the status line
+METRICS_FILE = DEFAULT_METRICS_FILE
+# Actions to run under cProfile, e.g. ("save_data", "store.commit"); written to profiles/<action>.prof
+PROFILE_ACTIONS = ()
+TRACE_MEMORY = False # Also record each action's peak memory growth with tracemalloc (slows everything down)
+
+
+# Global data structures: all tournament state and rules live in the headless engine
+# Saves are written by a background thread; its results come back through this queue
+save_results = queue.Queue()
+metrics = Metrics(METRICS_FILE, PROFILE_ACTIONS, trace_memory=TRACE_MEMORY)
+# Every change is also kept, timestamped, in DATA_FILE + ".history" for undo review and past standings
+history = HistoryLog(DATA_FILE)
+storage = BackgroundStore(MeasuredStore(HistoryStore(open_store(STORAGE_BACKEND, DATA_FILE), history), metrics),
+                          on_result=lambda ok, error: save_results.put((ok, error)))
+engine = TournamentEngine(DATA_FILE, NUM_TEAMS, MEMBERS_PER_TEAM, store=storage, history=history)
+try:
+    engine.operator = OPERATOR or getpass.getuser()
+except (KeyError, OSError): # No login name available
+    engine.operator = OPERATOR
+leaderboard_view = None # The VirtualLeaderboard being shown, if any
+# Leaderboard diffs from every score change, including other stations' via the scoring server
+leaderboard_changes = ChangeQueue(engine.feed)
+scoring_server = None
+
+# --- Utility Functions ---
+def center_window(window, width=600, height=None): # Modified: height is now optional
+    screen_width = window.winfo_screenwidth()
+    screen_height = window.winfo_screenheight()
+    
+    # Temporarily set window to be visible but small to get correct dimensions
+    window.update_idletasks() 
+
+    # Calculate actual width/height if not provided, or use provided values
+    if width is None:
+        actual_width = window.winfo_reqwidth()
+    else:
+        actual_width = width
+    
+    if height is None:
+        actual_height = window.winfo_reqheight()
+    else:
+        actual_height = height
+
+    x = (screen_width // 2) - (actual_width // 2)
+    y = (screen_height // 2) - (actual_height // 2)
+    
+    window.geometry(f"{actual_width}x{actual_height}+{x}+{y}")
+
+
+# --- Data Persistence Functions ---
+@metrics.measure()
+def save_data():
+    """Queues the changes made since the last save for the background writer."""
+    engine.save()
+
+@metrics.measure()
+def compact_data():
+    """Queues a full snapshot of the data file (emptying the change journal in journal mode)."""
+    engine.compact()
+
+def poll_save_results():
+    """Shows the background writer's results in status_label; reschedules itself with root.after."""
+    try:
+        while True:
+            ok, error = save_results.get_nowait()
+            # Use global status_label (defined in main app setup)
+            if ok:
+                status_label.config(text=f"Data saved to {DATA_FILE}", fg="green")
+            else:
+                metrics.count("save_errors")
+                status_label.config(text=f"Error saving data: {error}", fg="red")
+                messagebox.showerror("Save Error", f"Failed to save data:\n{error}")
+    except queue.Empty:
+        pass
+    refresh_leaderboard() # Picks up changes made by other scoring stations
+    root.after(200, poll_save_results)
+
+def toggle_metrics_overlay(event=None):
+    """Shows or hides the busiest actions' timings under the status line."""
+    if metrics_label.winfo_ismapped():
+        metrics_label.pack_forget()
+    else:
+        metrics_label.pack(after=status_label, pady=2)
+        update_metrics_overlay()
+
+def update_metrics_overlay():
+    lines = metrics.summary_lines()
+    metrics_label.config(text="\n".join(lines) if lines else "No actions timed yet.")
+
+def poll_metrics():
+    """Refreshes the overlay if shown and writes the metrics file when due; reschedules itself."""
+    if metrics_label.winfo_ismapped():
+        update_metrics_overlay()
+    try:
+        metrics.flush_if_due()
+    except OSError as e:
+        status_label.config(text=f"Error writing metrics: {e}", fg="red")
+    root.after(1000, poll_metrics)
+
+def start_scoring_server():
+    """Starts the multi-station API on SERVER_PORT, if configured."""
+    global scoring_server
+    if SERVER_PORT is None:
+        return
+    try:
+        scoring_server = start_server_thread(engine, port=SERVER_PORT)
+    except OSError as e:
+        messagebox.showerror("Server Error", f"Could not start the scoring server on port {SERVER_PORT}:\n{e}")
+        return
+    status_label.config(text=f"{status_label.cget('text')} | Scoring stations: port {scoring_server.port}")
+
+@metrics.measure()
+def load_data():
+    """Loads teams, event_details, and selected_event from a JSON file."""
+    try:
+        if not engine.load():
+            status_label.config(text=f"No existing data file '{DATA_FILE}' found. Starting fresh.", fg="orange")
+            return False
+        status_label.config(text=f"Data loaded from {DATA_FILE}", fg="green")
+        if engine.selected_event:
+            current_event_label.config(text=f"Current Event: {engine.selected_event}")
+        return True
+    except json.JSONDecodeError as e:
+        status_label.config(text=f"Error loading data: Invalid JSON format: {e}", fg="red")
+        messagebox.showerror("Load Error", f"Corrupted data file. Failed to load:\n{e}")
+        return False
+    except Exception as e:
+        status_label.config(text=f"Error loading data: {e}", fg="red")
+        messagebox.showerror("Load Error", f"Failed to load data:\n{e}")
+        return False
+
+# --- Core Tournament Management Functions ---
+
+def initialise_teams():
+    if messagebox.askyesno("Confirm Initialisation",
+                            f"This will reset all existing team data and member data. Do you want to initialise {NUM_TEAMS} empty teams?"):
+        with metrics.timed("initialise_teams"): # Timed from the answer, not while the dialog waits
+            engine.initialise_teams(NUM_TEAMS)
+            status_label.config(text=f"{NUM_TEAMS} default teams initialised.", fg="blue")
+            save_data()
+            refresh_leaderboard()
+            views.refresh_open()
+
+@metrics.measure()
+def manage_teams_popup():
+    if not engine.team_names():
+        messagebox.showinfo("Manage Teams", "No teams initialised yet. Please initialise teams first.")
+        return
+    views.show("manage_teams", "Manage Teams and Members", build_manage_teams_view)
+
+def build_manage_teams_view(popup):
+    """Builds the team and member management screen; returns its refresh function."""
+    center_window(popup, 700, 760) # Keep fixed size for team management
+
+    tk.Label(popup, text="Select a Team to Manage:").pack(pady=5)
+
+    shown_team_names = [] # Choices currently in the team dropdowns
+    selected_team_var = tk.StringVar(popup)
+    team_dropdown = tk.OptionMenu(popup, selected_team_var, "")
+    team_dropdown.pack(pady=5)
+
+    current_members_label = tk.Label(popup, text="Current Members: None")
+    current_members_label.pack(pady=5)
+
+    def update_members_display(*args):
+        team = selected_team_var.get()
+        with engine.lock:
+            if not engine.has_team(team):
+                return
+            members = engine.members(team)
+        current_members_label.config(text=f"Current Members ({len(members)}/{MEMBERS_PER_TEAM}): {', '.join(members) if members else 'None'}")
+
+    selected_team_var.trace_add("write", update_members_display)
+
+    tk.Label(popup, text="Add New Member Name:").pack(pady=5)
+    new_member_entry = tk.Entry(popup)
+    new_member_entry.pack(pady=2)
+
+    member_msg_label = tk.Label(popup, text="", fg="red")
+    member_msg_label.pack(pady=5)
+
+    @metrics.measure()
+    def add_member_to_team():
+        team = selected_team_var.get()
+        try:
+            member_name = engine.add_member(team, new_member_entry.get())
+        except ScoringError as e:
+            member_msg_label.config(text=str(e), fg="red")
+            return
+
+        new_member_entry.delete(0, tk.END)
+        update_members_display()
+        update_search_results()
+        member_msg_label.config(text=f"'{member_name}' added to {team}.", fg="green")
+        save_data()
+
+    tk.Button(popup, text="Add Member", command=add_member_to_team).pack(pady=5)
+
+    tk.Label(popup, text="Remove Member Name:").pack(pady=5)
+    remove_member_entry = tk.Entry(popup)
+    remove_member_entry.pack(pady=2)
+
+    @metrics.measure()
+    def remove_member_from_team():
+        team = selected_team_var.get()
+        try:
+            member_name = engine.remove_member(team, remove_member_entry.get())
+        except ScoringError as e:
+            member_msg_label.config(text=str(e), fg="red")
+            return
+
+        remove_member_entry.delete(0, tk.END)
+        update_members_display()
+        update_search_results()
+        member_msg_label.config(text=f"'{member_name}' removed from {team}.", fg="green")
+        save_data()
+
+    tk.Button(popup, text="Remove Member", command=remove_member_from_team).pack(pady=5)
+
+    # --- Find and move members across every team ---
+    search_frame = tk.LabelFrame(popup, text="Find Member (any part of a name)", padx=10, pady=5)
+    search_frame.pack(fill=tk.X, padx=20, pady=10)
+    search_var = tk.StringVar(popup)
+    tk.Entry(search_frame, textvariable=search_var, width=40).pack(pady=2)
+    search_listbox = tk.Listbox(search_frame, height=6, width=60)
+    search_listbox.pack(pady=2)
+    search_results = []
+
+    def update_search_results(*args):
+        search_results[:] = engine.search_members(search_var.get(), MEMBER_SEARCH_RESULTS)
+        search_listbox.delete(0, tk.END)
+        for member, team in search_results:
+            search_listbox.insert(tk.END, f"{member}  ({team})")
+
+    def select_search_result(event=None):
+        selection = search_listbox.curselection()
+        if not selection:
+            return
+        member, team = search_results[selection[0]]
+        selected_team_var.set(team)
+        remove_member_entry.delete(0, tk.END)
+        remove_member_entry.insert(0, member)
+
+    search_var.trace_add("write", update_search_results)
+    search_listbox.bind("<<ListboxSelect>>", select_search_result)
+
+    move_frame = tk.Frame(search_frame)
+    move_frame.pack(pady=5)
+    tk.Label(move_frame, text="Move selected member to:").pack(side=tk.LEFT)
+    move_target_var = tk.StringVar(popup)
+    move_target_dropdown = tk.OptionMenu(move_frame, move_target_var, "")
+    move_target_dropdown.pack(side=tk.LEFT, padx=5)
+
+    @metrics.measure()
+    def move_selected_member():
+        selection = search_listbox.curselection()
+        if not selection:
+            member_msg_label.config(text="Select a member in the search results first.", fg="red")
+            return
+        try:
+            member_name, from_team = engine.move_member(search_results[selection[0]][0], move_target_var.get())
+        except ScoringError as e:
+            member_msg_label.config(text=str(e), fg="red")
+            return
+        selected_team_var.set(move_target_var.get())
+        update_search_results()
+        member_msg_label.config(text=f"'{member_name}' moved from {from_team} to {move_target_var.get()}.", fg="green")
+        save_data()
+
+    tk.Button(move_frame, text="Move", command=move_selected_member).pack(side=tk.LEFT, padx=5)
+
+    def refresh():
+        team_names = engine.team_names()
+        if team_names != shown_team_names: # Only rebuild the dropdowns when the teams change
+            shown_team_names[:] = team_names
+            set_options(team_dropdown, selected_team_var, team_names)
+            set_options(move_target_dropdown, move_target_var, team_names)
+        update_members_display()
+        update_search_results()
+        member_msg_label.config(text="")
+
+    return refresh
+
+
+@metrics.measure()
+def select_event_popup():
+    """Shows a popup to view all events and their descriptions, and allows selecting one."""
+    views.show("select_event", "View & Select Tournament Event", build_select_event_view, fullscreen=True)
+
+def build_select_event_view(popup):
+    """Builds the event list and selection screen; returns its refresh function."""
+    tk.Label(popup, text="Available Events:", font=("Arial", 12, "bold")).pack(pady=10)
+
+    event_options_frame = tk.Frame(popup)
+    event_options_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    selected_event_name_var = tk.StringVar(popup)
+
+    canvas = tk.Canvas(event_options_frame)
+    scrollbar = tk.Scrollbar(event_options_frame, orient="vertical", command=canvas.yview)
+    scrollable_frame = tk.Frame(canvas)
+
+    scrollable_frame.bind(
+        "<Configure>",
+        lambda e: canvas.configure(
+            scrollregion=canvas.bbox("all")
+        )
+    )
+    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+    canvas.configure(yscrollcommand=scrollbar.set)
+
+    canvas.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+
+    desc_labels = {} # event -> its description label, re-read when a scoring rule changes
+    for event_name, details in engine.event_details.items():
+        rb = tk.Radiobutton(scrollable_frame, text=event_name, variable=selected_event_name_var, value=event_name,
+                            font=("Arial", 10, "bold"), anchor="w", justify=tk.LEFT)
+        rb.pack(fill=tk.X, pady=2, padx=5)
+
+        desc_label = desc_labels[event_name] = tk.Label(scrollable_frame, justify=tk.LEFT, wraplength=450, fg="gray")
+        desc_label.pack(fill=tk.X, padx=15, pady=0)
+        tk.Frame(scrollable_frame, height=1, bg="lightgray").pack(fill=tk.X, padx=5, pady=5)
+
+    # Scoring rule of the highlighted event; changing it re-scores every team already scored there
+    rule_frame = tk.Frame(popup)
+    rule_frame.pack(pady=5)
+    tk.Label(rule_frame, text="Scoring rule for the selected event:").pack(side=tk.LEFT, padx=5)
+    rule_entry = tk.Entry(rule_frame, width=50)
+    rule_entry.pack(side=tk.LEFT, padx=5)
+
+    def show_rule(*args):
+        rule_entry.delete(0, tk.END)
+        if selected_event_name_var.get():
+            rule_entry.insert(0, engine.event_details[selected_event_name_var.get()].get("formula", ""))
+
+    def apply_rule():
+        chosen_event = selected_event_name_var.get()
+        if not chosen_event:
+            selection_msg_label.config(text="Please select an event.", fg="red")
+            return
+        if not messagebox.askyesno("Confirm Scoring Rule",
+                                   f"Change the scoring rule for '{chosen_event}'? Every score already recorded "
+                                   "for it is recalculated. Leave the rule empty for the default."):
+            return
+        with metrics.timed("apply_rule"):
+            try:
+                rescored = engine.set_scoring_rule(chosen_event, rule_entry.get())
+            except ScoringError as e:
+                selection_msg_label.config(text=str(e), fg="red")
+                return
+            save_data()
+            refresh_leaderboard()
+            update_descriptions()
+            selection_msg_label.config(text=f"Scoring rule updated; {rescored} scores recalculated.", fg="green")
+
+    tk.Button(rule_frame, text="Apply Rule", command=apply_rule).pack(side=tk.LEFT, padx=5)
+    selected_event_name_var.trace_add("write", show_rule)
+
+    def update_descriptions():
+        for event_name, desc_label in desc_labels.items():
+            details = engine.event_details[event_name]
+            rule_text = details.get("formula") or "default"
+            desc_label.config(text=f"Type: {details['type']} (Scoring: {rule_text})\n{details['description']}")
+
+    multi_event_var = tk.BooleanVar(popup)
+    tk.Checkbutton(popup, text="Score all events cumulatively (keep scores when changing event)",
+                   variable=multi_event_var).pack(pady=5)
+
+    selection_msg_label = tk.Label(popup, text="", fg="red")
+    selection_msg_label.pack(pady=5)
+
+    button_frame = tk.Frame(popup)
+    button_frame.pack(pady=10)
+
+    def confirm_event_selection():
+        chosen_event = selected_event_name_var.get()
+        if chosen_event:
+            if multi_event_var.get():
+                question = f"Are you sure you want to select '{chosen_event}' as the current event? Scores for other events are kept and added to each team's total."
+            else:
+                question = f"Are you sure you want to select '{chosen_event}' as the primary event for this tournament? This will clear all existing event scores if you previously scored for other events (Undo restores them)."
+            confirm = messagebox.askyesno("Confirm Event", question)
+            if confirm:
+                with metrics.timed("confirm_event_selection"):
+                    engine.set_multi_event(multi_event_var.get())
+                    engine.select_event(chosen_event) # Clears event_scores and resets total_score unless multi-event
+                    refresh_leaderboard()
+                    current_event_label.config(text=f"Current Event: {chosen_event}")
+                    status_label.config(text=f"'{chosen_event}' selected as current event.", fg="blue")
+                    save_data()
+                    views.refresh_open()
+                    popup.withdraw()
+            else:
+                selection_msg_label.config(text="Event selection cancelled.")
+        else:
+            selection_msg_label.config(text="Please select an event.", fg="red")
+
+    tk.Button(button_frame, text="Confirm Selection", command=confirm_event_selection).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Exit", command=popup.withdraw).pack(side=tk.LEFT, padx=5)
+
+    def refresh():
+        selected_event_name_var.set(engine.selected_event or "") # Also shows its scoring rule
+        multi_event_var.set(engine.multi_event)
+        update_descriptions()
+        selection_msg_label.config(text="")
+
+    return refresh
+
+
+@metrics.measure()
+def record_team_score_popup():
+    if not engine.selected_event:
+        messagebox.showinfo("Record Team Scores", "No event selected for the tournament. Please select an event first.")
+        return
+    if not engine.team_names():
+        messagebox.showinfo("Record Team Scores", "No teams initialised. Please initialise teams first.")
+        return
+    views.show("record_scores", "Record Team Scores", build_record_scores_view, fullscreen=True)
+
+def build_record_scores_view(popup):
+    """Builds the score entry screen; returns its refresh function."""
+    current_event = None # Set by refresh from engine.selected_event
+
+    event_label = tk.Label(popup, font=("Arial", 12, "bold"), fg="purple")
+    event_label.pack(pady=5)
+
+    tk.Label(popup, text="Select Team:").pack(pady=5)
+    shown_team_names = [] # Choices currently in the team dropdown
+    selected_team_var = tk.StringVar(popup)
+    team_dropdown = tk.OptionMenu(popup, selected_team_var, "")
+    team_dropdown.pack(pady=5)
+
+    # Inputs for the event (wins/losses or direct points, plus any the scoring rule adds), built once per set of fields
+    score_inputs = ScoreInputs(popup, engine)
+    score_inputs.pack(pady=10)
+
+    score_msg_label = tk.Label(popup, text="", fg="red")
+    score_msg_label.pack(pady=5)
+
+    loaded_version = None # Team version the fields were filled from; other stations may change it
+
+    def update_input_fields(*args):
+        nonlocal loaded_version
+        team_name = selected_team_var.get() # Get selected team to pre-fill data
+        with engine.lock: # The version and the score shown must come from the same moment
+            if current_event is None or not engine.has_team(team_name):
+                return
+            loaded_version = engine.version_of(team_name)
+            score_data = engine.event_score(team_name, current_event)
+        # Pre-fill with existing scores if available for this team and event
+        score_inputs.show(current_event, score_data)
+
+    # Bind update function to team selection change
+    selected_team_var.trace_add("write", update_input_fields)
+
+    button_frame_record = tk.Frame(popup)
+    button_frame_record.pack(pady=10)
+
+    def save_team_score():
+        nonlocal loaded_version
+        if not score_inputs.entries: # The event's rule takes no inputs
+            score_msg_label.config(text=f"'{current_event}' has no score fields to fill in.", fg="red")
+            return
+
+        team = selected_team_var.get()
+        score_msg_label.config(text="", fg="red") # Reset message
+
+        score_fields = score_inputs.values()
+        try:
+            engine.build_score(current_event, **score_fields) # Validate before asking to overwrite
+        except ScoringError as e:
+            score_msg_label.config(text=str(e), fg="red")
+            return
+
+        # Confirm overwrite if score already exists for this event
+        if engine.has_score(team, current_event):
+            confirm = messagebox.askyesno("Confirm Overwrite",
+                                           f"'{team}' already has a score for '{current_event}'. Overwrite?\n"
+                                           "The old score is kept in the change history and Undo brings it back.")
+            if not confirm:
+                score_msg_label.config(text="Score not saved (overwrite cancelled).", fg="blue")
+                return
+
+        try:
+            with metrics.timed("save_team_score"): # Not the overwrite dialog above or the warning below
+                score_data = engine.record_score(team, current_event, expected_version=loaded_version, **score_fields)
+                loaded_version = engine.version_of(team) # Our own save is the version we now build on
+
+                if "wins" in score_data:
+                    msg = f"Saved: {team} - {current_event} (Wins: {score_data['wins']}, Losses: {score_data['losses']}, Points: {score_data['points']})"
+                else:
+                    msg = f"Saved: {team} - {current_event} (Points: {score_data['points']})"
+
+                score_msg_label.config(text=msg, fg="green")
+                # Clear entries after saving
+                score_inputs.clear()
+                save_data()
+                refresh_leaderboard()
+        except VersionConflict as e:
+            messagebox.showwarning("Score Changed", f"{e}\nThe fields now show the latest score.")
+            update_input_fields()
+
+    tk.Button(button_frame_record, text="Save Team Score", command=save_team_score).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame_record, text="Exit", command=popup.withdraw).pack(side=tk.LEFT, padx=5)
+
+    def refresh():
+        nonlocal current_event
+        current_event = engine.selected_event
+        event_label.config(text=f"Recording scores for: {current_event}")
+        team_names = engine.team_names()
+        if team_names != shown_team_names: # Only rebuild the dropdown when the teams change
+            shown_team_names[:] = team_names
+            set_options(team_dropdown, selected_team_var, team_names)
+        update_input_fields()
+        score_msg_label.config(text="")
+
+    return refresh
+
+
+@metrics.measure()
+def match_results_popup():
+    """Shows the match bracket for the current Tournament event and records individual match results."""
+    popup = tk.Toplevel(root)
+    popup.title("Match Results")
+    center_window(popup, 700, 550)
+
+    current_event = engine.selected_event
+    if not current_event or engine.event_type(current_event) != TOURNAMENT:
+        tk.Label(popup, text="Select a Tournament event first to play it match by match.").pack(pady=20)
+        return
+    if not engine.team_names():
+        tk.Label(popup, text="No teams initialised. Please initialise teams first.").pack(pady=20)
+        return
+
+    tk.Label(popup, text=f"Matches for: {current_event}", font=("Arial", 12, "bold"), fg="purple").pack(pady=5)
+
+    match_msg_label = tk.Label(popup, text="", fg="red")
+
+    if current_event not in engine.brackets:
+        tk.Label(popup, text="Choose a format to generate the pairings:").pack(pady=5)
+        format_var = tk.StringVar(popup, value=SWISS)
+        tk.OptionMenu(popup, format_var, *BRACKET_FORMATS).pack(pady=5)
+
+        def start_bracket():
+            if engine.has_score(engine.team_names()[0], current_event) and not messagebox.askyesno(
+                    "Start Bracket", "Starting a bracket resets every team's score for this event. Continue?"):
+                return
+            with metrics.timed("start_bracket"):
+                try:
+                    engine.create_bracket(current_event, format_var.get())
+                except ScoringError as e:
+                    match_msg_label.config(text=str(e), fg="red")
+                    return
+                save_data()
+                refresh_leaderboard()
+                popup.destroy()
+                match_results_popup() # Reopen showing the first round
+
+        tk.Button(popup, text="Start Bracket", command=start_bracket).pack(pady=5)
+        match_msg_label.pack(pady=5)
+        return
+
+    bracket = engine.bracket(current_event)
+    round_label = tk.Label(popup, text="")
+    round_label.pack(pady=2)
+    match_listbox = tk.Listbox(popup, width=70, height=12)
+    match_listbox.pack(pady=5, fill=tk.BOTH, expand=True)
+    shown_match_ids = []
+
+    def refresh_matches():
+        match_listbox.delete(0, tk.END)
+        shown_match_ids.clear()
+        with engine.lock:
+            round_label.config(text=f"Round {len(bracket.rounds)} ({bracket.format.replace('_', ' ')})")
+            for match_id in bracket.rounds[-1]:
+                match = bracket.matches[match_id]
+                if match.is_bye:
+                    text = f"Match {match_id}: {match.team_a} has a bye"
+                else:
+                    result = f" - winner: {match.winner}" if match.winner else ""
+                    text = f"Match {match_id}: {match.team_a} vs {match.team_b}{result}"
+                match_listbox.insert(tk.END, text)
+                shown_match_ids.append(match_id)
+
+    score_frame = tk.Frame(popup)
+    score_frame.pack(pady=5)
+    tk.Label(score_frame, text="Game score (optional):").pack(side=tk.LEFT)
+    score_a_entry = tk.Entry(score_frame, width=5)
+    score_a_entry.pack(side=tk.LEFT, padx=2)
+    tk.Label(score_frame, text="-").pack(side=tk.LEFT)
+    score_b_entry = tk.Entry(score_frame, width=5)
+    score_b_entry.pack(side=tk.LEFT, padx=2)
+
+    @metrics.measure()
+    def record_winner(first_team_won):
+        selection = match_listbox.curselection()
+        if not selection:
+            match_msg_label.config(text="Select a match first.", fg="red")
+            return
+        match = bracket.matches[shown_match_ids[selection[0]]]
+        if match.is_bye:
+            match_msg_label.config(text="That match is a bye.", fg="red")
+            return
+        score_a, score_b = score_a_entry.get().strip(), score_b_entry.get().strip()
+        try:
+            game_score = (int(score_a), int(score_b)) if score_a and score_b else (None, None)
+        except ValueError:
+            match_msg_label.config(text="Game scores must be numbers.", fg="red")
+            return
+        winner = match.team_a if first_team_won else match.team_b
+        try:
+            engine.record_match(current_event, match.match_id, winner, *game_score)
+        except ScoringError as e:
+            match_msg_label.config(text=str(e), fg="red")
+            return
+        score_a_entry.delete(0, tk.END)
+        score_b_entry.delete(0, tk.END)
+        match_msg_label.config(text=f"Saved: {winner} won match {match.match_id}", fg="green")
+        refresh_matches()
+        save_data()
+        refresh_leaderboard()
+
+    @metrics.measure()
+    def pair_next_round():
+        try:
+            rows = engine.pair_next_round(current_event)
+        except ScoringError as e:
+            match_msg_label.config(text=str(e), fg="red")
+            return
+        if not rows:
+            match_msg_label.config(text="The bracket is finished.", fg="blue")
+            return
+        match_msg_label.config(text=f"Round {len(bracket.rounds)} paired.", fg="green")
+        refresh_matches()
+        save_data()
+        refresh_leaderboard()
+
+    button_frame = tk.Frame(popup)
+    button_frame.pack(pady=5)
+    tk.Button(button_frame, text="First Team Won", command=lambda: record_winner(True)).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Second Team Won", command=lambda: record_winner(False)).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Pair Next Round", command=pair_next_round).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Exit", command=popup.destroy).pack(side=tk.LEFT, padx=5)
+    match_msg_label.pack(pady=5)
+    refresh_matches()
+
+
+def import_scores_popup():
+    """Imports a CSV/JSON file of scores in one batch, reporting every invalid row at once."""
+    if not engine.team_names():
+        messagebox.showinfo("Import Scores", "No teams initialised. Please initialise teams first.")
+        return
+
+    file_path = filedialog.askopenfilename(
+        filetypes=[("Score files", "*.csv *.jsonl *.json"), ("All files", "*.*")],
+        title="Import Scores"
+    )
+    if not file_path:
+        return
+
+    try:
+        with metrics.timed("import_scores_popup"): # Only the import, not the file dialog or an error box
+            imported = import_scores(engine, file_path)
+    except ScoringError as e:
+        messagebox.showerror("Import Scores Error", str(e))
+        status_label.config(text="Score import failed; nothing was imported.", fg="red")
+        return
+    except Exception as e:
+        messagebox.showerror("Import Scores Error", f"Failed to import scores:\n{e}")
+        status_label.config(text=f"Error importing scores: {e}", fg="red")
+        return
+
+    status_label.config(text=f"Imported {imported} scores from {os.path.basename(file_path)}", fg="green")
+    refresh_leaderboard()
+    views.refresh_open()
+
+
+@metrics.measure()
+def import_roster_popup():
+    """Creates or fills teams from a CSV/JSON roster file, optionally balancing them by skill."""
+    popup = tk.Toplevel(root)
+    popup.title("Import Roster")
+    center_window(popup, 480, 330)
+
+    tk.Label(popup, text="One participant per row: name, and optionally team and a skill rating.\n"
+                         "Participants without a team fill the teams that have room.",
+             justify=tk.LEFT).pack(pady=10)
+
+    replace_var = tk.BooleanVar(popup, value=False)
+    tk.Checkbutton(popup, text="Replace the existing teams (also clears all scores)", variable=replace_var).pack(pady=2)
+    balance_var = tk.BooleanVar(popup, value=False)
+    tk.Checkbutton(popup, text="Balance teams by skill", variable=balance_var).pack(pady=2)
+
+    options_frame = tk.Frame(popup)
+    options_frame.pack(pady=5)
+    tk.Label(options_frame, text="Skill column:").grid(row=0, column=0, sticky="e", padx=5, pady=2)
+    skill_field_entry = tk.Entry(options_frame, width=15)
+    skill_field_entry.insert(0, DEFAULT_SKILL_FIELD)
+    skill_field_entry.grid(row=0, column=1, padx=5, pady=2)
+    tk.Label(options_frame, text="Number of teams (blank: as needed):").grid(row=1, column=0, sticky="e", padx=5, pady=2)
+    num_teams_entry = tk.Entry(options_frame, width=15)
+    num_teams_entry.grid(row=1, column=1, padx=5, pady=2)
+
+    roster_msg_label = tk.Label(popup, text="", fg="red", wraplength=440, justify=tk.LEFT)
+    roster_msg_label.pack(pady=5)
+
+    def choose_roster_file():
+        num_teams = num_teams_entry.get().strip()
+        if num_teams and not (num_teams.isdigit() and int(num_teams) > 0):
+            roster_msg_label.config(text="Number of teams must be a whole number above zero.", fg="red")
+            return
+        if replace_var.get() and engine.team_names() and not messagebox.askyesno(
+                "Confirm Roster Import", "This will replace all existing teams, members and scores. Continue?",
+                parent=popup):
+            return
+
+        file_path = filedialog.askopenfilename(
+            parent=popup,
+            filetypes=[("Roster files", "*.csv *.jsonl *.json"), ("All files", "*.*")],
+            title="Import Roster"
+        )
+        if not file_path:
+            return
+
+        try:
+            with metrics.timed("choose_roster_file"):
+                added, created = import_roster(engine, file_path, balance=balance_var.get(),
+                                               num_teams=int(num_teams) if num_teams else None,
+                                               replace=replace_var.get(),
+                                               skill_field=skill_field_entry.get() or DEFAULT_SKILL_FIELD)
+        except ScoringError as e:
+            roster_msg_label.config(text=str(e), fg="red")
+            status_label.config(text="Roster import failed; nothing was imported.", fg="red")
+            return
+        except Exception as e:
+            messagebox.showerror("Import Roster Error", f"Failed to import roster:\n{e}", parent=popup)
+            status_label.config(text=f"Error importing roster: {e}", fg="red")
+            return
+
+        status_label.config(text=f"Imported {added} members from {os.path.basename(file_path)} "
+                                 f"({created} new teams)", fg="green")
+        refresh_leaderboard()
+        views.refresh_open()
+        popup.destroy()
+
+    button_frame = tk.Frame(popup)
+    button_frame.pack(pady=10)
+    tk.Button(button_frame, text="Choose File...", command=choose_roster_file).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Exit", command=popup.destroy).pack(side=tk.LEFT, padx=5)
+
+
+def watch_export_job(job, done_message):
+    """Polls a background ExportJob and reports its progress and outcome in status_label."""
+    if job.is_alive():
+        if job.total_rows:
+            percent = min(100, job.rows_done * 100 // job.total_rows)
+            status_label.config(text=f"Exporting leaderboard... {percent}%", fg="blue")
+        root.after(100, watch_export_job, job, done_message)
+    elif job.error is not None:
+        messagebox.showerror("Export Error", f"Failed to export leaderboard:\n{job.error}")
+        status_label.config(text=f"Error exporting leaderboard: {job.error}", fg="red")
+    else:
+        status_label.config(text=done_message, fg="green")
+
+
+def export_leaderboard_to_csv(popup_window, current_event):
+    """Exports the shown leaderboard to a CSV, JSON Lines or columnar file on a background thread."""
+    if not engine.team_names():
+        messagebox.showinfo("Export CSV", "No teams or scores to export.")
+        return
+
+    file_path = filedialog.asksaveasfilename(
+        parent=popup_window,
+        defaultextension=".csv",
+        filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"), ("Columnar files", "*.tsc"), ("All files", "*.*")],
+        title="Save Leaderboard",
+        initialfile="tournament_leaderboard.csv"
+    )
+
+    if not file_path:
+        # User cancelled the save dialog
+        return
+
+    # Rows stream from the engine's ranking; no event means the overall standings
+    with metrics.timed("export_leaderboard_to_csv"): # Starting the job, not the save dialog
+        job = ExportJob(export_leaderboard, engine, file_path, current_event, total_rows=engine.team_count())
+        job.start()
+    watch_export_job(job, f"Leaderboard exported to {os.path.basename(file_path)}")
+
+
+def export_all_leaderboards(popup_window):
+    """Exports the overall standings and every event's leaderboard into a chosen folder."""
+    if not engine.team_names():
+        messagebox.showinfo("Export CSV", "No teams or scores to export.")
+        return
+
+    directory = filedialog.askdirectory(parent=popup_window, title="Choose Folder for Leaderboard Exports")
+    if not directory:
+        return
+
+    with metrics.timed("export_all_leaderboards"):
+        total_rows = engine.team_count() * (len(engine.event_details) + 1)
+        job = ExportJob(export_all, engine, directory, total_rows=total_rows)
+        job.start()
+    watch_export_job(job, f"All leaderboards exported to {directory}")
+
+
+def refresh_leaderboard():
+    """Patches the open leaderboard's visible rows with the changes published since the last call."""
+    changes = leaderboard_changes.drain()
+    if not changes:
+        return # Polled every 200 ms; an idle poll is not timed, so it does not crowd the metrics
+    with metrics.timed("refresh_leaderboard"):
+        metrics.count("leaderboard_changes", len(changes))
+        if leaderboard_view is not None:
+            leaderboard_view.apply_changes(changes)
+
+
+@metrics.measure()
+def show_leaderboard_popup():
+    if not engine.team_names():
+        messagebox.showinfo("Overall Leaderboard", "No teams or scores recorded yet.")
+        return
+    views.show("leaderboard", "Overall Leaderboard", build_leaderboard_view, fullscreen=True)
+
+def build_leaderboard_view(popup):
+    """Builds the leaderboard screen; returns its refresh function."""
+    overall_choice = "Overall (all events)"
+
+    tk.Label(popup, text="Tournament Leaderboard:", font=("Arial", 14, "bold")).pack(pady=10)
+    # Cumulative scoring chooses between the overall standings and any single event; otherwise the
+    # current event is named. Only one of the two is packed at a time.
+    event_frame = tk.Frame(popup)
+    event_frame.pack()
+    shown_var = tk.StringVar(popup, value=overall_choice)
+    event_choice = tk.OptionMenu(event_frame, shown_var, overall_choice, *engine.event_details)
+    event_label = tk.Label(event_frame, font=("Arial", 10))
+
+    # Only the visible rows are drawn; they are re-read from the ranking on scroll and on score changes
+    board = VirtualLeaderboard(popup, engine, None)
+    shown_var.trace_add("write", lambda *args: board.set_event(
+        None if shown_var.get() == overall_choice else shown_var.get()))
+
+    def close_leaderboard():
+        global leaderboard_view
+        leaderboard_view = None # Stop patching rows while hidden; showing it again re-reads them all
+        popup.withdraw()
+
+    popup.protocol("WM_DELETE_WINDOW", close_leaderboard)
+
+    # Buttons for leaderboard (packed first so the expanding view never hides them)
+    leaderboard_button_frame = tk.Frame(popup)
+    leaderboard_button_frame.pack(side=tk.BOTTOM, pady=10)
+    tk.Button(leaderboard_button_frame, text="Export to CSV", command=lambda: export_leaderboard_to_csv(popup, board.event)).pack(side=tk.LEFT, padx=5)
+    tk.Button(leaderboard_button_frame, text="Export All Events", command=lambda: export_all_leaderboards(popup)).pack(side=tk.LEFT, padx=5)
+    tk.Button(leaderboard_button_frame, text="Exit", command=close_leaderboard).pack(side=tk.LEFT, padx=5)
+
+    board.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def refresh():
+        global leaderboard_view
+        current_event = engine.selected_event
+        leaderboard_changes.drain() # The board is re-read in full below
+        event_choice.pack_forget()
+        event_label.pack_forget()
+        if engine.multi_event:
+            event_choice.pack(pady=2)
+            shown_var.set(current_event or overall_choice) # The trace switches the board
+        else:
+            if current_event:
+                event_label.config(text=f"For Event: {current_event}")
+                event_label.pack(pady=2)
+            board.set_event(current_event)
+        leaderboard_view = board
+
+    return refresh
+
+
+# --- Change History ---
+def after_history_change(message):
+    """Refreshes the main window after an undo or redo, which may have changed anything."""
+    current_event_label.config(text=f"Current Event: {engine.selected_event or 'Not Selected'}")
+    status_label.config(text=message, fg="blue")
+    save_data()
+    refresh_leaderboard()
+    views.refresh_open()
+
+@metrics.measure()
+def undo_last_change(event=None):
+    try:
+        description = engine.undo()
+    except ScoringError as e:
+        status_label.config(text=str(e), fg="orange")
+        return
+    after_history_change(f"Undone: {description}")
+
+@metrics.measure()
+def redo_last_change(event=None):
+    try:
+        description = engine.redo()
+    except ScoringError as e:
+        status_label.config(text=str(e), fg="orange")
+        return
+    after_history_change(f"Redone: {description}")
+
+def format_history_entry(record):
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["time"])) if "time" in record else "-"
+    text = f"#{record['seq']}  {when}  {record.get('operator', '-')}  {describe(record)}"
+    if "undoes" in record:
+        text += f"  (reverts #{record['undoes']})"
+    return text
+
+@metrics.measure()
+def history_popup():
+    """Lists the most recent changes and shows the standings as they were after any of them."""
+    try:
+        records = engine.history_entries(HISTORY_ROWS)
+    except ScoringError as e:
+        messagebox.showerror("History", str(e))
+        return
+    popup = tk.Toplevel(root)
+    popup.title("Change History")
+    center_window(popup, 900, 600)
+
+    tk.Label(popup, text="Recent changes (newest first):", font=("Arial", 12, "bold")).pack(pady=5)
+    history_frame = tk.Frame(popup)
+    history_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+    history_listbox = tk.Listbox(history_frame, font=("Courier", 10))
+    history_scrollbar = tk.Scrollbar(history_frame, orient="vertical", command=history_listbox.yview)
+    history_listbox.config(yscrollcommand=history_scrollbar.set)
+    history_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    history_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    records.reverse()
+    for record in records:
+        history_listbox.insert(tk.END, format_history_entry(record))
+
+    time_frame = tk.Frame(popup)
+    time_frame.pack(pady=5)
+    tk.Label(time_frame, text="Or standings at (YYYY-MM-DD HH:MM):").pack(side=tk.LEFT)
+    time_entry = tk.Entry(time_frame, width=18)
+    time_entry.pack(side=tk.LEFT, padx=5)
+    history_msg_label = tk.Label(popup, text="", fg="red")
+    history_msg_label.pack(pady=2)
+
+    @metrics.measure()
+    def show_standings_at():
+        selection = history_listbox.curselection()
+        moment = time_entry.get().strip()
+        try:
+            if moment:
+                at = time.mktime(time.strptime(moment, "%Y-%m-%d %H:%M")) + 59.999 # The whole minute
+                past, title = engine.as_of(at=at), f"Standings at {moment}"
+            elif selection:
+                seq = records[selection[0]]["seq"]
+                past, title = engine.as_of(seq=seq), f"Standings after change #{seq}"
+            else:
+                history_msg_label.config(text="Select a change or enter a date and time.")
+                return
+        except ValueError as e: # ScoringError, or a badly typed date
+            history_msg_label.config(text=str(e))
+            return
+        show_past_leaderboard(past, title)
+
+    button_frame = tk.Frame(popup)
+    button_frame.pack(pady=10)
+    tk.Button(button_frame, text="Show Standings", command=show_standings_at).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Exit", command=popup.destroy).pack(side=tk.LEFT, padx=5)
+
+def show_past_leaderboard(past, title):
+    """Read-only leaderboard of an engine rebuilt from the history."""
+    popup = tk.Toplevel(root)
+    popup.title(title)
+    center_window(popup, 700, 600)
+    event = past.selected_event if not past.multi_event else None
+    tk.Label(popup, text=title, font=("Arial", 14, "bold")).pack(pady=10)
+    if event:
+        tk.Label(popup, text=f"For Event: {event}", font=("Arial", 10)).pack(pady=2)
+    tk.Button(popup, text="Exit", command=popup.destroy).pack(side=tk.BOTTOM, pady=10)
+    VirtualLeaderboard(popup, past, event).pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+
+# --- Main Application Window Setup ---
+root = tk.Tk()
+root.title("Tournament Scoring System")
+# Popup screens, built the first time they are opened and hidden rather than destroyed on close
+views = ViewCache(root, engine.lock) # Views read the engine under its lock, like the server thread
+root.attributes('-fullscreen', True)  # Enable fullscreen
+
+# Optional: Escape to exit fullscreen
+root.bind("<Escape>", lambda e: root.attributes('-fullscreen', False))
+
+# --- Top: Explanation Text ---
+explanation_label = tk.Label(root, text=(
+    "This application manages a team-based tournament.\n"
+    "Phase 1: Create and manage teams.\n"
+    "Phase 2: Select the main event and record scores.\n"
+    "Phase 3: View rankings based on scores entered.\n"
+    "Use Save to back up progress or Exit to quit the application."
+), font=("Arial", 12), justify="center", pady=10)
+explanation_label.pack(pady=20)
+
+# --- Status & Current Event Info ---
+status_label = tk.Label(root, text="", fg="blue", font=("Arial", 10))
+status_label.pack(pady=5)
+
+current_event_label = tk.Label(root, text="Current Event: Not Selected", font=("Arial", 10, "italic"))
+current_event_label.pack(pady=5)
+
+# Per-action timings, toggled with F12 or "Timings"; packed under status_label while shown
+metrics_label = tk.Label(root, text="", fg="gray", font=("Courier", 9), justify="left")
+
+load_data()
+start_scoring_server()
+poll_save_results()
+poll_metrics()
+
+# --- Main Button Area Container ---
+button_container = tk.Frame(root)
+button_container.pack(side="bottom", pady=40)
+
+# --- Phase 1: Team Setup ---
+phase1 = tk.LabelFrame(button_container, text="Phase 1: Teams", padx=10, pady=10)
+phase1.pack(side="left", padx=30)
+tk.Button(phase1, text="Create Team Data", command=initialise_teams).pack(pady=5)
+tk.Button(phase1, text="Manage Teams & Members", command=manage_teams_popup).pack(pady=5)
+tk.Button(phase1, text="Import Roster from File", command=import_roster_popup).pack(pady=5)
+
+# --- Phase 2: Event & Scores ---
+phase2 = tk.LabelFrame(button_container, text="Phase 2: Event & Scores", padx=10, pady=10)
+phase2.pack(side="left", padx=30)
+tk.Button(phase2, text="View & Select Event", command=select_event_popup).pack(pady=5)
+tk.Button(phase2, text="Record Team Scores", command=record_team_score_popup).pack(pady=5)
+tk.Button(phase2, text="Record Match Results", command=match_results_popup).pack(pady=5)
+tk.Button(phase2, text="Import Scores from File", command=import_scores_popup).pack(pady=5)
+
+# --- Phase 3: Leaderboard ---
+phase3 = tk.LabelFrame(button_container, text="Phase 3: Leaderboard", padx=10, pady=10)
+phase3.pack(side="left", padx=30)
+tk.Button(phase3, text="Show Overall Leaderboard", command=show_leaderboard_popup).pack(pady=15)
+tk.Button(phase3, text="Change History", command=history_popup).pack(pady=5)
+
+# --- Save & Exit Centered ---
+bottom_controls = tk.Frame(root)
+bottom_controls.pack(pady=10)
+tk.Button(bottom_controls, text="Undo", command=undo_last_change).pack(side="left", padx=10)
+tk.Button(bottom_controls, text="Redo", command=redo_last_change).pack(side="left", padx=10)
+tk.Button(bottom_controls, text="Save Current Data", command=compact_data).pack(side="left", padx=10)
+tk.Button(bottom_controls, text="Timings", command=toggle_metrics_overlay).pack(side="left", padx=10)
+tk.Button(bottom_controls, text="Exit Application", command=root.quit).pack(side="left", padx=10)
+
+root.bind_all("<Control-z>", undo_last_change)
+root.bind_all("<Control-y>", redo_last_change)
+root.bind_all("<F12>", toggle_metrics_overlay)
+
+def flush_metrics():
+    try:
+        metrics.flush()
+    except OSError:
+        pass # Nowhere left to report it
+
+# Exit Confirmation
+def on_closing():
+    if messagebox.askyesno("Exit Application", "Do you want to save data before exiting?"):
+        compact_data()
+    if scoring_server:
+        stop_server_thread(scoring_server)
+    storage.close() # Waits for queued saves to reach the disk
+    flush_metrics()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_closing)
+
+root.mainloop()
+if scoring_server:
+    stop_server_thread(scoring_server) # Idempotent if on_closing already stopped it
+storage.close() # Also covers 'Exit Application', which leaves mainloop without on_closing
+flush_metrics() # After the last store writes, so they are included
@@ -0,0 +1,580 @@
+"""Local HTTP + WebSocket API so several scoring stations can enter results at once.
+
+One engine is shared by every client: the Tk window (in-process) and any
+number of judges' stations talking to this server. Writes use per-team
+optimistic concurrency: every read of a team returns its version, and a
+score submitted with "version" is rejected with 409 Conflict if someone else
+changed that team in the meantime, instead of silently overwriting it.
+
+HTTP routes (JSON in and out, keep-alive):
+
+    GET  /events                             event details and the selected event
+    GET  /teams                              every team with its total and version
+    GET  /teams/{name}                       one team's members, scores, rank and version
+    GET  /leaderboard?event=&start=&stop=    leaderboard rows (overall when event is omitted)
+    GET  /members?search=&limit=             members whose names best match search, with their teams
+    POST /scores   {team, event, wins, losses, points, version} (+ draws/bonus/placement if the rule uses them)
+    POST /matches  {event, match_id, winner, score_a, score_b}
+
+Writes may carry an "operator" (the judge or station name), which is stamped
+on the change in the tournament's history.
+
+GET /ws upgrades to a WebSocket. Clients receive the engine's change feed as
+{"type": "changes", "seq", "changes"} for every change from any station (the
+rank diffs described in changefeed.py, enough for a display screen to patch
+its rows) and may send {"action": "record_score", ...} or {"action":
+"record_match", ...} with an optional "id" that is echoed in the {"type":
+"result"} or {"type": "error"} reply.
+
+Run standalone with: python server.py --data tournament_data.json --port 8765
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import http.client
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from history import HistoryLog, HistoryStore
+from persistence import BackgroundStore, default_data_file, open_store
+from scoring_engine import ScoringError, TournamentEngine, VersionConflict
+from scoring_rules import OPTIONAL_INPUTS
+
+DEFAULT_HOST = "127.0.0.1" # Loopback only unless the operator asks otherwise
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1 << 20
+SEARCH_LIMIT = 20 # Default /members results
+MAX_SEARCH_LIMIT = 200
+RULE_INPUTS = OPTIONAL_INPUTS + ("placement",) # Score fields beyond wins/losses/points a scoring rule may use
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               409: "Conflict", 413: "Payload Too Large"}
+
+# WebSocket opcodes (RFC 6455)
+WS_CONTINUATION, WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = dict(extra, error=message)
+
+
+# --- WebSocket framing ---
+def websocket_accept(key):
+    """The Sec-WebSocket-Accept value for a client's Sec-WebSocket-Key."""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def _mask(payload, mask):
+    """XORs payload with the 4-byte mask (one big-int XOR instead of a byte loop)."""
+    if not payload:
+        return payload
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+
+def encode_frame(opcode, payload, mask=None):
+    """A single final frame; clients must mask (mask=4 random bytes), servers must not."""
+    length = len(payload)
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if mask:
+        return bytes(header) + mask + _mask(payload, mask)
+    return bytes(header) + payload
+
+
+def decode_frame_header(first_two):
+    """(fin, opcode, masked, length_code) from a frame's first two bytes."""
+    return bool(first_two[0] & 0x80), first_two[0] & 0x0F, bool(first_two[1] & 0x80), first_two[1] & 0x7F
+
+
+async def read_frame(reader):
+    """Reads one frame from an asyncio stream; returns (fin, opcode, payload)."""
+    fin, opcode, masked, length = decode_frame_header(await reader.readexactly(2))
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_BODY_BYTES:
+        raise ValueError("WebSocket frame too large")
+    mask = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(length)
+    return fin, opcode, _mask(payload, mask) if mask else payload
+
+
+# --- Server ---
+class ScoringServer:
+    """Serves one TournamentEngine over HTTP and WebSocket on an asyncio event loop.
+
+    Engine calls are short and made directly on the loop; the engine's lock
+    keeps them atomic against the Tk thread, whose views read the engine under
+    the same lock. After every change the server
+    calls engine.save() (cheap with a BackgroundStore) and on_change(), if
+    given, from the loop's thread. WebSocket clients get the engine's change
+    feed, so they also see changes made outside the server.
+    """
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, on_change=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.on_change = on_change
+        self._server = None
+        self._unsubscribe = None
+        self._connections = set() # Writers of every open connection, closed on shutdown
+        self._sockets = set() # Writers of the connected WebSocket clients
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1] # Resolves port=0 to the real port
+        loop = asyncio.get_running_loop()
+        # The feed calls back on whichever thread committed (the Tk thread, too)
+        self._unsubscribe = self.engine.feed.subscribe(lambda seq, changes: loop.call_soon_threadsafe(
+            self.broadcast, {"type": "changes", "seq": seq, "changes": changes}))
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._connections):
+            writer.close() # Idle keep-alive readers see EOF and finish
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    # --- HTTP ---
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers)
+                    return
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                status, payload = self._dispatch(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/") or "/"
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if method == "GET":
+            if path == "/events":
+                return self._call(self._events)
+            if path == "/teams":
+                return self._call(self._teams)
+            if path.startswith("/teams/"):
+                return self._call(self._team, path[len("/teams/"):])
+            if path == "/leaderboard":
+                return self._call(self._leaderboard, query)
+            if path == "/members":
+                return self._call(self._members, query)
+        elif method == "POST":
+            if path == "/scores":
+                return self._call(lambda: self._record_score(self._json_body(body)))
+            if path == "/matches":
+                return self._call(lambda: self._record_match(self._json_body(body)))
+        else:
+            return 405, {"error": f"Method {method} not allowed."}
+        return 404, {"error": f"No route for {method} {path}."}
+
+    @staticmethod
+    def _call(handler, *args):
+        """Runs a resource handler and maps its errors to (status, payload)."""
+        try:
+            return 200, handler(*args)
+        except HttpError as e:
+            return e.status, e.body
+        except VersionConflict as e:
+            return 409, {"error": str(e), "team": e.team, "version": e.current_version}
+        except ScoringError as e:
+            return 400, {"error": str(e)}
+        except TypeError:
+            return 400, {"error": "Malformed request fields."}
+
+    @staticmethod
+    def _json_body(body):
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Request body is not valid JSON.")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Request body must be a JSON object.")
+        return data
+
+    # --- Resources ---
+    def _events(self):
+        engine = self.engine
+        return {"selected_event": engine.selected_event, "multi_event": engine.multi_event,
+                "events": engine.event_details}
+
+    def _teams(self):
+        engine = self.engine
+        with engine.lock:
+            return [{"team": team, "members": engine.members(team), "total_score": engine.total_score(team),
+                     "version": engine.version_of(team)} for team in engine.team_names()]
+
+    def _team(self, team):
+        engine = self.engine
+        with engine.lock:
+            if not engine.has_team(team):
+                raise HttpError(404, f"Team '{team}' not found.")
+            return {"team": team, "members": engine.members(team), "total_score": engine.total_score(team),
+                    "rank": engine.rank_of(team), "version": engine.version_of(team),
+                    "event_scores": {event: engine.event_score(team, event) for event in engine.event_details
+                                     if engine.has_score(team, event)}}
+
+    def _members(self, query):
+        try:
+            limit = int(query.get("limit", SEARCH_LIMIT))
+        except ValueError:
+            raise HttpError(400, "limit must be an integer.")
+        matches = self.engine.search_members(query.get("search", ""), min(limit, MAX_SEARCH_LIMIT))
+        return [{"member": member, "team": team} for member, team in matches]
+
+    def _leaderboard(self, query):
+        engine = self.engine
+        try:
+            start = int(query.get("start", 0))
+            stop = int(query["stop"]) if "stop" in query else None
+        except ValueError:
+            raise HttpError(400, "start and stop must be integers.")
+        event = query.get("event")
+        with engine.lock:
+            if event:
+                engine.event_type(event) # Unknown events raise ScoringError, answered with a 400
+            rows = engine.leaderboard_rows(event, start, stop) if event else engine.overall_rows(start, stop)
+            return {"event": event, "rows": [list(row) for row in rows]}
+
+    @staticmethod
+    def _check_stamp(data):
+        """Rejects an operator that is not a string (it goes into the history as is) and a non-integer version."""
+        operator, version = data.get("operator"), data.get("version")
+        if operator is not None and not isinstance(operator, str):
+            raise HttpError(400, "operator must be a string.")
+        if version is not None and (isinstance(version, bool) or not isinstance(version, int)):
+            raise HttpError(400, "version must be an integer.")
+
+    def _record_score(self, data):
+        engine = self.engine
+        self._check_stamp(data)
+        with engine.acting_as(data.get("operator") or engine.operator):
+            score = engine.record_score(data.get("team"), data.get("event"), wins=data.get("wins"),
+                                        losses=data.get("losses"), points=data.get("points"),
+                                        expected_version=data.get("version"),
+                                        **{name: data[name] for name in RULE_INPUTS if name in data})
+            team, event = data.get("team"), data.get("event") or engine.selected_event
+            result = {"team": team, "event": event, "score": score, "version": engine.version_of(team),
+                      "total_score": engine.total_score(team)}
+        self._changed()
+        return result
+
+    def _record_match(self, data):
+        engine = self.engine
+        self._check_stamp(data)
+        with engine.acting_as(data.get("operator") or engine.operator):
+            scores = engine.record_match(data.get("event"), data.get("match_id"), data.get("winner"),
+                                         data.get("score_a"), data.get("score_b"))
+            result = {"event": data.get("event"), "match_id": data.get("match_id"),
+                      "scores": {team: {"score": score, "version": engine.version_of(team)}
+                                 for team, score in scores.items()}}
+        self._changed()
+        return result
+
+    def _changed(self):
+        self.engine.save()
+        if self.on_change:
+            self.on_change()
+
+    # --- WebSocket ---
+    def broadcast(self, message):
+        """Sends message to every connected WebSocket client (call on the loop's thread)."""
+        frame = encode_frame(WS_TEXT, json.dumps(message).encode())
+        for writer in list(self._sockets):
+            if writer.is_closing():
+                self._sockets.discard(writer)
+            else:
+                writer.write(frame)
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self._respond(writer, 400, {"error": "Missing Sec-WebSocket-Key."}, keep_alive=False)
+            return
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {websocket_accept(key)}\r\n\r\n").encode())
+        await writer.drain()
+        self._sockets.add(writer)
+        fragments = []
+        try:
+            while True:
+                fin, opcode, payload = await read_frame(reader)
+                if opcode == WS_CLOSE:
+                    writer.write(encode_frame(WS_CLOSE, payload[:2]))
+                    await writer.drain()
+                    return
+                if opcode == WS_PING:
+                    writer.write(encode_frame(WS_PONG, payload))
+                elif opcode in (WS_TEXT, WS_BINARY, WS_CONTINUATION):
+                    fragments.append(payload)
+                    if fin:
+                        message, fragments = b"".join(fragments), []
+                        writer.write(encode_frame(WS_TEXT, json.dumps(self._ws_message(message)).encode()))
+                await writer.drain()
+        finally:
+            self._sockets.discard(writer)
+
+    def _ws_message(self, message):
+        """Handles one client message; returns the reply with the message's id echoed."""
+        try:
+            data = self._json_body(message)
+        except HttpError as e:
+            return dict(e.body, type="error", id=None)
+        handler = {"record_score": self._record_score, "record_match": self._record_match}.get(data.get("action"))
+        if handler is None:
+            return {"type": "error", "id": data.get("id"), "error": f"Unknown action '{data.get('action')}'."}
+        status, payload = self._call(handler, data)
+        if status != 200:
+            return dict(payload, type="error", id=data.get("id"), status=status)
+        return {"type": "result", "id": data.get("id"), "result": payload}
+
+
+def start_server_thread(engine, host=DEFAULT_HOST, port=DEFAULT_PORT, on_change=None):
+    """Runs a ScoringServer on its own event loop in a daemon thread; returns it once listening.
+
+    server.port holds the bound port (useful with port=0); call stop_server_thread(server) to shut it down.
+    """
+    server = ScoringServer(engine, host, port, on_change)
+    started = threading.Event()
+    failure = []
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server.loop = loop
+        try:
+            loop.run_until_complete(server.start())
+        except OSError as e:
+            failure.append(e)
+            started.set()
+            return
+        started.set()
+        try:
+            loop.run_until_complete(server.serve_forever())
+        except asyncio.CancelledError:
+            pass # server.close() ends serve_forever by cancelling it
+        finally:
+            loop.run_until_complete(asyncio.sleep(0)) # Let the closed connections' handlers finish
+            loop.close()
+
+    server.thread = threading.Thread(target=run, name="scoring-server", daemon=True)
+    server.thread.start()
+    started.wait()
+    if failure:
+        raise failure[0]
+    return server
+
+
+def stop_server_thread(server):
+    if server.thread.is_alive():
+        asyncio.run_coroutine_threadsafe(server.close(), server.loop).result()
+        server.thread.join()
+
+
+# --- Loopback client ---
+class LoopbackClient:
+    """A small blocking client for the API, for tests, scripts and load checks.
+
+    HTTP calls reuse one keep-alive connection; websocket() opens a separate
+    WebSocketClient.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, data=None):
+        """Returns (status, parsed JSON body)."""
+        body = json.dumps(data).encode() if data is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self._connection.request(method, path, body, headers)
+        response = self._connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def teams(self):
+        return self.request("GET", "/teams")[1]
+
+    def team(self, team):
+        return self.request("GET", "/teams/" + team.replace(" ", "%20"))[1]
+
+    def leaderboard(self, event=None, start=0, stop=None):
+        query = f"?start={start}" + (f"&stop={stop}" if stop is not None else "")
+        if event:
+            query += "&event=" + event.replace(" ", "%20")
+        return self.request("GET", "/leaderboard" + query)[1]["rows"]
+
+    def record_score(self, team, event=None, version=None, **fields):
+        return self.request("POST", "/scores", dict(fields, team=team, event=event, version=version))
+
+    def record_match(self, event, match_id, winner, score_a=None, score_b=None):
+        return self.request("POST", "/matches", {"event": event, "match_id": match_id, "winner": winner,
+                                                 "score_a": score_a, "score_b": score_b})
+
+    def websocket(self):
+        return WebSocketClient(self.host, self.port, self.timeout)
+
+    def close(self):
+        self._connection.close()
+
+
+class WebSocketClient:
+    """Minimal blocking WebSocket client: send(obj) and recv() exchange JSON messages."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self._socket.sendall((f"GET /ws HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                              f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                              "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+        self._file = self._socket.makefile("rb")
+        status = self._file.readline()
+        headers = {}
+        while True:
+            line = self._file.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if b" 101 " not in status or headers.get("sec-websocket-accept") != websocket_accept(key):
+            raise ConnectionError(f"WebSocket handshake failed: {status!r}")
+
+    def send(self, message):
+        self._socket.sendall(encode_frame(WS_TEXT, json.dumps(message).encode(), mask=os.urandom(4)))
+
+    def recv(self):
+        """The next JSON message from the server (answers pings along the way)."""
+        fragments = []
+        while True:
+            fin, opcode, masked, length = decode_frame_header(self._file.read(2))
+            if length == 126:
+                length = struct.unpack("!H", self._file.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._file.read(8))[0]
+            mask = self._file.read(4) if masked else None
+            payload = self._file.read(length)
+            if mask:
+                payload = _mask(payload, mask)
+            if opcode == WS_PING:
+                self._socket.sendall(encode_frame(WS_PONG, payload, mask=os.urandom(4)))
+            elif opcode == WS_CLOSE:
+                raise ConnectionError("WebSocket closed by the server")
+            else:
+                fragments.append(payload)
+                if fin:
+                    return json.loads(b"".join(fragments))
+
+    def close(self):
+        try:
+            self._socket.sendall(encode_frame(WS_CLOSE, struct.pack("!H", 1000), mask=os.urandom(4)))
+        except OSError:
+            pass
+        self._file.close()
+        self._socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the tournament over a local HTTP/WebSocket API.")
+    parser.add_argument("--data", help="Tournament data file (default: tournament_data.json, .db or .tsb by backend)")
+    parser.add_argument("--backend", default="journal", help="Storage backend: json, journal, sqlite or binary")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    args.data = args.data or default_data_file(args.backend)
+
+    try:
+        store = open_store(args.backend, args.data)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    history = HistoryLog(args.data)
+    storage = BackgroundStore(HistoryStore(store, history))
+    engine = TournamentEngine(args.data, store=storage, history=history)
+    try:
+        engine.load()
+    except ValueError as e: # Also json.JSONDecodeError: a damaged file, or one written by another backend
+        storage.close()
+        print(f"Failed to load {args.data}: {e}", file=sys.stderr)
+        return 1
+    server = ScoringServer(engine, args.host, args.port)
+    print(f"Serving {args.data} on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.compact()
+        storage.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""SQLite storage backend.
+
+Keeps teams, members, events and scores in tables keyed by team (and event)
+instead of one JSON document. Each save applies the engine's change records
+inside one transaction using fixed (and therefore cached, prepared) SQL
+statements, and the database runs in WAL mode so readers never block the
+writer. Leaderboards are read from the engine's in-memory rankings, not from
+the database.
+"""
+import json
+import pathlib
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    name TEXT PRIMARY KEY,
+    details TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS teams (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    total_score INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS members (
+    team TEXT NOT NULL REFERENCES teams(name),
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (team, name)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    team TEXT NOT NULL REFERENCES teams(name),
+    event TEXT NOT NULL,
+    wins INTEGER,
+    losses INTEGER,
+    points INTEGER NOT NULL,
+    inputs TEXT, -- JSON of the extra inputs a custom scoring rule used (draws, bonus, placement, awarded)
+    PRIMARY KEY (team, event)
+);
+CREATE TABLE IF NOT EXISTS brackets (
+    event TEXT PRIMARY KEY,
+    format TEXT NOT NULL,
+    teams TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    event TEXT NOT NULL REFERENCES brackets(event),
+    match_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    team_a TEXT NOT NULL,
+    team_b TEXT,
+    stage TEXT NOT NULL,
+    winner TEXT,
+    score_a INTEGER,
+    score_b INTEGER,
+    PRIMARY KEY (event, match_id)
+);
+-- Leaderboard indexes from earlier versions; nothing queries by score, so they only slowed writes
+DROP INDEX IF EXISTS idx_teams_total;
+DROP INDEX IF EXISTS idx_scores_event_points;
+"""
+
+UPSERT_SCORE = """
+INSERT INTO scores (team, event, wins, losses, points, inputs) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (team, event) DO UPDATE SET wins = excluded.wins, losses = excluded.losses, points = excluded.points,
+    inputs = excluded.inputs
+"""
+SCORE_FIELDS = ("wins", "losses", "points")
+SET_META = "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+INSERT_TEAM = "INSERT INTO teams (name, position, total_score) VALUES (?, ?, ?)"
+INSERT_MATCH = """
+INSERT INTO matches (event, match_id, round, team_a, team_b, stage, winner, score_a, score_b)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_MEMBER = "INSERT INTO members (team, name, position) VALUES (?, ?, ?)"
+NEXT_MEMBER_POSITION = "SELECT COALESCE(MAX(position), -1) + 1 FROM members WHERE team = ?"
+SUM_TEAM_POINTS = "UPDATE teams SET total_score = (SELECT COALESCE(SUM(points), 0) FROM scores WHERE team = teams.name) WHERE name = ?"
+EVENT_TEAM_POINTS = "UPDATE teams SET total_score = (SELECT COALESCE(MAX(points), 0) FROM scores WHERE team = teams.name AND event = ?) WHERE name = ?"
+
+
+class SqliteStore:
+    """Store that keeps the tournament in a SQLite database."""
+
+    def __init__(self, path, read_only=False):
+        """read_only opens the file as it is (no WAL switch, schema or upgrade), e.g. an archived database
+        or one that may not be a tournament's at all; check has_table("meta") before loading it."""
+        self.path = path
+        if read_only:
+            uri = pathlib.Path(path).absolute().as_uri() + "?mode=ro"
+            self.connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(scores)")}
+        if "inputs" not in columns and not read_only: # Database from before scoring rules
+            self.connection.execute("ALTER TABLE scores ADD COLUMN inputs TEXT")
+        self._inputs_column = "inputs" if "inputs" in columns or not read_only else "NULL"
+
+    # --- Store interface ---
+    def load(self):
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if "seq" not in meta:
+            return None, []
+        teams = {}
+        for name, total_score in self.connection.execute("SELECT name, total_score FROM teams ORDER BY position"):
+            teams[name] = {"members": [], "event_scores": {}, "total_score": total_score}
+        for team, name in self.connection.execute("SELECT team, name FROM members ORDER BY team, position"):
+            teams[team]["members"].append(name)
+        for team, event, wins, losses, points, inputs in self.connection.execute(
+                f"SELECT team, event, wins, losses, points, {self._inputs_column} FROM scores"):
+            teams[team]["event_scores"][event] = self._score_data(wins, losses, points, inputs)
+        brackets = {event: {"format": fmt, "teams": json.loads(bracket_teams), "matches": []}
+                    for event, fmt, bracket_teams in self.connection.execute("SELECT event, format, teams FROM brackets")}
+        for event, match_id, round_number, team_a, team_b, stage, winner, score_a, score_b in self.connection.execute(
+                "SELECT event, match_id, round, team_a, team_b, stage, winner, score_a, score_b FROM matches ORDER BY event, match_id"):
+            brackets[event]["matches"].append({"row": [match_id, round_number, team_a, team_b, stage],
+                                               "winner": winner, "score_a": score_a, "score_b": score_b})
+        snapshot = {
+            "teams": teams,
+            "brackets": brackets,
+            "event_details": {name: json.loads(details) for name, details in
+                              self.connection.execute("SELECT name, details FROM events")},
+            "selected_event": json.loads(meta.get("selected_event", "null")),
+            "multi_event": json.loads(meta.get("multi_event", "false")),
+            "seq": int(meta["seq"]),
+        }
+        return snapshot, []
+
+    def commit(self, records, engine):
+        stored_seq = self._meta("seq", None)
+        if stored_seq is None:
+            if records:
+                self.compact(engine) # Empty database: store the full state once, then apply deltas
+            return
+        # A snapshot (compact, or the first commit) is taken from the live engine, so it can
+        # already hold records that were still queued; applying those again would fail
+        records = [record for record in records if record.get("seq", 0) > stored_seq]
+        if not records:
+            return
+        with self.connection: # One transaction per save
+            for record in records:
+                getattr(self, "_apply_" + record["op"])(record)
+            self.connection.execute(SET_META, ("seq", str(records[-1]["seq"])))
+
+    def compact(self, engine):
+        """Rewrites every table from the engine's current state."""
+        with self.connection:
+            self._write_state(engine.snapshot())
+
+    def close(self):
+        self.connection.close()
+
+    def has_table(self, name):
+        return self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                       (name,)).fetchone() is not None
+
+    # --- Change records ---
+    def _meta(self, key, default):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _apply_initialise_teams(self, record):
+        for table in ("matches", "brackets", "scores", "members", "teams"):
+            self.connection.execute(f"DELETE FROM {table}")
+        self.connection.executemany(INSERT_TEAM, ((f"Team {i}", i - 1, 0) for i in range(1, record["num_teams"] + 1)))
+
+    def _apply_import_roster(self, record):
+        if record["replace"]:
+            self._apply_initialise_teams({"num_teams": 0})
+        (position,) = self.connection.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM teams").fetchone()
+        for team, members in record["teams"]:
+            if self.connection.execute("SELECT 1 FROM teams WHERE name = ?", (team,)).fetchone() is None:
+                self.connection.execute(INSERT_TEAM, (team, position, 0))
+                position += 1
+            for member in members:
+                self._apply_add_member({"team": team, "member": member})
+
+    def _apply_add_member(self, record):
+        (position,) = self.connection.execute(NEXT_MEMBER_POSITION, (record["team"],)).fetchone()
+        self.connection.execute(INSERT_MEMBER, (record["team"], record["member"], position))
+
+    def _apply_remove_member(self, record):
+        self.connection.execute("DELETE FROM members WHERE team = ? AND name = ?", (record["team"], record["member"]))
+
+    def _apply_select_event(self, record):
+        self.connection.execute(SET_META, ("selected_event", json.dumps(record["event"])))
+        if not self._meta("multi_event", False):
+            self.connection.execute("DELETE FROM matches")
+            self.connection.execute("DELETE FROM brackets")
+            self.connection.execute("DELETE FROM scores")
+            self.connection.execute("UPDATE teams SET total_score = 0")
+
+    def _apply_set_multi_event(self, record):
+        self.connection.execute(SET_META, ("multi_event", json.dumps(record["enabled"])))
+        for (team,) in self.connection.execute("SELECT name FROM teams").fetchall():
+            self._update_total(team)
+
+    def _apply_record_score(self, record):
+        self._upsert_score(record["team"], record["event"], record["score"])
+        self._update_total(record["team"])
+
+    def _apply_record_scores(self, record):
+        self.connection.executemany(UPSERT_SCORE, (self._score_row(team, event, score)
+                                                   for team, event, score in record["scores"]))
+        for team in {team for team, _, _ in record["scores"]}:
+            self._update_total(team)
+
+    def _apply_set_scoring_rule(self, record):
+        (details,) = self.connection.execute("SELECT details FROM events WHERE name = ?", (record["event"],)).fetchone()
+        details = json.loads(details)
+        if record["formula"]:
+            details["formula"] = record["formula"]
+        else:
+            details.pop("formula", None)
+        self.connection.execute("UPDATE events SET details = ? WHERE name = ?", (json.dumps(details), record["event"]))
+        self._apply_bracket_scores(record)
+
+    def _apply_set_members(self, record):
+        self.connection.execute("DELETE FROM members WHERE team = ?", (record["team"],))
+        self.connection.executemany(INSERT_MEMBER, ((record["team"], member, position)
+                                                    for position, member in enumerate(record["members"])))
+
+    def _apply_move_member(self, record):
+        self._apply_remove_member({"team": record["from"], "member": record["member"]})
+        if record.get("position") is None:
+            self._apply_add_member({"team": record["to"], "member": record["member"]})
+        else: # Undoing a move puts the member back where they were
+            members = [name for (name,) in self.connection.execute(
+                "SELECT name FROM members WHERE team = ? ORDER BY position", (record["to"],))]
+            members.insert(record["position"], record["member"])
+            self._apply_set_members({"team": record["to"], "members": members})
+
+    def _apply_restore_scores(self, record):
+        for team, event, score_data in record["scores"]:
+            self._restore_score(team, event, score_data)
+        for team in {team for team, _, _ in record["scores"]}:
+            self._update_total(team)
+
+    def _apply_restore_bracket(self, record):
+        event, bracket = record["event"], record["bracket"]
+        if bracket is None:
+            self.connection.execute("DELETE FROM matches WHERE event = ?", (event,))
+            self.connection.execute("DELETE FROM brackets WHERE event = ?", (event,))
+        else:
+            self._insert_bracket(event, bracket["format"], bracket["teams"])
+            self._insert_matches(event, bracket["matches"])
+        for team, score_data in record["scores"]:
+            self._restore_score(team, event, score_data)
+            self._update_total(team)
+
+    def _apply_restore(self, record):
+        self._write_state(record["state"])
+
+    def _apply_create_bracket(self, record):
+        self._insert_bracket(record["event"], record["format"], record["teams"])
+        self._apply_pair_round(record)
+
+    def _apply_pair_round(self, record):
+        # Byes are decided as soon as they are paired
+        self.connection.executemany(INSERT_MATCH, ([record["event"]] + row + [row[2] if row[3] is None else None, None, None]
+                                                   for row in record["matches"]))
+        self._apply_bracket_scores(record)
+
+    def _apply_record_match(self, record):
+        self.connection.execute("UPDATE matches SET winner = ?, score_a = ?, score_b = ? WHERE event = ? AND match_id = ?",
+                                (record["winner"], record["score_a"], record["score_b"], record["event"], record["match_id"]))
+        self._apply_bracket_scores(record)
+
+    def _apply_bracket_scores(self, record):
+        for team, score_data in record["scores"]:
+            self._upsert_score(team, record["event"], score_data)
+            self._update_total(team)
+
+    def _insert_bracket(self, event, fmt, teams):
+        self.connection.execute("DELETE FROM matches WHERE event = ?", (event,))
+        self.connection.execute("INSERT OR REPLACE INTO brackets (event, format, teams) VALUES (?, ?, ?)",
+                                (event, fmt, json.dumps(teams)))
+
+    def _write_state(self, data):
+        """Replaces every table's contents with the tournament in data (the engine's to_dict() layout)."""
+        for table in ("matches", "brackets", "scores", "members", "teams", "events"):
+            self.connection.execute(f"DELETE FROM {table}")
+        self.connection.executemany("INSERT INTO events (name, details) VALUES (?, ?)",
+                                    ((name, json.dumps(details)) for name, details in data["event_details"].items()))
+        self.connection.executemany(INSERT_TEAM, ((name, position, team["total_score"]) for position, (name, team)
+                                                  in enumerate(data["teams"].items())))
+        self.connection.executemany(INSERT_MEMBER, ((team_name, member, position)
+                                                    for team_name, team in data["teams"].items()
+                                                    for position, member in enumerate(team["members"])))
+        self.connection.executemany(UPSERT_SCORE, (self._score_row(team_name, event, score)
+                                                   for team_name, team in data["teams"].items()
+                                                   for event, score in team["event_scores"].items()))
+        for event, bracket in data["brackets"].items():
+            self._insert_bracket(event, bracket["format"], bracket["teams"])
+            self._insert_matches(event, bracket["matches"])
+        for key in ("selected_event", "multi_event", "seq"):
+            if key in data: # A restore record's state carries no seq; commit() sets it
+                self.connection.execute(SET_META, (key, json.dumps(data[key])))
+
+    def _insert_matches(self, event, matches):
+        self.connection.executemany(INSERT_MATCH, ([event] + match["row"] + [match["winner"], match["score_a"], match["score_b"]]
+                                                   for match in matches))
+
+    def _restore_score(self, team, event, score_data):
+        if score_data is None:
+            self.connection.execute("DELETE FROM scores WHERE team = ? AND event = ?", (team, event))
+        else:
+            self._upsert_score(team, event, score_data)
+
+    def _upsert_score(self, team, event, score_data):
+        self.connection.execute(UPSERT_SCORE, self._score_row(team, event, score_data))
+
+    def _update_total(self, team):
+        if self._meta("multi_event", False):
+            self.connection.execute(SUM_TEAM_POINTS, (team,))
+        else:
+            self.connection.execute(EVENT_TEAM_POINTS, (self._meta("selected_event", None), team))
+
+    @staticmethod
+    def _score_row(team, event, score_data):
+        inputs = {key: value for key, value in score_data.items() if key not in SCORE_FIELDS}
+        return (team, event, score_data.get("wins"), score_data.get("losses"), score_data["points"],
+                json.dumps(inputs) if inputs else None)
+
+    @staticmethod
+    def _score_data(wins, losses, points, inputs=None):
+        score_data = {} if wins is None else {"wins": wins, "losses": losses}
+        if inputs:
+            score_data.update(json.loads(inputs))
+        score_data["points"] = points
+        return score_data
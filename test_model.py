@@ -0,0 +1,48 @@
+"""Regression tests for TeamTable (run with: python -m unittest test_model)."""
+import os
+import tempfile
+import unittest
+
+from model import TeamTable
+from scoring_engine import TournamentEngine
+
+
+class AddTeamAfterScoresTest(unittest.TestCase):
+    """Teams added after an event's ScoreColumns exist must get a slot in them."""
+
+    def test_table_grows_existing_columns(self):
+        table = TeamTable(["Team 1"])
+        table.set_score(0, "College Quiz", {"points": 5})
+        team_id = table.add_team("Team 2")
+        self.assertFalse(table.has_score(team_id, "College Quiz"))
+        self.assertIsNone(table.score(team_id, "College Quiz"))
+        self.assertEqual(table.points(team_id, "College Quiz"), 0)
+
+    def _engine(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        engine = TournamentEngine(os.path.join(directory.name, "tournament_data.json"))
+        engine.initialise_teams(5)
+        return engine
+
+    def test_imported_team_after_undone_score(self):
+        engine = self._engine()
+        engine.select_event("College Quiz")
+        engine.record_score("Team 1", points=5)
+        engine.undo()
+        engine.import_roster([("Team 6", ["Zed"])])
+        self.assertFalse(engine.has_score("Team 6"))
+
+    def test_imported_team_scores_in_multi_event_mode(self):
+        engine = self._engine()
+        engine.set_multi_event(True)
+        engine.record_score("Team 1", "College Quiz", points=5)
+        engine.import_roster([("Team 6", ["Zed"])])
+        engine.record_score("Team 6", "College Quiz", points=3)
+        self.assertEqual(engine.event_score("Team 6", "College Quiz"), {"points": 3})
+        engine.undo()
+        self.assertFalse(engine.has_score("Team 6", "College Quiz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Tie-breaking and shared ranks for leaderboards.
+
+Teams on the same score are ordered by a configurable list of tie-breakers
+(an event can set its own in event_details[event]["tiebreakers"]):
+
+- head_to_head: wins against the other teams in the tied group.
+- win_ratio: wins / matches played.
+- buchholz: sum of the points of every opponent faced.
+- sonneborn_berger: sum of the points of every opponent beaten.
+- points_diff: game points scored minus conceded.
+
+Teams still level on every tie-breaker share a rank (1, 2, 2, 4). Only matches
+played through a bracket provide tie-breaker data; without one, equal scores
+simply share a rank.
+
+Per-team metrics and the sorted order of each tied group are cached. A new
+match result invalidates the two teams involved and their opponents (whose
+Buchholz and Sonneborn-Berger depend on them), so a leaderboard refresh only
+recomputes the groups that changed.
+"""
+from fractions import Fraction
+
+HEAD_TO_HEAD = "head_to_head"
+WIN_RATIO = "win_ratio"
+BUCHHOLZ = "buchholz"
+SONNEBORN_BERGER = "sonneborn_berger"
+POINTS_DIFF = "points_diff"
+DEFAULT_ORDER = (HEAD_TO_HEAD, WIN_RATIO, BUCHHOLZ, SONNEBORN_BERGER, POINTS_DIFF)
+
+
+class TieBreaker:
+    """Orders tied teams for one leaderboard and assigns shared ranks."""
+
+    def __init__(self, bracket=None, order=DEFAULT_ORDER):
+        unknown = set(order) - set(DEFAULT_ORDER)
+        if unknown:
+            raise ValueError(f"Unknown tie-breakers: {', '.join(sorted(unknown))}")
+        self.bracket = bracket
+        self.order = tuple(order) if bracket is not None else ()
+        self._metrics = {} # team -> tuple of the cached per-team metrics
+        self._groups = {} # score -> (team tuple in ranking order, tie-broken order, rank offsets)
+        self._group_of = {} # team -> score of the cached group it is in
+
+    def invalidate(self, teams):
+        """Drops cached metrics and group orders that involve any of teams."""
+        for team in teams:
+            self._metrics.pop(team, None)
+            score = self._group_of.pop(team, None)
+            if score is not None:
+                self._groups.pop(score, None)
+
+    def affected_by_match(self, team_a, team_b):
+        """The teams whose metrics a result between team_a and team_b can change."""
+        affected = {team_a, team_b}
+        if self.bracket is not None:
+            affected.update(self.bracket.opponents[team_a])
+            affected.update(self.bracket.opponents[team_b])
+        return affected
+
+    def rows(self, ranking, start=0, stop=None):
+        """Yields (rank, team, score) for positions start..stop-1 of a RankingIndex."""
+        stop = len(ranking) if stop is None else min(stop, len(ranking))
+        position = max(start, 0)
+        while position < stop:
+            score = ranking.score_at(position)
+            first, group_stop = ranking.score_bounds(score)
+            if group_stop - first == 1 or not self.order:
+                # Nothing to break: everyone on this score shares the first position's rank
+                for _, team, _ in ranking.range(position, min(group_stop, stop)):
+                    yield first + 1, team, score
+            else:
+                ordered, offsets = self._group_order(ranking, score, first, group_stop)
+                for index in range(position - first, min(group_stop, stop) - first):
+                    yield first + 1 + offsets[index], ordered[index], score
+            position = group_stop
+
+    # --- Group ordering ---
+    def _group_order(self, ranking, score, first, group_stop):
+        members = tuple(team for _, team, _ in ranking.range(first, group_stop))
+        cached = self._groups.get(score)
+        if cached is not None and cached[0] == members:
+            return cached[1], cached[2]
+
+        group = set(members)
+        keys = {team: self._key(team, group) for team in members}
+        ordered = sorted(members, key=keys.__getitem__) # Stable: equal keys keep ranking order
+        offsets = []
+        for index, team in enumerate(ordered):
+            if index and keys[team] == keys[ordered[index - 1]]:
+                offsets.append(offsets[-1])
+            else:
+                offsets.append(index)
+
+        self._groups[score] = (members, ordered, offsets)
+        for team in members:
+            self._group_of[team] = score
+        return ordered, offsets
+
+    def _key(self, team, group):
+        """Sort key for a team within its tied group (smaller sorts first)."""
+        metrics = self._metrics.get(team)
+        if metrics is None:
+            metrics = self._metrics[team] = self._team_metrics(team)
+        key = []
+        for name in self.order:
+            if name == HEAD_TO_HEAD:
+                wins_against = self.bracket.wins_against.get(team, {})
+                key.append(-sum(wins for opponent, wins in wins_against.items() if opponent in group))
+            else:
+                key.append(-metrics[name])
+        return tuple(key)
+
+    def _team_metrics(self, team):
+        bracket = self.bracket
+        if team not in bracket.seeds:
+            return dict.fromkeys(DEFAULT_ORDER, 0)
+        played = bracket.wins[team] + bracket.losses[team]
+        points = {opponent: bracket.record(opponent)[2] for opponent in set(bracket.opponents[team])}
+        return {
+            WIN_RATIO: Fraction(bracket.wins[team], played) if played else 0,
+            BUCHHOLZ: sum(points[opponent] for opponent in bracket.opponents[team]),
+            SONNEBORN_BERGER: sum(points[opponent] * wins for opponent, wins in bracket.wins_against[team].items()),
+            POINTS_DIFF: bracket.points_for[team] - bracket.points_against[team],
+        }